@@ -0,0 +1,56 @@
+# catalog/accounts.py
+"""
+New-user setup: a Profile row and membership of the "Student" group.
+
+The post_save signal for a created User and bulk importers (after
+``User.objects.bulk_create``, which sends no signals) both go through
+``setup_new_users``: one bulk insert of profiles and one of group
+memberships, however many users there are.  The Student group's id is
+looked up once per process instead of a ``get_or_create`` per signup.
+"""
+import threading
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+
+from .models import Profile
+
+STUDENT_GROUP = 'Student'
+
+_lock = threading.Lock()
+_student_group_id = None
+
+
+def _remember(group_id):
+    global _student_group_id
+    with _lock:
+        _student_group_id = group_id
+
+
+def student_group_id():
+    if _student_group_id is not None:
+        return _student_group_id
+    group, _ = Group.objects.get_or_create(name=STUDENT_GROUP)
+    # Remembered only once committed, so a rolled-back transaction cannot leave a dangling id
+    transaction.on_commit(lambda: _remember(group.pk))
+    return group.pk
+
+
+def forget_student_group():
+    """Drop the cached id, e.g. after the group was deleted or renamed."""
+    _remember(None)
+
+
+def setup_new_users(users, batch_size=500):
+    """Give saved ``users`` a Profile and the Student group; existing rows are left alone."""
+    user_ids = [user.pk for user in users]
+    if not user_ids:
+        return
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in user_ids], batch_size=batch_size, ignore_conflicts=True,
+    )
+    group_id = student_group_id()
+    Membership = User.groups.through
+    Membership.objects.bulk_create(
+        [Membership(user_id=pk, group_id=group_id) for pk in user_ids], batch_size=batch_size, ignore_conflicts=True,
+    )
@@ -0,0 +1,71 @@
+# catalog/answer_keys.py
+"""
+Compiled, cached quiz answer keys.
+
+A quiz's multiple-choice questions are compiled once into a CompiledQuiz:
+the answer key as a tuple of ``(question_id, correct_option, marks)``, the
+maximum marks, and what the take_quiz page shows for each question.  It is
+cached under the quiz's ``updated_at``; saving or deleting a Question
+touches its quiz's ``updated_at`` (catalog/signals.py), so an edited quiz is
+simply compiled under a new key.  Rendering and grading a quiz then run no
+question queries at all, and grading is one pass over the key.
+"""
+from django.core.cache import cache
+
+from .models import Question
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class CompiledQuiz:
+    def __init__(self, key, questions):
+        self.key = key
+        self.max_marks = sum(marks for _, _, marks in key)
+        # [{'id', 'text', 'question_type', 'options': [(value, text), ...]}, ...] for the template
+        self.questions = questions
+
+    def grade(self, answers):
+        """
+        ``(score, correct)`` for a mapping of ``question_<id>`` to the chosen
+        option, e.g. ``request.POST``; unanswered or malformed answers are wrong.
+        """
+        score = correct = 0
+        for question_id, correct_option, marks in self.key:
+            if answers.get(f'question_{question_id}') == correct_option:
+                score += marks
+                correct += 1
+        return score, correct
+
+
+def compile_quiz(quiz_id):
+    """Build the CompiledQuiz of a quiz from its MCQ questions (one query)."""
+    rows = (
+        Question.objects.filter(quiz_id=quiz_id, question_type=Question.MULTIPLE_CHOICE)
+        .order_by('id')
+        .values_list('id', 'text', 'correct_option', 'marks', 'option1', 'option2', 'option3', 'option4')
+    )
+    key, questions = [], []
+    for question_id, text, correct_option, marks, *options in rows:
+        # Options are compared with the posted string as-is, so no int() per answer
+        key.append((question_id, str(correct_option) if correct_option is not None else None, marks))
+        questions.append({
+            'id': question_id,
+            'text': text,
+            'question_type': Question.MULTIPLE_CHOICE,
+            'options': Question.numbered_options(options),
+        })
+    return CompiledQuiz(tuple(key), questions)
+
+
+def _cache_key(quiz):
+    return f'catalog:answer_key:{quiz.pk}:{quiz.updated_at.timestamp():.6f}'
+
+
+def for_quiz(quiz):
+    """The CompiledQuiz for ``quiz`` as of its ``updated_at``."""
+    key = _cache_key(quiz)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_quiz(quiz.pk)
+        cache.set(key, compiled, CACHE_TIMEOUT)
+    return compiled
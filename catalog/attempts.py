@@ -0,0 +1,216 @@
+# catalog/attempts.py
+"""
+Quiz attempts: server-side drafts and enforced time limits.
+
+Opening a quiz starts (or resumes) the student's QuizAttempt; a timed quiz
+gets its deadline then, so a refresh neither resets the clock nor loses
+answers.  The page autosaves each answer as a small JSON PATCH of
+``{"question_<id>": "<option>"}``.  Each answer is its own cache key, so
+concurrent patches never overwrite each other's questions.  A patch
+arriving FLUSH_INTERVAL or more after the attempt's last flush (the first
+patch included) merges the cached answers into ``QuizAttempt.answers``
+under a row lock; the patches in between cost no write.  Opening the quiz
+page and submitting merge any unflushed answers first, so only answers
+patched since the last flush, less than FLUSH_INTERVAL seconds' worth, are
+lost if their cache keys are evicted.
+
+Submitting closes the attempt.  Up to GRACE_SECONDS past the deadline the
+posted answers count (the page auto-submits when its timer runs out);
+after that the post is ignored and the attempt is graded from its last
+draft.  A submit arriving just after the attempt closed (a double click)
+is shown that attempt's result instead of being graded again.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import QuizAttempt
+
+FLUSH_INTERVAL = 60
+GRACE_SECONDS = 30
+# A submit this soon after the attempt closed is a repeat (double click, resend)
+RESUBMIT_WINDOW = 5 * 60
+DRAFT_TIMEOUT = 60 * 60 * 24
+MAX_PATCH_ANSWERS = 100
+
+
+class InvalidDraft(ValueError):
+    pass
+
+
+class AttemptExpired(Exception):
+    pass
+
+
+def _answer_key(attempt_id, name):
+    return f'catalog:attempt_draft:{attempt_id}:{name}'
+
+
+def _dirty_key(attempt_id):
+    return f'catalog:attempt_draft:{attempt_id}:dirty'
+
+
+def _flushed_key(attempt_id):
+    return f'catalog:attempt_draft:{attempt_id}:flushed'
+
+
+def _names(compiled):
+    return [f'question_{question_id}' for question_id, _, _ in compiled.key]
+
+
+def start_or_resume(user, quiz):
+    """The user's open attempt at ``quiz``, starting one (and its clock) if needed."""
+    attempt = open_attempt(user, quiz)
+    if attempt is not None:
+        return attempt
+
+    now = timezone.now()
+    deadline = now + timedelta(minutes=quiz.time_limit_minutes) if quiz.is_timed() else None
+    try:
+        with transaction.atomic():
+            return QuizAttempt.objects.create(user=user, quiz=quiz, started_at=now, deadline=deadline)
+    except IntegrityError:
+        # Opened in another tab at the same moment
+        return open_attempt(user, quiz)
+
+
+def open_attempt(user, quiz):
+    return QuizAttempt.objects.filter(user=user, quiz=quiz, submitted_at__isnull=True).first()
+
+
+def just_submitted(user, quiz, now=None):
+    """The user's attempt at ``quiz`` closed within RESUBMIT_WINDOW seconds, if any."""
+    now = now or timezone.now()
+    return (
+        QuizAttempt.objects.filter(user=user, quiz=quiz, submitted_at__gte=now - timedelta(seconds=RESUBMIT_WINDOW))
+        .order_by('-submitted_at')
+        .first()
+    )
+
+
+def remaining_seconds(attempt, now=None):
+    """Whole seconds left before the deadline, or None for an untimed attempt."""
+    if attempt.deadline is None:
+        return None
+    now = now or timezone.now()
+    return max(round((attempt.deadline - now).total_seconds()), 0)
+
+
+def expired(attempt, now=None):
+    """Past the deadline and its grace period."""
+    if attempt.deadline is None:
+        return False
+    now = now or timezone.now()
+    return now > attempt.deadline + timedelta(seconds=GRACE_SECONDS)
+
+
+# ------------------------------------------------------------------
+# Drafts
+# ------------------------------------------------------------------
+def parse_patch(payload, compiled):
+    """
+    Validate a decoded JSON body against the quiz's CompiledQuiz: a mapping of
+    ``question_<id>`` to an option, or to null to clear the answer.
+    """
+    if not isinstance(payload, dict):
+        raise InvalidDraft("Expected an object of question_<id>: option")
+    if len(payload) > MAX_PATCH_ANSWERS:
+        raise InvalidDraft(f"At most {MAX_PATCH_ANSWERS} answers per patch")
+
+    names = set(_names(compiled))
+    patch = {}
+    for name, value in payload.items():
+        if name not in names:
+            raise InvalidDraft(f"Unknown question {name!r}")
+        if value is not None and not isinstance(value, (str, int)):
+            raise InvalidDraft("Answers must be an option or null")
+        patch[name] = None if value is None else str(value)
+    return patch
+
+
+def _merge(answers, attempt_id, names):
+    """``answers`` with the attempt's cached answers (None: cleared) applied over them."""
+    merged = dict(answers)
+    cached = cache.get_many([_answer_key(attempt_id, name) for name in names])
+    for name in names:
+        key = _answer_key(attempt_id, name)
+        if key not in cached:
+            continue
+        if cached[key] is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = cached[key]
+    return merged
+
+
+def _flush(attempt, names):
+    """Merge the cached answers into ``QuizAttempt.answers``; returns the merged draft."""
+    # Cleared first, so a patch landing during the flush marks the draft dirty again
+    cache.delete(_dirty_key(attempt.pk))
+    cache.set(_flushed_key(attempt.pk), time.time(), FLUSH_INTERVAL)
+    with transaction.atomic():
+        saved = (
+            QuizAttempt.objects.select_for_update()
+            .filter(pk=attempt.pk, submitted_at__isnull=True)
+            .values_list('answers', flat=True)
+            .first()
+        )
+        if saved is None:
+            return _merge(attempt.answers, attempt.pk, names)
+        answers = _merge(saved, attempt.pk, names)
+        QuizAttempt.objects.filter(pk=attempt.pk).update(answers=answers)
+    attempt.answers = answers
+    return answers
+
+
+def draft(attempt, compiled):
+    """The attempt's latest answers, flushing any cached ones to the database first."""
+    names = _names(compiled)
+    if cache.get(_dirty_key(attempt.pk)):
+        return _flush(attempt, names)
+    return _merge(attempt.answers, attempt.pk, names)
+
+
+def save_draft(attempt, patch, compiled, now=None):
+    """
+    Cache a parsed patch, one key per answer, and flush the draft to the
+    database if it was last flushed FLUSH_INTERVAL or more ago.  Returns the
+    merged draft.  Raises AttemptExpired past the deadline.
+    """
+    if expired(attempt, now):
+        raise AttemptExpired
+    cache.set_many({_answer_key(attempt.pk, name): value for name, value in patch.items()}, DRAFT_TIMEOUT)
+    cache.set(_dirty_key(attempt.pk), True, DRAFT_TIMEOUT)
+
+    names = _names(compiled)
+    # add() only succeeds once the last flush's marker has expired, so one patch flushes
+    if cache.add(_flushed_key(attempt.pk), time.time(), FLUSH_INTERVAL):
+        return _flush(attempt, names)
+    return _merge(attempt.answers, attempt.pk, names)
+
+
+def finish(attempt, data, compiled, now=None):
+    """
+    Close the attempt and return the answers to grade: the ``question_<id>``
+    items of ``data`` (e.g. ``request.POST``), or the last draft, cached
+    answers included, once the attempt has expired.  Returns None if it was
+    already submitted.
+    """
+    now = now or timezone.now()
+    names = _names(compiled)
+    if expired(attempt, now):
+        answers = _merge(attempt.answers, attempt.pk, names)
+    else:
+        answers = {name: value for name, value in data.items() if name.startswith('question_')}
+
+    # Of two concurrent submits only one closes the attempt; see just_submitted
+    closed = QuizAttempt.objects.filter(pk=attempt.pk, submitted_at__isnull=True).update(
+        answers=answers, submitted_at=now,
+    )
+    cache.delete_many(
+        [_answer_key(attempt.pk, name) for name in names] + [_dirty_key(attempt.pk), _flushed_key(attempt.pk)]
+    )
+    return answers if closed else None
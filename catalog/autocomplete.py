@@ -0,0 +1,126 @@
+# catalog/autocomplete.py
+"""
+Process-local prefix index that serves ajax_search type-ahead without
+touching the database.
+
+The index is a sorted list of ``(token, course_id)`` pairs searched with
+``bisect``; every word of a course title is one entry.  It is built on the
+first lookup and then kept current by the Course/Enrollment signals in
+``catalog/signals.py``.  Each worker process holds its own copy, so a write
+made in another process is only seen after that process restarts or calls
+``course_index.rebuild()``.
+"""
+import bisect
+import re
+import threading
+
+from django.db.models import Count
+
+from .models import Course
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+class CourseTitleIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []       # sorted [(token, course_id)]
+        self._titles = {}        # course_id -> title
+        self._popularity = {}    # course_id -> enrollment count
+        self._loaded = False
+
+    # ------------------------------------------------------------------
+    # Building / maintenance
+    # ------------------------------------------------------------------
+    def rebuild(self):
+        rows = Course.objects.annotate(num_enrolled=Count('enrollment')).values_list(
+            'id', 'title', 'num_enrolled'
+        )
+        entries, titles, popularity = [], {}, {}
+        for course_id, title, num_enrolled in rows:
+            titles[course_id] = title
+            popularity[course_id] = num_enrolled
+            entries.extend((token, course_id) for token in set(tokenize(title)))
+        entries.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._titles = titles
+            self._popularity = popularity
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def _remove_entries(self, course_id):
+        for token in set(tokenize(self._titles.get(course_id))):
+            i = bisect.bisect_left(self._entries, (token, course_id))
+            if i < len(self._entries) and self._entries[i] == (token, course_id):
+                del self._entries[i]
+
+    def add_or_update(self, course_id, title):
+        with self._lock:
+            if not self._loaded:
+                return  # the first lookup will read it from the database
+            self._remove_entries(course_id)
+            self._titles[course_id] = title
+            self._popularity.setdefault(course_id, 0)
+            for token in set(tokenize(title)):
+                bisect.insort(self._entries, (token, course_id))
+
+    def remove(self, course_id):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove_entries(course_id)
+            self._titles.pop(course_id, None)
+            self._popularity.pop(course_id, None)
+
+    def bump_popularity(self, course_id, delta=1):
+        with self._lock:
+            if course_id in self._popularity:
+                self._popularity[course_id] = max(0, self._popularity[course_id] + delta)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def _ids_with_prefix(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self._entries, (prefix,))
+        while i < len(self._entries) and self._entries[i][0].startswith(prefix):
+            ids.add(self._entries[i][1])
+            i += 1
+        return ids
+
+    def suggest(self, query, limit=5):
+        """
+        Return up to ``limit`` ``{'id', 'title'}`` dicts whose title has a word
+        starting with every word of ``query``, most enrolled first.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        self._ensure_loaded()
+        with self._lock:
+            matches = None
+            # Longest prefix first: it usually yields the smallest candidate set
+            for token in sorted(tokens, key=len, reverse=True):
+                ids = self._ids_with_prefix(token)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+
+            ranked = sorted(
+                matches,
+                key=lambda pk: (-self._popularity.get(pk, 0), self._titles[pk].lower(), pk),
+            )
+            return [{'id': pk, 'title': self._titles[pk]} for pk in ranked[:limit]]
+
+
+course_index = CourseTitleIndex()
@@ -0,0 +1,111 @@
+# catalog/counters.py
+"""
+Denormalized per-course counters.
+
+``Course.enrollment_count``, ``lesson_count``, ``review_count`` and
+``rating_sum`` are bumped with single ``UPDATE ... SET x = x + n`` statements
+from the Enrollment/Lesson/Review signals, and ``Course.rating`` is rewritten
+as ``rating_sum / review_count`` in the same statement, so listing pages read
+plain columns instead of running COUNT/AVG.  ``manage.py
+reconcile_course_counters`` repairs any drift.
+
+The listing pages cached under the ``'course'`` generation show these
+counters, so every write here bumps it.
+"""
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .generations import bump_generation
+from .models import Course, Enrollment, Lesson, Review
+
+COUNTER_FIELDS = ['enrollment_count', 'lesson_count', 'review_count', 'rating_sum']
+
+
+def bump(course_id, **deltas):
+    """``bump(course_id, lesson_count=1)`` -- atomic increments, no read-modify-write."""
+    Course.objects.filter(pk=course_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    bump_generation('course')
+
+
+def _average(count_delta, sum_delta):
+    new_count = F('review_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    return Case(
+        When(Q(review_count__gt=-count_delta), then=Cast(new_sum, FloatField()) / new_count),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def change_review(course_id, count_delta, sum_delta):
+    """Adjust review count, rating sum and the derived average in one UPDATE."""
+    Course.objects.filter(pk=course_id).update(
+        rating=_average(count_delta, sum_delta),
+        review_count=F('review_count') + count_delta,
+        rating_sum=F('rating_sum') + sum_delta,
+    )
+    bump_generation('course')
+
+
+def refresh_reviews(course_id):
+    """Recount one course's reviews (used when an existing review's rating is edited)."""
+    totals = Review.objects.filter(course_id=course_id).aggregate(n=Count('id'), total=Sum('rating'))
+    count, total = totals['n'], totals['total'] or 0
+    Course.objects.filter(pk=course_id).update(
+        review_count=count,
+        rating_sum=total,
+        rating=total / count if count else 0.0,
+    )
+    bump_generation('course')
+
+
+def _count_of(model, aggregate=Count('id')):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(course=OuterRef('pk'))
+            .order_by()
+            .values('course')
+            .annotate(value=aggregate)
+            .values('value')
+        ),
+        0,
+    )
+
+
+def reconcile(batch_size=500):
+    """
+    Recompute every counter from the source tables and fix the courses that
+    drifted.  Returns the number of courses that were corrected.
+    """
+    actual = Course.objects.annotate(
+        real_enrollment_count=_count_of(Enrollment),
+        real_lesson_count=_count_of(Lesson),
+        real_review_count=_count_of(Review),
+        real_rating_sum=_count_of(Review, Sum('rating')),
+    ).annotate(
+        real_rating=Case(
+            When(real_review_count__gt=0,
+                 then=Cast(F('real_rating_sum'), FloatField()) / F('real_review_count')),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    ).filter(
+        ~Q(enrollment_count=F('real_enrollment_count')) |
+        ~Q(lesson_count=F('real_lesson_count')) |
+        ~Q(review_count=F('real_review_count')) |
+        ~Q(rating_sum=F('real_rating_sum')) |
+        ~Q(rating=F('real_rating'))
+    ).only('id', 'rating', *COUNTER_FIELDS)
+
+    drifted = []
+    for course in actual.iterator(chunk_size=batch_size):
+        for field in COUNTER_FIELDS + ['rating']:
+            setattr(course, field, getattr(course, f'real_{field}'))
+        drifted.append(course)
+
+    Course.objects.bulk_update(drifted, COUNTER_FIELDS + ['rating'], batch_size=batch_size)
+    if drifted:
+        bump_generation('course')
+    return len(drifted)
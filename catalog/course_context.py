@@ -0,0 +1,97 @@
+# catalog/course_context.py
+"""
+Query-budgeted context for course_detail.
+
+Everything on the page that is the same for every visitor (course,
+instructor, category, lessons, quizzes, live classes, announcements and the
+latest reviews) is loaded with a fixed handful of queries and cached under a
+per-course version number.  The signals in ``catalog/signals.py`` bump the
+version whenever one of those rows changes, so a stale entry is simply never
+read again.  The per-user part costs two queries: the enrollment and the
+user's LessonProgress rows for the course (just the enrollment when lesson
+bitsets are enabled).
+"""
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from . import lesson_bits
+from .generations import bump_generation, get_generation, get_generations
+from .models import Course, Enrollment, LessonProgress
+
+CONTEXT_TIMEOUT = 60 * 60
+REVIEWS_SHOWN = 20
+
+
+def course_version(course_id):
+    return get_generation(f'course:{course_id}')
+
+
+def bump_course_version(course_id):
+    bump_generation(f'course:{course_id}')
+
+
+def attach_card_versions(courses):
+    """
+    Set ``course.card_version`` on each course for the ``{% cache %}`` key of
+    its listing card.  One cache round trip for the whole page.
+    """
+    courses = list(courses)
+    versions = get_generations(*[f'course:{course.pk}' for course in courses])
+    for course in courses:
+        course.card_version = versions[f'course:{course.pk}']
+    return courses
+
+
+def shared_course_context(course_id):
+    """User-independent part of the course page, cached by course version."""
+    key = f'catalog:course:{course_id}:context:{course_version(course_id)}'
+    context = cache.get(key)
+    if context is not None:
+        return context
+
+    course = get_object_or_404(Course.objects.select_related('instructor', 'category'), pk=course_id)
+    context = {
+        'course': course,
+        'lessons': list(course.lessons.all()),
+        'quizzes': list(course.quizzes.all()),
+        'live_classes': list(course.live_classes.all()),
+        'announcements': list(course.announcements.order_by('-created_at')),
+        'reviews': list(course.reviews.select_related('user').order_by('-created_at')[:REVIEWS_SHOWN]),
+    }
+    cache.set(key, context, CONTEXT_TIMEOUT)
+    return context
+
+
+def user_course_context(user, course_id, lessons):
+    """
+    Enrollment and per-lesson progress for one user: two queries, none when
+    anonymous.  The totals come from the enrollment (catalog/progress.py).
+    """
+    context = {
+        'enrollment': None,
+        'enrolled': False,
+        'lesson_progress': {},
+        'lessons_done': 0,
+        'progress': 0,
+    }
+    if not user.is_authenticated:
+        return context
+
+    enrollment = Enrollment.objects.filter(user=user, course_id=course_id).first()
+    if lesson_bits.enabled():
+        lesson_progress = lesson_bits.lesson_progress_map(user, enrollment, lessons)
+    else:
+        progress_map = {
+            p.lesson_id: p
+            for p in LessonProgress.objects.filter(user=user, lesson__course_id=course_id)
+        }
+        lesson_progress = {lesson.id: progress_map.get(lesson.id) for lesson in lessons}
+
+    context.update({
+        'enrollment': enrollment,
+        'enrolled': enrollment is not None,
+        'lesson_progress': lesson_progress,
+        'lessons_done': enrollment.completed_lessons if enrollment else 0,
+        'progress': int(enrollment.progress) if enrollment else 0,
+    })
+    return context
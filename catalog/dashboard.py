@@ -0,0 +1,84 @@
+# catalog/dashboard.py
+"""
+Instructor dashboard data.
+
+``course_summaries`` returns every course of an instructor with its
+student numbers annotated by one query: enrollment counts and the average
+progress come from a GROUP BY over the joined enrollments, the average quiz
+score from a correlated subquery (joining QuizResult as well would multiply
+the enrollment rows).  Rosters are not part of the page; each course's
+students are fetched as keyset-paginated JSON when the instructor opens it.
+"""
+from django.db.models import Avg, Count, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, NullIf
+
+from .models import Course, Enrollment, QuizResult
+
+ROSTER_PAGE_SIZE = 50
+
+
+def _average_quiz_score():
+    percentage = Cast('score', FloatField()) * 100.0 / NullIf('total_marks', 0.0)
+    return Subquery(
+        QuizResult.objects.filter(quiz__course_id=OuterRef('pk'))
+        .order_by()
+        .values('quiz__course_id')
+        .annotate(value=Avg(percentage))
+        .values('value'),
+        output_field=FloatField(),
+    )
+
+
+def course_summaries(instructor):
+    """
+    The instructor's courses annotated with ``enrolled``, ``active`` (started,
+    not completed), ``completed``, ``avg_progress`` and ``avg_quiz_score``.
+    """
+    return (
+        Course.objects.filter(instructor=instructor)
+        .annotate(
+            enrolled=Count('enrollment'),
+            active=Count('enrollment', filter=Q(enrollment__is_completed=False, enrollment__progress__gt=0)),
+            completed=Count('enrollment', filter=Q(enrollment__is_completed=True)),
+            avg_progress=Avg('enrollment__progress'),
+            avg_quiz_score=_average_quiz_score(),
+        )
+        .order_by('-created_at', '-id')
+    )
+
+
+def totals(courses):
+    """Page-wide numbers summed from the annotated courses, without another query."""
+    enrolled = sum(course.enrolled for course in courses)
+    completed = sum(course.completed for course in courses)
+    rated = [course for course in courses if course.review_count]
+    reviews = sum(course.review_count for course in rated)
+    return {
+        'students': enrolled,
+        'completion_rate': round(completed * 100 / enrolled, 1) if enrolled else 0,
+        'avg_rating': round(sum(course.rating * course.review_count for course in rated) / reviews, 1) if reviews else 0,
+    }
+
+
+def roster(course):
+    """Enrollments of ``course`` with just what a roster row shows."""
+    return (
+        Enrollment.objects.filter(course=course)
+        .select_related('user')
+        .only(
+            'id', 'enrolled_at', 'progress', 'is_completed',
+            'user__username', 'user__first_name', 'user__last_name', 'user__email',
+        )
+    )
+
+
+def roster_row(enrollment):
+    user = enrollment.user
+    return {
+        'username': user.username,
+        'name': user.get_full_name() or user.username,
+        'email': user.email,
+        'progress': round(enrollment.progress, 1),
+        'completed': enrollment.is_completed,
+        'enrolled_at': enrollment.enrolled_at.isoformat(),
+    }
@@ -1,10 +1,16 @@
 # catalog/decorators.py
 
+import hashlib
 from functools import wraps
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.views import redirect_to_login
 
+from .generations import get_generations
+from .view_counts import record_view
+
 # ------------------------------------------------------------------
 # 1. Simple group-based access (e.g. @group_required('Student'))
 # ------------------------------------------------------------------
@@ -59,4 +65,61 @@ def instructor_or_course_owner(view_func):
             pass
 
         raise PermissionDenied("You are not the instructor of this course.")
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
+
+
+# ------------------------------------------------------------------
+# 3. Whole-page cache for anonymous visitors, keyed by generations
+# ------------------------------------------------------------------
+def cache_anonymous_page(*generation_names, timeout=60 * 5):
+    """
+    Cache the rendered GET response for anonymous users.
+
+    The key contains the current value of every named generation (see
+    catalog/generations.py), e.g. @cache_anonymous_page('course', 'category'),
+    so a signal bumping one of them makes every dependent page miss on its
+    next hit.  Logged-in users always get a fresh render.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            generations = get_generations(*generation_names)
+            key = 'catalog:page:{}:{}:{}'.format(
+                view_func.__name__,
+                hashlib.md5(request.get_full_path().encode()).hexdigest(),
+                ':'.join(str(generations[name]) for name in generation_names),
+            )
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+# ------------------------------------------------------------------
+# 4. Buffered page-view counting (e.g. @count_view('course', 'pk'))
+# ------------------------------------------------------------------
+def count_view(kind, url_kwarg):
+    """
+    Record a view of the object whose id is in ``url_kwarg``.  Goes outside
+    @cache_anonymous_page so cached hits are counted too.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            if request.method == 'GET' and response.status_code == 200:
+                record_view(kind, kwargs[url_kwarg])
+            return response
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,159 @@
+# catalog/facets.py
+"""
+Faceted filtering for the search page.
+
+All facet counts come from one GROUP BY over (category, level, duration,
+price band).  That "cube" is small -- one row per combination that actually
+occurs -- and every facet's counts are summed from it in Python, so adding a
+facet or a facet value never adds a query.  The cube for the whole catalog
+(the no-keyword case) is cached and dropped by the Course/Category signals.
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import Category, Course
+
+CUBE_CACHE_KEY = 'catalog:facets:cube'
+CATEGORY_CACHE_KEY = 'catalog:facets:categories'
+CUBE_CACHE_TIMEOUT = 60 * 60
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('free', 'Free', None, None),
+    ('under-50', 'Under $50', 0, 50),
+    ('50-100', '$50 - $100', 50, 100),
+    ('100-200', '$100 - $200', 100, 200),
+    ('200-plus', '$200+', 200, None),
+]
+
+# (GET parameter, cube column, "all" option label)
+FACETS = [
+    ('category', 'category_id', 'All Categories'),
+    ('level', 'level', 'All Levels'),
+    ('duration', 'duration', 'Any Duration'),
+    ('price', 'price_band', 'Any Price'),
+]
+
+
+def _price_band_q(key):
+    for band, _, low, high in PRICE_BANDS:
+        if band != key:
+            continue
+        if band == 'free':
+            return Q(price__isnull=True) | Q(price=0)
+        q = Q(price__gt=0) & Q(price__gte=low)
+        if high is not None:
+            q &= Q(price__lt=high)
+        return q
+    return Q(pk__in=[])
+
+
+def price_band_expression():
+    return Case(
+        *[When(_price_band_q(band), then=Value(band)) for band, _, _, _ in PRICE_BANDS],
+        output_field=CharField(),
+    )
+
+
+def selected_facets(request):
+    """``{column: set(values)}`` for every facet present in the query string."""
+    selected = {}
+    for param, column, _ in FACETS:
+        values = {v for v in request.GET.getlist(param) if v}
+        if column == 'category_id':
+            values = {int(v) for v in values if v.isdigit()}
+        if values:
+            selected[column] = values
+    return selected
+
+
+def apply_facets(queryset, selected):
+    for column, values in selected.items():
+        if column == 'price_band':
+            q = Q()
+            for band in values:
+                q |= _price_band_q(band)
+            queryset = queryset.filter(q)
+        else:
+            queryset = queryset.filter(**{f'{column}__in': values})
+    return queryset
+
+
+def _build_cube(queryset):
+    return list(
+        queryset.order_by()
+        .annotate(price_band=price_band_expression())
+        .values('category_id', 'level', 'duration', 'price_band')
+        .annotate(n=Count('id'))
+    )
+
+
+def catalog_cube():
+    cube = cache.get(CUBE_CACHE_KEY)
+    if cube is None:
+        cube = _build_cube(Course.objects.all())
+        cache.set(CUBE_CACHE_KEY, cube, CUBE_CACHE_TIMEOUT)
+    return cube
+
+
+def category_names():
+    names = cache.get(CATEGORY_CACHE_KEY)
+    if names is None:
+        names = dict(Category.objects.order_by('name').values_list('id', 'name'))
+        cache.set(CATEGORY_CACHE_KEY, names, CUBE_CACHE_TIMEOUT)
+    return names
+
+
+def invalidate():
+    cache.delete_many([CUBE_CACHE_KEY, CATEGORY_CACHE_KEY])
+
+
+def _labels():
+    return {
+        'category_id': category_names(),
+        'level': dict(Course.LEVEL_CHOICES),
+        'duration': dict(Course.DURATION_CHOICES),
+        'price_band': {band: label for band, label, _, _ in PRICE_BANDS},
+    }
+
+
+def facet_summary(selected, queryset=None):
+    """
+    Return ``(facets, total)`` for the template.
+
+    Each facet's counts honour every *other* selected facet but not its own,
+    so users can see how many results switching a value would give.
+    ``queryset`` narrows the cube (e.g. to keyword matches); without it the
+    cached whole-catalog cube is used.
+    """
+    cube = catalog_cube() if queryset is None else _build_cube(queryset)
+    columns = [column for _, column, _ in FACETS]
+
+    counts = {column: Counter() for column in columns}
+    total = 0
+    for row in cube:
+        misses = [c for c in columns if c in selected and row[c] not in selected[c]]
+        if not misses:
+            total += row['n']
+        for column in columns:
+            if not misses or misses == [column]:
+                counts[column][row[column]] += row['n']
+
+    labels = _labels()
+    facets = []
+    for param, column, all_label in FACETS:
+        order = list(labels[column])
+        options = [
+            {
+                'value': value,
+                'label': labels[column].get(value, value),
+                'count': counts[column].get(value, 0),
+                'selected': value in selected.get(column, ()),
+            }
+            for value in order
+            if counts[column].get(value) or value in selected.get(column, ())
+        ]
+        facets.append({'param': param, 'all_label': all_label, 'options': options})
+    return facets, total
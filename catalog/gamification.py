@@ -0,0 +1,149 @@
+# catalog/gamification.py
+"""
+Points and XP as an append-only ledger (PointsEntry).
+
+Every award is a ledger row with a unique idempotency key such as
+``lesson:42:user:7``, so retries and double clicks never pay out twice.
+The profile is then moved with a single UPDATE: ``points`` and
+``total_xp`` with F() increments, and level, in-level XP, next-level
+requirement and badge recomputed from the new totals in the same
+statement, so concurrent awards cannot lose increments.
+
+Levels need ``LEVEL_BASE_XP * LEVEL_GROWTH ** (level - 1)`` XP each, so the
+total needed to reach level L is a geometric series and the level for a
+total T has a closed form::
+
+    total(L) = B * (G ** (L - 1) - 1) / (G - 1)
+    level(T) = 1 + floor(log(T * (G - 1) / B + 1) / log(G))
+
+``manage.py replay_points_ledger`` rebuilds every profile and leaderboard
+(catalog/leaderboards.py) from the ledger.
+"""
+import math
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, CharField, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Floor, Ln, Power
+from django.db.models.lookups import GreaterThanOrEqual
+
+from . import leaderboards
+from .models import PointsEntry, Profile
+
+LEVEL_BASE_XP = 100
+LEVEL_GROWTH = 1.5
+# Guards floor() against log rounding right at a level boundary
+_EPSILON = 1e-9
+
+# kind: (points, xp)
+AWARDS = {
+    PointsEntry.LESSON_COMPLETED: (10, 20),
+    PointsEntry.COURSE_COMPLETED: (100, 200),
+}
+
+BADGES = [  # (minimum points, badge), highest first
+    (1000, 'Gold'),
+    (500, 'Silver'),
+    (100, 'Bronze'),
+]
+
+
+# ------------------------------------------------------------------
+# Closed-form level maths (Python and SQL versions agree)
+# ------------------------------------------------------------------
+def xp_for_level(level):
+    """Total XP needed to reach ``level``."""
+    return LEVEL_BASE_XP * (LEVEL_GROWTH ** (level - 1) - 1) / (LEVEL_GROWTH - 1)
+
+
+def level_for_xp(total_xp):
+    ratio = total_xp * (LEVEL_GROWTH - 1) / LEVEL_BASE_XP + 1
+    return 1 + math.floor(math.log(ratio) / math.log(LEVEL_GROWTH) + _EPSILON)
+
+
+def level_progress(total_xp):
+    """``(level, xp into that level, xp the level needs)`` for a lifetime total."""
+    level = level_for_xp(total_xp)
+    return (
+        level,
+        int(total_xp - math.floor(xp_for_level(level))),
+        math.floor(LEVEL_BASE_XP * LEVEL_GROWTH ** (level - 1)),
+    )
+
+
+def badge_for_points(points):
+    for minimum, badge in BADGES:
+        if points >= minimum:
+            return badge
+    return None
+
+
+def _level_expression(total_xp):
+    ratio = Cast(total_xp, FloatField()) * (LEVEL_GROWTH - 1) / LEVEL_BASE_XP + 1
+    return Cast(
+        Floor(Ln(ratio) / math.log(LEVEL_GROWTH) + _EPSILON) + 1,
+        IntegerField(),
+    )
+
+
+def _profile_columns(points, total_xp):
+    """SET clause for new ``points`` / ``total_xp`` expressions; everything derived in SQL."""
+    level = _level_expression(total_xp)
+    growth = Power(Value(LEVEL_GROWTH), level - 1)
+    return {
+        'points': points,
+        'total_xp': total_xp,
+        'user_level': level,
+        'user_xp': Cast(total_xp - Floor(LEVEL_BASE_XP * (growth - 1) / (LEVEL_GROWTH - 1)), IntegerField()),
+        'user_level_xp': Cast(Floor(LEVEL_BASE_XP * growth), IntegerField()),
+        'badge': Case(
+            *[When(GreaterThanOrEqual(points, minimum), then=Value(badge)) for minimum, badge in BADGES],
+            default=Value(None),
+            output_field=CharField(),
+        ),
+    }
+
+
+# ------------------------------------------------------------------
+# Awards
+# ------------------------------------------------------------------
+def award(user_id, kind, key, course_id=None, points=None, xp=None):
+    """
+    Append a ledger entry and apply it to the profile and the leaderboards in
+    one transaction.  Returns False if ``key`` was already awarded.
+    """
+    default_points, default_xp = AWARDS.get(kind, (0, 0))
+    points = default_points if points is None else points
+    xp = default_xp if xp is None else xp
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                PointsEntry.objects.create(
+                    user_id=user_id, course_id=course_id, kind=kind, key=key, points=points, xp=xp,
+                )
+        except IntegrityError:
+            return False
+        Profile.objects.filter(user_id=user_id).update(
+            **_profile_columns(F('points') + points, F('total_xp') + xp)
+        )
+        leaderboards.record(user_id, points, course_id)
+    return True
+
+
+def replay(user_ids=None):
+    """Set every profile's totals from the ledger and re-derive level and badge."""
+    def total(field):
+        return Coalesce(
+            Subquery(
+                PointsEntry.objects.filter(user_id=OuterRef('user_id'))
+                .order_by().values('user_id').annotate(value=Sum(field)).values('value')
+            ),
+            0,
+        )
+
+    profiles = Profile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(**_profile_columns(total('points'), total('xp')))
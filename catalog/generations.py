@@ -0,0 +1,52 @@
+# catalog/generations.py
+"""
+Generation counters for cache invalidation.
+
+A generation is a number stored in the cache under a name such as
+``'course'`` or ``'course:42'``.  Cached values put the generations they
+depend on into their own keys; signals bump a generation when the rows
+behind it change, and entries cached under the old number are simply never
+read again.  Nothing has to be found and deleted.
+
+Generations live in the default cache, so a bump is only seen by the
+processes sharing it; see CACHES in project/settings.py.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _key(name):
+    return f'catalog:generation:{name}'
+
+
+def _fresh():
+    # Time-based, so a counter lost to eviction never restarts at a number
+    # an older cached entry was stored under.
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    """``{name: generation}`` for every name, in one cache round trip."""
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    generations = {}
+    for key, name in keys.items():
+        if key not in found:
+            value = _fresh()
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+            found[key] = value
+        generations[name] = found[key]
+    return generations
+
+
+def get_generation(name):
+    return get_generations(name)[name]
+
+
+def bump_generation(name):
+    try:
+        cache.incr(_key(name))
+    except ValueError:
+        cache.set(_key(name), _fresh(), None)
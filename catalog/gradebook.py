@@ -0,0 +1,179 @@
+# catalog/gradebook.py
+"""
+Course gradebook: students x quizzes.
+
+All QuizResult rows of a course are read with one query and every quiz's
+question count with another, then pivoted into dense NumPy arrays: the
+summed score and the number of attempts per (student, quiz).  A student's
+percentage is their total score over the questions of every attempt, the
+same rule the certificate has always used, so a cohort costs two queries
+instead of one per result.  Class means, percentile ranks and letter
+grades are computed on whole columns.
+
+``recompute_grades`` writes every student's percentage to
+``Enrollment.grade`` in bulk (``manage.py recompute_grades``).
+"""
+from django.db.models import Count
+
+from .models import Enrollment, Quiz, QuizResult
+
+try:
+    import numpy as np
+except ImportError:  # only the cohort matrix needs it
+    np = None
+
+# (minimum percentage, letter), highest first
+LETTERS = [(90, 'A'), (80, 'B'), (70, 'C'), (60, 'D')]
+FAIL_LETTER = 'F'
+
+# (minimum percentage, certificate badge), highest first
+BADGES = [(90, 'DISTINCTION'), (75, 'MERIT')]
+PASS_BADGE = 'PASS'
+# Certificate colour of each badge
+BADGE_COLORS = {'DISTINCTION': "#FFD700", 'MERIT': "#C0C0C0", 'PASS': "#CD7F32"}
+
+# Students per page of the instructor gradebook
+PAGE_SIZE = 100
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("NumPy is required for the gradebook (pip install numpy)")
+
+
+def _question_counts(course_id):
+    return dict(
+        Quiz.objects.filter(course_id=course_id)
+        .annotate(n=Count('questions'))
+        .values_list('id', 'n')
+    )
+
+
+def badge_for(percentage):
+    for minimum, badge in BADGES:
+        if percentage >= minimum:
+            return badge
+    return PASS_BADGE
+
+
+def student_percentage(user_id, course_id):
+    """One student's percentage over every attempt, or None without gradable attempts."""
+    questions = _question_counts(course_id)
+    correct = total = 0
+    for quiz_id, score in QuizResult.objects.filter(user_id=user_id, quiz__course_id=course_id).values_list(
+        'quiz_id', 'score',
+    ):
+        if questions.get(quiz_id):
+            correct += score
+            total += questions[quiz_id]
+    return correct * 100 / total if total else None
+
+
+# ------------------------------------------------------------------
+# Cohort matrix
+# ------------------------------------------------------------------
+class Gradebook:
+    """Rows follow ``user_ids``, columns ``quiz_ids``."""
+
+    def __init__(self, user_ids, quiz_ids, scores, attempts, questions):
+        self.user_ids = user_ids
+        self.quiz_ids = quiz_ids
+        self.scores = scores         # summed score per (student, quiz)
+        self.attempts = attempts     # number of attempts per (student, quiz)
+        self.questions = questions   # question count per quiz
+
+    @property
+    def cells(self):
+        """Average percentage per attempt for each (student, quiz); NaN where not attempted."""
+        possible = self.attempts * self.questions
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(possible > 0, self.scores * 100.0 / possible, np.nan)
+
+    @property
+    def percentages(self):
+        """Each student's total score over all questions attempted; NaN without gradable attempts."""
+        gradable = self.questions > 0
+        correct = (self.scores * gradable).sum(axis=1)
+        possible = (self.attempts * self.questions).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(possible > 0, correct * 100.0 / possible, np.nan)
+
+    @property
+    def quiz_means(self):
+        cells = self.cells
+        counts = (~np.isnan(cells)).sum(axis=0)
+        sums = np.nansum(cells, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def percentile_ranks(self):
+        """Share of graded students scoring at or below each student (0-100); NaN if ungraded."""
+        percentages = self.percentages
+        graded = np.sort(percentages[~np.isnan(percentages)])
+        if not len(graded):
+            return np.full(len(percentages), np.nan)
+        at_or_below = np.searchsorted(graded, np.nan_to_num(percentages), side='right')
+        return np.where(np.isnan(percentages), np.nan, at_or_below * 100.0 / len(graded))
+
+    def letters(self):
+        percentages = self.percentages
+        return np.select(
+            [percentages >= minimum for minimum, _ in LETTERS],
+            [letter for _, letter in LETTERS],
+            default=FAIL_LETTER,
+        )
+
+
+def build(course_id):
+    """Pivot the course's quiz results into a Gradebook over its enrolled students."""
+    _require_numpy()
+    user_ids = list(
+        Enrollment.objects.filter(course_id=course_id).order_by('user_id').values_list('user_id', flat=True)
+    )
+    questions = _question_counts(course_id)
+    quiz_ids = sorted(questions)
+
+    results = np.array(
+        list(QuizResult.objects.filter(quiz__course_id=course_id).values_list('user_id', 'quiz_id', 'score')),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    users = np.array(user_ids, dtype=np.int64)
+    quizzes = np.array(quiz_ids, dtype=np.int64)
+
+    # Results of students who have since unenrolled are dropped
+    rows = np.searchsorted(users, results[:, 0])
+    rows_ok = rows < len(users)
+    rows_ok[rows_ok] = users[rows[rows_ok]] == results[rows_ok, 0]
+    cols = np.searchsorted(quizzes, results[:, 1])
+    rows, cols, score = rows[rows_ok], cols[rows_ok], results[rows_ok, 2]
+
+    scores = np.zeros((len(users), len(quizzes)), dtype=np.float64)
+    attempts = np.zeros((len(users), len(quizzes)), dtype=np.int64)
+    np.add.at(scores, (rows, cols), score)
+    np.add.at(attempts, (rows, cols), 1)
+    return Gradebook(
+        user_ids=user_ids,
+        quiz_ids=quiz_ids,
+        scores=scores,
+        attempts=attempts,
+        questions=np.array([questions[pk] for pk in quiz_ids], dtype=np.int64),
+    )
+
+
+def recompute_grades(course_id, batch_size=1000):
+    """Write every graded student's percentage to Enrollment.grade. Returns the rows changed."""
+    book = build(course_id)
+    grades = {
+        user_id: f"{percentage:.1f}%"
+        for user_id, percentage in zip(book.user_ids, book.percentages.tolist())
+        if percentage == percentage  # not NaN
+    }
+    changed = []
+    enrollments = Enrollment.objects.filter(course_id=course_id).only('id', 'user_id', 'grade')
+    for enrollment in enrollments.iterator(chunk_size=batch_size):
+        grade = grades.get(enrollment.user_id)
+        if grade is not None and enrollment.grade != grade:
+            enrollment.grade = grade
+            changed.append(enrollment)
+    Enrollment.objects.bulk_update(changed, ['grade'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,203 @@
+# catalog/heartbeats.py
+"""
+Batched video heartbeats.
+
+Players POST a batch of ``(lesson_id, position, completed)`` events every
+few seconds.  Positions go into a process-local buffer keyed by
+``(user, lesson)``, so a student watching for ten minutes overwrites one
+entry instead of queueing a hundred writes; at most every FLUSH_INTERVAL
+seconds (or once MAX_PENDING entries are dirty) the latest positions are
+written with one bulk upsert of LessonProgress rows.  With
+``settings.LESSON_PROGRESS_BITSET`` there are no per-lesson rows to write
+to, so positions go into ``Enrollment.lesson_positions`` instead: one
+read and one bulk update per flush for all the enrollments involved.
+
+Completion is rare and visible on the next page, so it is written straight
+away through ``progress.complete_lesson``, once: lessons the student has
+already completed are skipped, so a video left playing past the threshold
+does not retry the completion on every heartbeat.  An event counts as
+completed when the player says so or when the position passes
+WATCH_THRESHOLD of the lesson's ``duration_seconds``.
+
+Positions must be finite (JSON allows NaN and Infinity) and are capped at
+the lesson's duration; an event without a usable position is dropped
+rather than failing the batch, and a flush never puts back a position
+that cannot be written.
+"""
+import atexit
+import math
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import lesson_bits, progress
+from .models import Enrollment, Lesson, LessonProgress
+
+WATCH_THRESHOLD = 0.9
+
+FLUSH_INTERVAL = 15
+MAX_PENDING = 1000
+MAX_EVENTS = 100
+
+
+class InvalidHeartbeat(ValueError):
+    pass
+
+
+def parse_events(payload):
+    """Validate a decoded JSON body (``{"events": [...]}`` or a bare list) into tuples."""
+    events = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        raise InvalidHeartbeat("Expected a list of events")
+    if len(events) > MAX_EVENTS:
+        raise InvalidHeartbeat(f"At most {MAX_EVENTS} events per batch")
+
+    parsed = []
+    for event in events:
+        try:
+            lesson_id = int(event['lesson_id'])
+            position = max(float(event.get('position') or 0), 0.0)
+        except (KeyError, TypeError, ValueError):
+            raise InvalidHeartbeat("Each event needs a lesson_id and a numeric position")
+        if not math.isfinite(position):
+            continue
+        parsed.append((lesson_id, position, bool(event.get('completed'))))
+    return parsed
+
+
+def valid_position(position):
+    return isinstance(position, (int, float)) and math.isfinite(position) and position >= 0
+
+
+def watched_enough(position, duration_seconds):
+    return bool(duration_seconds) and position >= duration_seconds * WATCH_THRESHOLD
+
+
+class PositionBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, user_id, lesson_id, position, course_id):
+        with self._lock:
+            self._pending[user_id, lesson_id] = (course_id, position)
+            dirty = len(self._pending)
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due or dirty >= MAX_PENDING:
+            try:
+                self.flush()
+            except Exception:
+                pass  # positions were put back; a heartbeat must not fail on them
+
+    def flush(self):
+        """Upsert every buffered position; returns the number of rows written."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._last_flush = time.monotonic()
+        # A bad position would fail the whole upsert, and being put back, every one after it
+        pending = {key: entry for key, entry in pending.items() if valid_position(entry[1])}
+        if not pending:
+            return 0
+
+        try:
+            if lesson_bits.enabled():
+                _write_enrollment_positions(pending)
+            else:
+                LessonProgress.objects.bulk_create(
+                    [
+                        LessonProgress(user_id=user_id, lesson_id=lesson_id, position=position)
+                        for (user_id, lesson_id), (_, position) in pending.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['user', 'lesson'],
+                    update_fields=['position'],
+                )
+        except Exception:
+            # Newer positions recorded meanwhile win over the ones being put back
+            with self._lock:
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+            raise
+        return len(pending)
+
+
+def _write_enrollment_positions(pending):
+    """Merge buffered positions into each enrollment's ``lesson_positions``."""
+    by_enrollment = {}
+    for (user_id, lesson_id), (course_id, position) in pending.items():
+        by_enrollment.setdefault((user_id, course_id), {})[str(lesson_id)] = position
+
+    match = Q()
+    for user_id, course_id in by_enrollment:
+        match |= Q(user_id=user_id, course_id=course_id)
+    with transaction.atomic():
+        enrollments = list(
+            Enrollment.objects.select_for_update().filter(match).only('id', 'user_id', 'course_id', 'lesson_positions')
+        )
+        for enrollment in enrollments:
+            enrollment.lesson_positions = {
+                **(enrollment.lesson_positions or {}),
+                **by_enrollment[enrollment.user_id, enrollment.course_id],
+            }
+        Enrollment.objects.bulk_update(enrollments, ['lesson_positions'])
+
+
+position_buffer = PositionBuffer()
+
+
+def record_heartbeats(user, events):
+    """
+    Buffer positions and complete lessons for ``events`` from ``parse_events``.
+    Only lessons of courses the user is enrolled in are accepted.  Returns
+    ``(accepted_lesson_ids, completed_lesson_ids, rejected_lesson_ids)``.
+    """
+    lesson_ids = {lesson_id for lesson_id, _, _ in events}
+    lessons = Lesson.objects.filter(
+        id__in=lesson_ids, course__enrollment__user=user,
+    ).only('id', 'course_id', 'duration_seconds', 'bit_index').in_bulk()
+
+    accepted, completed = set(), set()
+    for lesson_id, position, done in events:
+        lesson = lessons.get(lesson_id)
+        if lesson is None:
+            continue
+        accepted.add(lesson_id)
+        if lesson.duration_seconds:
+            position = min(position, float(lesson.duration_seconds))
+        position_buffer.record(user.pk, lesson_id, position, lesson.course_id)
+        if done or watched_enough(position, lesson.duration_seconds):
+            completed.add(lesson_id)
+
+    for lesson_id in completed - _already_completed(user, [lessons[pk] for pk in completed]):
+        progress.complete_lesson(user, lessons[lesson_id])
+    return sorted(accepted), sorted(completed), sorted(lesson_ids - accepted)
+
+
+def _already_completed(user, lessons):
+    """Ids of ``lessons`` the user has completed: one query, none without lessons."""
+    if not lessons:
+        return set()
+    if lesson_bits.enabled():
+        bits = dict(
+            Enrollment.objects.filter(user=user, course_id__in={lesson.course_id for lesson in lessons})
+            .values_list('course_id', 'lesson_bits')
+        )
+        return {
+            lesson.pk for lesson in lessons
+            if lesson.bit_index is not None and lesson_bits.test_bit(bits.get(lesson.course_id), lesson.bit_index)
+        }
+    return set(
+        LessonProgress.objects.filter(user=user, lesson__in=lessons, completed=True).values_list('lesson_id', flat=True)
+    )
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        position_buffer.flush()
+    except Exception:
+        pass
@@ -0,0 +1,213 @@
+# catalog/leaderboards.py
+"""
+Global, per-course and weekly leaderboards.
+
+Every board is a set of LeaderboardEntry rows (``board``, ``user``,
+``score``) with an index on ``(board, -score)``.  Points awarded through
+the ledger (catalog/gamification.py) are added to the ``global`` board,
+the ``course:<id>`` board of the course they were earned in and the
+``week:<year>-W<week>`` board of the current ISO week, in the same
+transaction as the ledger entry.  Weeks run Monday to Sunday in the
+current time zone, for awards and rebuilds alike (see ``week_board``).
+
+"My rank" does not count everyone above the user.  Each board keeps a
+histogram of how many users have a score in ``[b * BUCKET_WIDTH, (b + 1) *
+BUCKET_WIDTH)`` (LeaderboardBucket), so a rank is the sum of the buckets
+above the user's plus an index range count inside their own bucket; the
+cost depends on the score range, not on the number of users.
+
+The top TOP_N of each board is cached and patched in place after each
+award: scores only go up, so a user enters the cached list only by
+passing its last entry.  ``manage.py replay_points_ledger`` rebuilds every
+board from the ledger.
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .generations import bump_generation, get_generation
+from .models import LeaderboardBucket, LeaderboardEntry, PointsEntry
+
+GLOBAL = 'global'
+
+BUCKET_WIDTH = 50
+TOP_N = 50
+TOP_TIMEOUT = 60 * 10
+
+
+def course_board(course_id):
+    return f'course:{course_id}'
+
+
+def week_board(when=None):
+    # Local date, as TruncWeek in rebuild() groups by the local week
+    year, week, _ = timezone.localdate(when).isocalendar()
+    return f'week:{year}-W{week:02d}'
+
+
+def bucket_for(score):
+    return score // BUCKET_WIDTH
+
+
+def boards_for(course_id=None, when=None):
+    boards = [GLOBAL, week_board(when)]
+    if course_id is not None:
+        boards.append(course_board(course_id))
+    return boards
+
+
+# ------------------------------------------------------------------
+# Incremental updates (run inside the ledger transaction)
+# ------------------------------------------------------------------
+def _bump_bucket(board, bucket, delta):
+    buckets = LeaderboardBucket.objects.filter(board=board, bucket=bucket)
+    if buckets.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LeaderboardBucket.objects.create(board=board, bucket=bucket, count=delta)
+    except IntegrityError:
+        buckets.update(count=F('count') + delta)
+
+
+def _add(board, user_id, points):
+    """Add ``points`` to the user's score on ``board``; returns the new score."""
+    entries = LeaderboardEntry.objects.filter(board=board, user_id=user_id)
+    old = entries.select_for_update().values_list('score', flat=True).first()
+    if old is None:
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(board=board, user_id=user_id, score=points)
+        except IntegrityError:
+            old = entries.select_for_update().values_list('score', flat=True).first()
+    if old is not None:
+        entries.update(score=F('score') + points)
+
+    new = (old or 0) + points
+    if old is None:
+        _bump_bucket(board, bucket_for(new), 1)
+    elif bucket_for(old) != bucket_for(new):
+        _bump_bucket(board, bucket_for(old), -1)
+        _bump_bucket(board, bucket_for(new), 1)
+    return new
+
+
+def record(user_id, points, course_id=None, when=None):
+    """Add an award's points to every board it counts for."""
+    if not points:
+        return
+    scores = {board: _add(board, user_id, points) for board in boards_for(course_id, when)}
+
+    def patch():
+        for board, score in scores.items():
+            _patch_top(board, user_id, score)
+    transaction.on_commit(patch)
+
+
+# ------------------------------------------------------------------
+# Cached top-N
+# ------------------------------------------------------------------
+def _top_key(board):
+    return f'catalog:leaderboard:{get_generation("leaderboards")}:{board}'
+
+
+def _sort_key(row):
+    return -row['score'], row['user_id']
+
+
+def _patch_top(board, user_id, score):
+    key = _top_key(board)
+    rows = cache.get(key)
+    if rows is None:
+        return  # built on the next read
+    row = next((row for row in rows if row['user_id'] == user_id), None)
+    if row is not None:
+        row['score'] = score
+    elif len(rows) < TOP_N or _sort_key({'user_id': user_id, 'score': score}) < _sort_key(rows[-1]):
+        username = User.objects.filter(pk=user_id).values_list('username', flat=True).first()
+        rows.append({'user_id': user_id, 'username': username, 'score': score})
+    else:
+        return
+    rows.sort(key=_sort_key)
+    cache.set(key, rows[:TOP_N], TOP_TIMEOUT)
+
+
+def top(board, limit=TOP_N):
+    """``[{'user_id', 'username', 'score'}, ...]`` best first, at most TOP_N."""
+    key = _top_key(board)
+    rows = cache.get(key)
+    if rows is None:
+        rows = [
+            {'user_id': user_id, 'username': username, 'score': score}
+            for user_id, username, score in LeaderboardEntry.objects.filter(board=board)
+            .order_by('-score', 'user_id')
+            .values_list('user_id', 'user__username', 'score')[:TOP_N]
+        ]
+        cache.set(key, rows, TOP_TIMEOUT)
+    return rows[:limit]
+
+
+# ------------------------------------------------------------------
+# Rank lookup
+# ------------------------------------------------------------------
+def rank(board, user_id):
+    """``{'rank', 'score', 'total'}`` for the user on ``board``, or None if they are not on it."""
+    score = LeaderboardEntry.objects.filter(board=board, user_id=user_id).values_list('score', flat=True).first()
+    if score is None:
+        return None
+    bucket = bucket_for(score)
+    counts = LeaderboardBucket.objects.filter(board=board).aggregate(
+        above=Sum('count', filter=Q(bucket__gt=bucket)),
+        total=Sum('count'),
+    )
+    # Ties share a rank; only strictly higher scores in the user's own bucket are counted
+    within = LeaderboardEntry.objects.filter(
+        board=board, score__gt=score, score__lt=(bucket + 1) * BUCKET_WIDTH,
+    ).count()
+    return {'rank': 1 + (counts['above'] or 0) + within, 'score': score, 'total': counts['total'] or 0}
+
+
+# ------------------------------------------------------------------
+# Full rebuild from the ledger
+# ------------------------------------------------------------------
+def _board_totals():
+    ledger = PointsEntry.objects.order_by()
+    for user_id, points in ledger.values_list('user_id').annotate(points=Sum('points')):
+        yield GLOBAL, user_id, points
+    courses = ledger.filter(course__isnull=False).values_list('course_id', 'user_id').annotate(points=Sum('points'))
+    for course_id, user_id, points in courses:
+        yield course_board(course_id), user_id, points
+    # Opening balances are lifetime totals, not points earned that week
+    weeks = (
+        ledger.exclude(kind=PointsEntry.OPENING_BALANCE)
+        .annotate(week=TruncWeek('created_at'))
+        .values_list('week', 'user_id')
+        .annotate(points=Sum('points'))
+    )
+    for week, user_id, points in weeks:
+        yield week_board(week), user_id, points
+
+
+def rebuild(batch_size=1000):
+    """Replace every board and histogram with totals summed from the ledger. Returns the entry count."""
+    entries, buckets = [], Counter()
+    for board, user_id, points in _board_totals():
+        if points:
+            entries.append(LeaderboardEntry(board=board, user_id=user_id, score=points))
+            buckets[board, bucket_for(points)] += 1
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardBucket.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
+        LeaderboardBucket.objects.bulk_create(
+            [LeaderboardBucket(board=board, bucket=bucket, count=n) for (board, bucket), n in buckets.items()],
+            batch_size=batch_size,
+        )
+    bump_generation('leaderboards')
+    return len(entries)
@@ -0,0 +1,176 @@
+# catalog/lesson_bits.py
+"""
+Compact lesson completion: one bitset per Enrollment.
+
+With ``settings.LESSON_PROGRESS_BITSET = True`` a completed lesson sets bit
+``lesson.bit_index`` of ``Enrollment.lesson_bits`` instead of writing a
+LessonProgress row.  ``bit_index`` is a per-course slot assigned when the
+lesson is created, so reordering lessons never moves bits.  A course with
+200 lessons costs 25 bytes per student instead of 200 rows and their index
+entries.
+
+Bit ``i`` lives in byte ``i // 8`` at position ``i % 8`` (little-endian bit
+order), which is what ``numpy.unpackbits(..., bitorder='little')`` expects,
+so a whole course cohort can be unpacked into a students x lessons matrix
+in one call.  ``manage.py convert_lesson_progress`` builds the bitsets from
+existing LessonProgress rows.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from . import user_stats
+from .models import Enrollment, Lesson, LessonProgress
+
+try:
+    import numpy as np
+except ImportError:  # only cohort aggregation needs it
+    np = None
+
+
+def enabled():
+    return getattr(settings, 'LESSON_PROGRESS_BITSET', False)
+
+
+# ------------------------------------------------------------------
+# Bit operations on bytes
+# ------------------------------------------------------------------
+def test_bit(data, index):
+    byte = index >> 3
+    return bool(data) and byte < len(data) and bool(data[byte] >> (index & 7) & 1)
+
+
+def set_bit(data, index):
+    buf = bytearray(data or b'')
+    byte = index >> 3
+    if byte >= len(buf):
+        buf.extend(bytes(byte + 1 - len(buf)))
+    buf[byte] |= 1 << (index & 7)
+    return bytes(buf)
+
+
+def clear_bit(data, index):
+    buf = bytearray(data or b'')
+    byte = index >> 3
+    if byte < len(buf):
+        buf[byte] &= ~(1 << (index & 7)) & 0xFF
+    return bytes(buf)
+
+
+def popcount(data):
+    return int.from_bytes(data or b'', 'little').bit_count()
+
+
+def from_indexes(indexes):
+    value = 0
+    for index in indexes:
+        value |= 1 << index
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little') if value else b''
+
+
+# ------------------------------------------------------------------
+# Lesson slots
+# ------------------------------------------------------------------
+def next_bit_index(course_id):
+    last = Lesson.objects.filter(course_id=course_id).aggregate(last=Max('bit_index'))['last']
+    return 0 if last is None else last + 1
+
+
+# ------------------------------------------------------------------
+# Enrollment updates
+# ------------------------------------------------------------------
+def complete_lesson(user, lesson):
+    """
+    Set the lesson's bit on the user's enrollment; completing it twice counts
+    once.  Returns False when the user is not enrolled.
+    """
+    from .progress import progress_expression  # progress imports this module
+
+    with transaction.atomic():
+        enrollment = (
+            Enrollment.objects.select_for_update()
+            .filter(user=user, course_id=lesson.course_id)
+            .only('id', 'lesson_bits')
+            .first()
+        )
+        if enrollment is None:
+            return False
+        if test_bit(enrollment.lesson_bits, lesson.bit_index):
+            return True
+        bits = set_bit(enrollment.lesson_bits, lesson.bit_index)
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            lesson_bits=bits,
+            completed_lessons=popcount(bits),
+            progress=progress_expression(popcount(bits)),
+        )
+    user_stats.refresh([user.pk])
+    return True
+
+
+def refresh(enrollments, batch_size=500):
+    """Set ``completed_lessons`` from the popcount of each enrollment's bits."""
+    changed = []
+    for enrollment in enrollments.only('id', 'lesson_bits', 'completed_lessons').iterator(chunk_size=batch_size):
+        count = popcount(enrollment.lesson_bits)
+        if count != enrollment.completed_lessons:
+            enrollment.completed_lessons = count
+            changed.append(enrollment)
+    Enrollment.objects.bulk_update(changed, ['completed_lessons'], batch_size=batch_size)
+    return len(changed)
+
+
+def clear_lesson(lesson, batch_size=500):
+    """Drop a deleted lesson's bit from every enrollment so its slot can be reused."""
+    if lesson.bit_index is None:
+        return
+    changed = []
+    enrollments = Enrollment.objects.filter(course_id=lesson.course_id, lesson_bits__isnull=False)
+    for enrollment in enrollments.only('id', 'lesson_bits').iterator(chunk_size=batch_size):
+        if test_bit(enrollment.lesson_bits, lesson.bit_index):
+            enrollment.lesson_bits = clear_bit(enrollment.lesson_bits, lesson.bit_index)
+            changed.append(enrollment)
+    Enrollment.objects.bulk_update(changed, ['lesson_bits'], batch_size=batch_size)
+
+
+def lesson_progress_map(user, enrollment, lessons):
+    """``{lesson_id: LessonProgress or None}`` from the bits, shaped like the row-based map."""
+    bits = enrollment.lesson_bits if enrollment else None
+    return {
+        lesson.id: (
+            LessonProgress(user=user, lesson_id=lesson.id, completed=True)
+            if lesson.bit_index is not None and test_bit(bits, lesson.bit_index) else None
+        )
+        for lesson in lessons
+    }
+
+
+# ------------------------------------------------------------------
+# Cohort aggregation
+# ------------------------------------------------------------------
+def cohort_matrix(course_id):
+    """
+    ``(enrollment_ids, matrix)``: one row per enrollment of the course, one
+    boolean column per bit slot.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for cohort aggregation (pip install numpy)")
+    rows = list(Enrollment.objects.filter(course_id=course_id).values_list('id', 'lesson_bits'))
+    width = max((len(bits or b'') for _, bits in rows), default=0)
+    packed = np.zeros((len(rows), width), dtype=np.uint8)
+    for i, (_, bits) in enumerate(rows):
+        if bits:
+            packed[i, :len(bits)] = np.frombuffer(bytes(bits), dtype=np.uint8)
+    matrix = np.unpackbits(packed, axis=1, bitorder='little').astype(bool)
+    return [pk for pk, _ in rows], matrix
+
+
+def lesson_completion_rates(course_id):
+    """``{lesson_id: fraction of enrolled students who completed it}``."""
+    _, matrix = cohort_matrix(course_id)
+    counts = matrix.sum(axis=0) if len(matrix) else np.zeros(0, dtype=np.int64)
+    students = max(len(matrix), 1)
+    rates = {}
+    for lesson_id, index in Lesson.objects.filter(course_id=course_id).values_list('id', 'bit_index'):
+        hits = int(counts[index]) if index is not None and index < len(counts) else 0
+        rates[lesson_id] = hits / students
+    return rates
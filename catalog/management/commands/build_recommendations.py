@@ -0,0 +1,22 @@
+# catalog/management/commands/build_recommendations.py
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import recommendations
+
+
+class Command(BaseCommand):
+    help = "Build 'students also enrolled in' neighbours from enrollment co-occurrence"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recount every pair instead of folding in new enrollments")
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        build = recommendations.build_full if options['full'] else recommendations.build_incremental
+        try:
+            count = build(top_k=options['top_k'], batch_size=options['batch_size'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} neighbour rows"))
@@ -0,0 +1,15 @@
+# catalog/management/commands/compute_course_ranks.py
+from django.core.management.base import BaseCommand
+
+from catalog import ranking
+
+
+class Command(BaseCommand):
+    help = "Recompute time-decayed trending/popular scores for every course"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = ranking.rebuild_ranks(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {count} courses"))
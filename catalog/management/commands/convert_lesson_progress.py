@@ -0,0 +1,58 @@
+# catalog/management/commands/convert_lesson_progress.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import lesson_bits, progress
+from catalog.models import Enrollment, LessonProgress
+
+
+class Command(BaseCommand):
+    help = "Build per-enrollment lesson bitsets (and video positions) from LessonProgress rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--delete-rows', action='store_true',
+                            help="Delete the converted LessonProgress rows afterwards")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        completed = {}
+        rows = (
+            LessonProgress.objects.filter(completed=True, lesson__bit_index__isnull=False)
+            .values_list('user_id', 'lesson__course_id', 'lesson__bit_index')
+            .order_by()
+        )
+        for user_id, course_id, bit_index in rows.iterator(chunk_size=batch_size):
+            completed.setdefault((user_id, course_id), []).append(bit_index)
+
+        positions = {}
+        rows = (
+            LessonProgress.objects.filter(position__gt=0)
+            .values_list('user_id', 'lesson__course_id', 'lesson_id', 'position')
+            .order_by()
+        )
+        for user_id, course_id, lesson_id, position in rows.iterator(chunk_size=batch_size):
+            positions.setdefault((user_id, course_id), {})[str(lesson_id)] = position
+
+        with transaction.atomic():
+            batch = []
+            for enrollment in Enrollment.objects.only('id', 'user_id', 'course_id').iterator(chunk_size=batch_size):
+                bits = lesson_bits.from_indexes(completed.get((enrollment.user_id, enrollment.course_id), ()))
+                enrollment.lesson_bits = bits or None
+                enrollment.completed_lessons = lesson_bits.popcount(bits)
+                enrollment.lesson_positions = positions.get((enrollment.user_id, enrollment.course_id), {})
+                batch.append(enrollment)
+                if len(batch) >= batch_size:
+                    Enrollment.objects.bulk_update(batch, ['lesson_bits', 'completed_lessons', 'lesson_positions'])
+                    batch = []
+            Enrollment.objects.bulk_update(batch, ['lesson_bits', 'completed_lessons', 'lesson_positions'])
+            progress.rescale_all()
+
+            deleted = 0
+            if options['delete_rows']:
+                deleted, _ = LessonProgress.objects.all().delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {len(completed)} enrollments' progress to bitsets; deleted {deleted} rows"
+        ))
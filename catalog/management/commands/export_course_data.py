@@ -0,0 +1,37 @@
+# catalog/management/commands/export_course_data.py
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import exports
+from catalog.models import Course
+
+
+class Command(BaseCommand):
+    help = "Stream a course's roster, progress and quiz results as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--after', type=int, help="Resume after this enrollment id (appends to --output)")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        course_id = options['course_id']
+        if not Course.objects.filter(pk=course_id).exists():
+            raise CommandError(f"Course {course_id} does not exist")
+
+        after = options['after']
+        records = exports.rows(course_id, after=after, chunk_size=options['chunk_size'])
+        output = options['output']
+        lines = exports.lines(records, options['format'], header=after is None)
+        if not output:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(output, 'a' if after else 'w', newline='', encoding='utf-8') as out:
+            for line in lines:
+                out.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} lines to {output}"))
@@ -0,0 +1,26 @@
+# catalog/management/commands/process_quiz_submissions.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog import submissions
+
+
+class Command(BaseCommand):
+    help = "Grade pending quiz submissions in batches into QuizResult rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=submissions.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep running, polling for new submissions")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not options['loop']:
+            graded = submissions.process_all(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Graded {graded} submissions"))
+            return
+
+        while True:
+            if not submissions.process_pending(batch_size=batch_size):
+                time.sleep(options['interval'])
@@ -0,0 +1,15 @@
+# catalog/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text course search index"
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(self.style.WARNING("Full-text index is only used on SQLite; nothing to do."))
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} courses"))
@@ -0,0 +1,12 @@
+# catalog/management/commands/rebuild_skill_index.py
+from django.core.management.base import BaseCommand
+
+from catalog import skills
+
+
+class Command(BaseCommand):
+    help = "Re-parse Course.skills into skill tags, MinHash signatures and LSH buckets"
+
+    def handle(self, *args, **options):
+        count = skills.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed skills for {count} courses"))
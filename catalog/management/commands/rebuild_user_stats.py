@@ -0,0 +1,15 @@
+# catalog/management/commands/rebuild_user_stats.py
+from django.core.management.base import BaseCommand
+
+from catalog import user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized my_courses/profile stats row of every user"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = user_stats.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users"))
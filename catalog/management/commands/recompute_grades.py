@@ -0,0 +1,23 @@
+# catalog/management/commands/recompute_grades.py
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import gradebook
+from catalog.models import Course
+
+
+class Command(BaseCommand):
+    help = "Recompute Enrollment.grade from quiz results with the vectorized gradebook"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help="Only this course (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        course_ids = options['course'] or list(Course.objects.values_list('id', flat=True))
+        changed = 0
+        try:
+            for course_id in course_ids:
+                changed += gradebook.recompute_grades(course_id, batch_size=options['batch_size'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Updated {changed} grades in {len(course_ids)} courses"))
@@ -0,0 +1,15 @@
+# catalog/management/commands/reconcile_course_counters.py
+from django.core.management.base import BaseCommand
+
+from catalog import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute per-course enrollment/lesson/review counters and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected counters on {fixed} courses"))
@@ -0,0 +1,15 @@
+# catalog/management/commands/reconcile_enrollment_progress.py
+from django.core.management.base import BaseCommand
+
+from catalog import progress
+
+
+class Command(BaseCommand):
+    help = "Recount completed lessons per enrollment and rewrite Enrollment.progress"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fixed = progress.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected completed-lesson counts on {fixed} enrollments"))
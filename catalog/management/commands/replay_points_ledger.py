@@ -0,0 +1,23 @@
+# catalog/management/commands/replay_points_ledger.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from catalog import gamification, leaderboards
+
+
+class Command(BaseCommand):
+    help = "Rebuild profile points, XP, level, badge and the leaderboards from the points ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(User.objects.values_list('id', flat=True).order_by('id'))
+        count = 0
+        for start in range(0, len(ids), batch_size):
+            count += gamification.replay(ids[start:start + batch_size])
+        entries = leaderboards.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed the ledger into {count} profiles and {entries} leaderboard entries"
+        ))
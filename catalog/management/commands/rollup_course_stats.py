@@ -0,0 +1,16 @@
+# catalog/management/commands/rollup_course_stats.py
+from django.core.management.base import BaseCommand
+
+from catalog import rollups
+
+
+class Command(BaseCommand):
+    help = "Fold new enrollments, completions, quiz attempts and forum posts into the daily course rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Discard the rollups and recount everything")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rollups.roll_up(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated {written} daily course stats"))
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+CREATE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS catalog_course_fts USING fts5(
+        title, description, skills, instructor,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+POPULATE_SQL = """
+    INSERT INTO catalog_course_fts (rowid, title, description, skills, instructor)
+    SELECT c.id, c.title, c.description, c.skills,
+           u.username || ' ' || u.first_name || ' ' || u.last_name
+    FROM catalog_course c
+    JOIN auth_user u ON u.id = c.instructor_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS catalog_course_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0028_alter_course_duration'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:37
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('catalog', 'Course')
+    Enrollment = apps.get_model('catalog', 'Enrollment')
+    Lesson = apps.get_model('catalog', 'Lesson')
+    Review = apps.get_model('catalog', 'Review')
+
+    enrollments = dict(Enrollment.objects.values_list('course').annotate(n=Count('id')).order_by())
+    lessons = dict(Lesson.objects.values_list('course').annotate(n=Count('id')).order_by())
+    reviews = {
+        row['course']: (row['n'], row['total'])
+        for row in Review.objects.values('course').annotate(n=Count('id'), total=Sum('rating')).order_by()
+    }
+
+    courses = list(Course.objects.all())
+    for course in courses:
+        course.enrollment_count = enrollments.get(course.pk, 0)
+        course.lesson_count = lessons.get(course.pk, 0)
+        course.review_count, course.rating_sum = reviews.get(course.pk, (0, 0))
+        course.rating = course.rating_sum / course.review_count if course.review_count else 0.0
+    Course.objects.bulk_update(
+        courses, ['enrollment_count', 'lesson_count', 'review_count', 'rating_sum', 'rating'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0030_course_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='rating',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
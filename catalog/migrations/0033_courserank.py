@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0032_view_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRank',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='catalog.course')),
+                ('trending_score', models.FloatField(default=0.0)),
+                ('popular_score', models.FloatField(default=0.0)),
+                ('computed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trending_score', 'course'], name='rank_trending_idx'), models.Index(fields=['popular_score', 'course'], name='rank_popular_idx'), models.Index(fields=['category', 'trending_score', 'course'], name='rank_cat_trending_idx'), models.Index(fields=['category', 'popular_score', 'course'], name='rank_cat_popular_idx')],
+            },
+        ),
+    ]
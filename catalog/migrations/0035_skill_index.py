@@ -0,0 +1,129 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+import hashlib
+import random
+import re
+import struct
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of the catalog/skills.py helpers as of this migration, so the
+# backfill does not change with that module.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250101)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_SEPARATORS = re.compile(r'[,;\n]')
+
+
+def skill_key(name):
+    return ' '.join(name.lower().split())
+
+
+def parse_skills(text):
+    seen = {}
+    for part in _SEPARATORS.split(text or ''):
+        name = ' '.join(part.split())
+        if name and skill_key(name) not in seen:
+            seen[skill_key(name)] = name[:100]
+    return [(name, key) for key, name in seen.items()]
+
+
+def skills_hash(keys):
+    return hashlib.md5('\n'.join(sorted(keys)).encode()).hexdigest()
+
+
+def _token_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+
+def minhash(keys):
+    hashes = [_token_hash(key) for key in keys]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature):
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f'<{ROWS}Q', *signature[band * ROWS:(band + 1) * ROWS])
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'little', signed=True))
+    return buckets
+
+
+def pack_signature(signature):
+    return struct.pack(f'<{NUM_PERM}Q', *signature)
+
+
+def backfill_skill_index(apps, schema_editor):
+    Course = apps.get_model('catalog', 'Course')
+    Skill = apps.get_model('catalog', 'Skill')
+    CourseSkillSignature = apps.get_model('catalog', 'CourseSkillSignature')
+    CourseSkillBand = apps.get_model('catalog', 'CourseSkillBand')
+
+    skills = {}
+    for course in Course.objects.only('id', 'skills').iterator():
+        parsed = parse_skills(course.skills)
+        if not parsed:
+            continue
+        for name, key in parsed:
+            if key not in skills:
+                skills[key] = Skill.objects.create(name=name, key=key)
+        course.skill_tags.set([skills[key] for _, key in parsed])
+
+        keys = [key for _, key in parsed]
+        signature = minhash(keys)
+        CourseSkillSignature.objects.create(
+            course=course, skills_hash=skills_hash(keys), signature=pack_signature(signature)
+        )
+        CourseSkillBand.objects.bulk_create([
+            CourseSkillBand(course=course, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(signature))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0034_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSkillSignature',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='skill_signature', serialize=False, to='catalog.course')),
+                ('skills_hash', models.CharField(max_length=32)),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='skill_tags',
+            field=models.ManyToManyField(blank=True, related_name='courses', to='catalog.skill'),
+        ),
+        migrations.CreateModel(
+            name='CourseSkillBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_bands', to='catalog.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='skill_band_bucket_idx')],
+                'unique_together': {('course', 'band')},
+            },
+        ),
+        migrations.RunPython(backfill_skill_index, migrations.RunPython.noop),
+    ]
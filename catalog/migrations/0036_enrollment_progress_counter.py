@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_progress(apps, schema_editor):
+    Course = apps.get_model('catalog', 'Course')
+    Enrollment = apps.get_model('catalog', 'Enrollment')
+    LessonProgress = apps.get_model('catalog', 'LessonProgress')
+
+    lesson_counts = dict(Course.objects.values_list('id', 'lesson_count'))
+    completed = {
+        (row['user'], row['lesson__course']): row['n']
+        for row in LessonProgress.objects.filter(completed=True)
+        .values('user', 'lesson__course').annotate(n=Count('id')).order_by()
+    }
+
+    enrollments = list(Enrollment.objects.all())
+    for enrollment in enrollments:
+        done = completed.get((enrollment.user_id, enrollment.course_id), 0)
+        lessons = lesson_counts.get(enrollment.course_id, 0)
+        enrollment.completed_lessons = done
+        if enrollment.is_completed:
+            enrollment.progress = 100.0
+        else:
+            enrollment.progress = min(done * 100.0 / lessons, 100.0) if lessons else 0.0
+    Enrollment.objects.bulk_update(enrollments, ['completed_lessons', 'progress'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0035_skill_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+def assign_bit_indexes(apps, schema_editor):
+    Lesson = apps.get_model('catalog', 'Lesson')
+    slots = {}
+    lessons = list(Lesson.objects.order_by('course_id', 'order', 'id'))
+    for lesson in lessons:
+        lesson.bit_index = slots.get(lesson.course_id, 0)
+        slots[lesson.course_id] = lesson.bit_index + 1
+    Lesson.objects.bulk_update(lessons, ['bit_index'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0036_enrollment_progress_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='lesson_bits',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='bit_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(assign_bit_indexes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='lesson',
+            unique_together={('course', 'bit_index')},
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:56
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# Frozen copy of catalog/user_stats.py's duration rule as of this migration
+HOURS_PER_WEEK = 5
+_DURATION = re.compile(r'(\d+)\s*(week|hour|minute)', re.I)
+
+
+def duration_hours(label):
+    match = _DURATION.search(label or '')
+    if not match:
+        return 0
+    amount, unit = int(match.group(1)), match.group(2).lower()
+    if unit == 'week':
+        return amount * HOURS_PER_WEEK
+    if unit == 'hour':
+        return amount
+    return amount // 60
+
+
+def backfill_user_stats(apps, schema_editor):
+    Enrollment = apps.get_model('catalog', 'Enrollment')
+    Review = apps.get_model('catalog', 'Review')
+    UserStats = apps.get_model('catalog', 'UserStats')
+
+    stats = {}
+    rows = Enrollment.objects.values_list('user_id', 'is_completed', 'progress', 'course__duration')
+    for user_id, is_completed, progress, duration in rows.iterator():
+        row = stats.setdefault(user_id, UserStats(user_id=user_id))
+        row.enrolled_count += 1
+        row.completed_count += is_completed
+        row.in_progress_count += not is_completed and progress > 0
+        row.new_count += progress == 0
+        row.progress_sum += progress
+        row.total_hours += duration_hours(duration)
+    for user_id, n in Review.objects.values_list('user_id').annotate(n=Count('id')).order_by():
+        stats.setdefault(user_id, UserStats(user_id=user_id)).review_count = n
+    UserStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('catalog', '0038_watch_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='learning_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('enrolled_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('in_progress_count', models.PositiveIntegerField(default=0)),
+                ('new_count', models.PositiveIntegerField(default=0)),
+                ('progress_sum', models.FloatField(default=0.0)),
+                ('total_hours', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:59
+
+import math
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the catalog/gamification.py level and badge rules as of
+# this migration, so the backfill does not change with that module.
+LEVEL_BASE_XP = 100
+LEVEL_GROWTH = 1.5
+_EPSILON = 1e-9
+BADGES = [(1000, 'Gold'), (500, 'Silver'), (100, 'Bronze')]
+
+
+def xp_for_level(level):
+    return LEVEL_BASE_XP * (LEVEL_GROWTH ** (level - 1) - 1) / (LEVEL_GROWTH - 1)
+
+
+def level_progress(total_xp):
+    ratio = total_xp * (LEVEL_GROWTH - 1) / LEVEL_BASE_XP + 1
+    level = 1 + math.floor(math.log(ratio) / math.log(LEVEL_GROWTH) + _EPSILON)
+    return (
+        level,
+        int(total_xp - math.floor(xp_for_level(level))),
+        math.floor(LEVEL_BASE_XP * LEVEL_GROWTH ** (level - 1)),
+    )
+
+
+def badge_for_points(points):
+    for minimum, badge in BADGES:
+        if points >= minimum:
+            return badge
+    return None
+
+def lifetime_xp(level, xp, level_xp=100):
+    """XP earned under the old loop, where each level needed int(previous * 1.5)."""
+    total = xp
+    for _ in range(level - 1):
+        total += level_xp
+        level_xp = int(level_xp * 1.5)
+    return total
+
+def open_points_ledger(apps, schema_editor):
+    Profile = apps.get_model('catalog', 'Profile')
+    PointsEntry = apps.get_model('catalog', 'PointsEntry')
+
+    entries, profiles = [], []
+    for profile in Profile.objects.iterator():
+        profile.total_xp = lifetime_xp(profile.user_level, profile.user_xp)
+        profile.user_level, profile.user_xp, profile.user_level_xp = level_progress(profile.total_xp)
+        profile.badge = badge_for_points(profile.points)
+        profiles.append(profile)
+        if profile.points or profile.total_xp:
+            entries.append(PointsEntry(
+                user_id=profile.user_id, kind='opening_balance', key=f'opening:user:{profile.user_id}',
+                points=profile.points, xp=profile.total_xp,
+            ))
+    PointsEntry.objects.bulk_create(entries, batch_size=500)
+    Profile.objects.bulk_update(
+        profiles, ['total_xp', 'user_level', 'user_xp', 'user_level_xp', 'badge'], batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0039_user_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='total_xp',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PointsEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lesson_completed', 'Lesson completed'), ('course_completed', 'Course completed'), ('opening_balance', 'Opening balance')], max_length=30)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('points', models.IntegerField(default=0)),
+                ('xp', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='catalog_poi_user_id_bf4c54_idx')],
+            },
+        ),
+        migrations.RunPython(open_points_ledger, migrations.RunPython.noop),
+    ]
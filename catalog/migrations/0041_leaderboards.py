@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the catalog/leaderboards.py board name and bucket rule as of this migration
+GLOBAL = 'global'
+BUCKET_WIDTH = 50
+
+
+def bucket_for(score):
+    return score // BUCKET_WIDTH
+
+
+def build_global_board(apps, schema_editor):
+    # The ledger only holds opening balances so far, and those belong to no course or week
+    Profile = apps.get_model('catalog', 'Profile')
+    LeaderboardEntry = apps.get_model('catalog', 'LeaderboardEntry')
+    LeaderboardBucket = apps.get_model('catalog', 'LeaderboardBucket')
+
+    entries, buckets = [], {}
+    for user_id, points in Profile.objects.filter(points__gt=0).values_list('user_id', 'points').iterator():
+        entries.append(LeaderboardEntry(board=GLOBAL, user_id=user_id, score=points))
+        buckets[bucket_for(points)] = buckets.get(bucket_for(points), 0) + 1
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+    LeaderboardBucket.objects.bulk_create(
+        [LeaderboardBucket(board=GLOBAL, bucket=bucket, count=n) for bucket, n in buckets.items()],
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0040_points_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointsentry',
+            name='course',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.course'),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=40)),
+                ('bucket', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('board', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=40)),
+                ('score', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-score'], name='leaderboard_score_idx')],
+                'unique_together': {('board', 'user')},
+            },
+        ),
+        migrations.RunPython(build_global_board, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0041_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('enrollments', 'Enrollments'), ('completions', 'Completions'), ('quiz_attempts', 'Quiz attempts'), ('forum_posts', 'Forum posts')], max_length=20)),
+                ('value', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='catalog.course')),
+            ],
+            options={
+                'unique_together': {('course', 'metric', 'day')},
+            },
+        ),
+    ]
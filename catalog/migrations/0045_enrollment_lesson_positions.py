@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0044_quiz_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='lesson_positions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0045_enrollment_lesson_positions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizsubmission',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('graded', 'Graded')], default='pending', max_length=10),
+        ),
+    ]
@@ -1,11 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Student(models.Model):
     name = models.CharField(max_length=200)
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    is_featured = models.BooleanField(default=False)
+
+    # Page views, flushed in batches by catalog/view_counts.py
+    views = models.PositiveIntegerField(default=0)
+    trend_score = models.FloatField(default=0.0, db_index=True)
 
     def __str__(self):
         return self.name
@@ -29,7 +35,9 @@ class Course(models.Model):
     description = models.TextField()
     instructor = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, related_name='courses', on_delete=models.CASCADE)
+    # Comma-separated as entered; normalized into skill_tags by catalog/skills.py
     skills = models.CharField(max_length=500, blank=True)
+    skill_tags = models.ManyToManyField('Skill', related_name='courses', blank=True)
 
     duration = models.CharField(
         max_length=20,
@@ -39,13 +47,157 @@ class Course(models.Model):
 
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, default='Beginner')
     price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
-    rating = models.FloatField(default=4.8)
+    # Average review rating = rating_sum / review_count, kept by catalog/counters.py
+    rating = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized counters (catalog/counters.py); never aggregate on listing pages
+    enrollment_count = models.PositiveIntegerField(default=0)
+    lesson_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    # Page views, flushed in batches by catalog/view_counts.py
+    views = models.PositiveIntegerField(default=0)
+    trend_score = models.FloatField(default=0.0, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of course_list / category_courses
+            models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='course_cat_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class CourseRank(models.Model):
+    """Precomputed ranking scores, rebuilt in bulk by ``manage.py compute_course_ranks``."""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='rank')
+    # Copied from Course so "most popular in <category>" is one index range
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    trending_score = models.FloatField(default=0.0)
+    popular_score = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['trending_score', 'course'], name='rank_trending_idx'),
+            models.Index(fields=['popular_score', 'course'], name='rank_popular_idx'),
+            models.Index(fields=['category', 'trending_score', 'course'], name='rank_cat_trending_idx'),
+            models.Index(fields=['category', 'popular_score', 'course'], name='rank_cat_popular_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id}: trending {self.trending_score:.2f}, popular {self.popular_score:.2f}"
+
+
+class CoEnrollment(models.Model):
+    """Number of students enrolled in both courses; stored once per pair with ``course_a_id < course_b_id``."""
+    course_a = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    course_b = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course_a', 'course_b')
+        indexes = [
+            models.Index(fields=['course_b'], name='coenroll_course_b_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_a_id} & {self.course_b_id}: {self.count}"
+
+
+class CourseNeighbor(models.Model):
+    """Top-K "students also enrolled in" courses, rebuilt by ``manage.py build_recommendations``."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    shared = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('course', 'neighbor')
+        indexes = [
+            models.Index(fields=['course', '-score'], name='neighbor_course_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+class JobWatermark(models.Model):
+    """How far an incremental batch job has got, e.g. the last Enrollment id it folded in."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class CourseDailyStat(models.Model):
+    """Per-course, per-day event counts for analytics charts, filled by ``manage.py rollup_course_stats``."""
+    ENROLLMENTS = 'enrollments'
+    COMPLETIONS = 'completions'
+    QUIZ_ATTEMPTS = 'quiz_attempts'
+    FORUM_POSTS = 'forum_posts'
+    METRIC_CHOICES = [
+        (ENROLLMENTS, 'Enrollments'),
+        (COMPLETIONS, 'Completions'),
+        (QUIZ_ATTEMPTS, 'Quiz attempts'),
+        (FORUM_POSTS, 'Forum posts'),
+    ]
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # (course, metric, day) so one chart series is a single index range
+        unique_together = ('course', 'metric', 'day')
+
+    def __str__(self):
+        return f"{self.course_id} {self.day} {self.metric}: {self.value}"
+
+
+class Skill(models.Model):
+    name = models.CharField(max_length=100)
+    # Lowercased, whitespace-collapsed name; "Machine  learning" and "machine learning" are one skill
+    key = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class CourseSkillSignature(models.Model):
+    """MinHash signature of a course's skill set (catalog/skills.py)."""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='skill_signature')
+    # Hash of the sorted skill keys, so unchanged skills are not re-indexed
+    skills_hash = models.CharField(max_length=32)
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f"Skill signature for course {self.course_id}"
+
+
+class CourseSkillBand(models.Model):
+    """One LSH bucket of a course; courses sharing any (band, bucket) are similar-course candidates."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='skill_bands')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('course', 'band')
+        indexes = [
+            models.Index(fields=['band', 'bucket'], name='skill_band_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id}: band {self.band} -> {self.bucket}"
+
+
 class Review(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -61,7 +213,13 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     enrolled_at = models.DateTimeField(auto_now_add=True)
     grade = models.CharField(max_length=20, blank=True, null=True)
+    # Maintained by catalog/progress.py: completed_lessons / course.lesson_count, 100 once completed
     progress = models.FloatField(default=0.0)
+    completed_lessons = models.PositiveIntegerField(default=0)
+    # Completed lessons by Lesson.bit_index when settings.LESSON_PROGRESS_BITSET is on
+    lesson_bits = models.BinaryField(null=True, blank=True)
+    # {"<lesson id>": last video position} in bitset mode, instead of LessonProgress rows
+    lesson_positions = models.JSONField(default=dict, blank=True)
     is_completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
 
@@ -76,12 +234,17 @@ class Lesson(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField(blank=True)
     video = models.FileField(upload_to='lesson_videos/', blank=True, null=True)
+    # Video length; heartbeats past WATCH_THRESHOLD of it complete the lesson (catalog/heartbeats.py)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
     
     # Add this field for proper ordering
     order = models.PositiveIntegerField(default=0)
+    # Fixed slot in Enrollment.lesson_bits (catalog/lesson_bits.py); survives reordering
+    bit_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['order']  # This makes .all() automatically sorted!
+        unique_together = ('course', 'bit_index')
 
     def __str__(self):
         return f"{self.title} ({self.course.title})"
@@ -90,6 +253,8 @@ class LessonProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     completed = models.BooleanField(default=False)
+    # Last reported video position in seconds, flushed in batches by catalog/heartbeats.py
+    position = models.FloatField(default=0.0)
 
     class Meta:
         unique_together = ('user', 'lesson')
@@ -183,12 +348,12 @@ class Question(models.Model):
     
     def get_options(self):
         """Return list of (number, text) tuples for available options"""
-        options = []
-        for i in range(1, 5):
-            opt_text = getattr(self, f'option{i}', None)
-            if opt_text:
-                options.append((i, opt_text.strip()))
-        return options
+        return self.numbered_options(getattr(self, f'option{i}', None) for i in range(1, 5))
+
+    @staticmethod
+    def numbered_options(texts):
+        """(number, text) for option1..option4 values in order, skipping empty ones"""
+        return [(i, text.strip()) for i, text in enumerate(texts, start=1) if text]
 
 
 class Option(models.Model):
@@ -232,6 +397,63 @@ class QuizResult(models.Model):
         return f"{self.user.username} - {self.quiz.title} - {self.score}"
 
 
+class QuizSubmission(models.Model):
+    """
+    A quiz submission accepted for grading later (catalog/submissions.py);
+    graded in batches into QuizResult rows.
+    """
+    PENDING = 'pending'
+    # Claimed by a worker; only ever seen inside that worker's transaction
+    PROCESSING = 'processing'
+    GRADED = 'graded'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (PROCESSING, 'Processing'), (GRADED, 'Graded')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_submissions')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='submissions')
+    # {"question_<id>": "<option>", ...} as posted
+    answers = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Filled in when graded
+    result = models.OneToOneField(QuizResult, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    score = models.IntegerField(null=True, blank=True)
+    correct = models.PositiveIntegerField(null=True, blank=True)
+    question_count = models.PositiveIntegerField(null=True, blank=True)
+    max_marks = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'], name='submission_queue_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} - quiz {self.quiz_id} ({self.status})"
+
+
+class QuizAttempt(models.Model):
+    """
+    A student's sitting of a quiz (catalog/attempts.py): when it started, its
+    deadline for timed quizzes, and the draft answers as last flushed.  A
+    user has at most one open attempt per quiz.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
+    started_at = models.DateTimeField(default=timezone.now)
+    # started_at + time_limit_minutes; None for untimed quizzes
+    deadline = models.DateTimeField(null=True, blank=True)
+    # {"question_<id>": "<option>", ...}; autosaves are coalesced in the cache first
+    answers = models.JSONField(default=dict)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'quiz'], condition=models.Q(submitted_at__isnull=True), name='one_open_attempt',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - quiz {self.quiz_id} ({'submitted' if self.submitted_at else 'open'})"
+
+
 class Bundle(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
@@ -296,28 +518,132 @@ class Profile(models.Model):
     user_xp = models.IntegerField(default=0)
     user_level_xp = models.IntegerField(default=100)  # XP required for next level
 
+    # Lifetime XP; points, total_xp and the level fields are moved together by catalog/gamification.py
+    total_xp = models.IntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """Loaded fields whose value differs from what was read; None for an unsaved profile."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        # A loaded profile writes only what changed, and nothing if nothing did
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            changed = self.changed_fields()
+            if changed is not None:
+                if not changed:
+                    return
+                kwargs['update_fields'] = changed
+        super().save(*args, **kwargs)
+        loaded = getattr(self, '_loaded_values', None)
+        names = loaded.keys() if loaded is not None else [field.attname for field in self._meta.concrete_fields]
+        self._loaded_values = {name: getattr(self, name) for name in names}
+
     def update_badge(self):
-        if self.points >= 1000:
-            self.badge = "Gold"
-        elif self.points >= 500:
-            self.badge = "Silver"
-        elif self.points >= 100:
-            self.badge = "Bronze"
-        else:
-            self.badge = None
-        self.save()
+        from .gamification import badge_for_points
+        self.badge = badge_for_points(self.points)
+        self.save(update_fields=['badge'])
 
     def update_level(self):
-        while self.user_xp >= self.user_level_xp:
-            self.user_xp -= self.user_level_xp
-            self.user_level += 1
-            self.user_level_xp = int(self.user_level_xp * 1.5)
-        self.save()
+        from .gamification import level_progress
+        self.user_level, self.user_xp, self.user_level_xp = level_progress(self.total_xp)
+        self.save(update_fields=['user_level', 'user_xp', 'user_level_xp'])
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
 
+class PointsEntry(models.Model):
+    """Append-only ledger of awarded points and XP; Profile totals are its running sums."""
+    LESSON_COMPLETED = 'lesson_completed'
+    COURSE_COMPLETED = 'course_completed'
+    OPENING_BALANCE = 'opening_balance'
+    KIND_CHOICES = [
+        (LESSON_COMPLETED, 'Lesson completed'),
+        (COURSE_COMPLETED, 'Course completed'),
+        (OPENING_BALANCE, 'Opening balance'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_entries')
+    # The course the points were earned in, for the per-course leaderboard
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    # Idempotency key, e.g. "lesson:42:user:7"; a repeated award is a no-op
+    key = models.CharField(max_length=100, unique=True)
+    points = models.IntegerField(default=0)
+    xp = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} +{self.points}pts/+{self.xp}xp"
+
+
+class LeaderboardEntry(models.Model):
+    """A user's score on one board: ``global``, ``course:<id>`` or ``week:<year>-W<week>`` (catalog/leaderboards.py)."""
+    board = models.CharField(max_length=40)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('board', 'user')
+        indexes = [models.Index(fields=['board', '-score'], name='leaderboard_score_idx')]
+
+    def __str__(self):
+        return f"{self.board}: {self.user_id} {self.score}"
+
+
+class LeaderboardBucket(models.Model):
+    """Number of users on a board whose score falls in ``[bucket * width, (bucket + 1) * width)``."""
+    board = models.CharField(max_length=40)
+    bucket = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('board', 'bucket')
+
+    def __str__(self):
+        return f"{self.board}[{self.bucket}]: {self.count}"
+
+
+class UserStats(models.Model):
+    """Per-user dashboard totals for my_courses and profile, kept by catalog/user_stats.py."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='learning_stats')
+    enrolled_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    in_progress_count = models.PositiveIntegerField(default=0)
+    new_count = models.PositiveIntegerField(default=0)
+    # Sum of Enrollment.progress; the average is progress_sum / enrolled_count
+    progress_sum = models.FloatField(default=0.0)
+    total_hours = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def avg_progress(self):
+        return round(self.progress_sum / self.enrolled_count, 1) if self.enrolled_count else 0.0
+
+    @property
+    def completion_percentage(self):
+        return round(self.completed_count * 100 / self.enrolled_count, 1) if self.enrolled_count else 0.0
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+
 class LessonBookmark(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
@@ -0,0 +1,145 @@
+# catalog/pagination.py
+"""
+Keyset (cursor) pagination for the catalog listing pages.
+
+Instead of OFFSET, each page remembers the sort key of its first and last
+row in a signed cursor and the next query starts strictly after (or before)
+that key, so page 500 costs the same indexed range scan as page 1.
+"""
+from django.core import signing
+from django.db.models import Q
+
+PAGE_SIZE = 24
+
+_CURSOR_SALT = 'catalog.pagination'
+
+
+def encode_cursor(values, backwards=False):
+    values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]
+    return signing.dumps({'k': values, 'b': backwards}, salt=_CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return ``(values, backwards)``; a missing or tampered cursor means the first page."""
+    if not token:
+        return None, False
+    try:
+        data = signing.loads(token, salt=_CURSOR_SALT)
+    except signing.BadSignature:
+        return None, False
+    return data.get('k'), bool(data.get('b'))
+
+
+class KeysetPage:
+    """One page of results plus the cursors to its neighbours."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.next_url = None
+        self.prev_url = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def bind(self, request):
+        """Build next/prev links that keep the rest of the query string (q, category, ...)."""
+        def url(cursor):
+            params = request.GET.copy()
+            params.pop('format', None)
+            params['cursor'] = cursor
+            return f'?{params.urlencode()}'
+
+        if self.has_next:
+            self.next_url = url(self.next_cursor)
+        if self.has_previous:
+            self.prev_url = url(self.prev_cursor)
+        return self
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def build_page(rows, key, cursor_values, backwards, per_page):
+    """
+    Turn ``per_page + 1`` fetched rows into a KeysetPage.
+
+    ``rows`` must already be in fetch order: page order for a forward page,
+    reversed when walking backwards.  ``key`` maps a row to its sort key.
+    """
+    has_more = len(rows) > per_page
+    rows = list(rows[:per_page])
+
+    if backwards:
+        rows.reverse()
+        next_cursor = encode_cursor(key(rows[-1])) if rows else None
+        prev_cursor = encode_cursor(key(rows[0]), backwards=True) if rows and has_more else None
+    else:
+        next_cursor = encode_cursor(key(rows[-1])) if rows and has_more else None
+        prev_cursor = encode_cursor(key(rows[0]), backwards=True) if rows and cursor_values else None
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+def _flip(key):
+    return key[1:] if key.startswith('-') else f'-{key}'
+
+
+def _beyond(keys, values):
+    """
+    Q for "comes after ``values`` in ``keys`` order", written out as OR-ed
+    prefixes: ``k1 > v1 OR (k1 = v1 AND k2 > v2) ...``, with ``<`` for
+    descending (``-field``) keys.
+    """
+    condition = Q()
+    fields = [k.lstrip('-') for k in keys]
+    for i, key in enumerate(keys):
+        op = 'lt' if key.startswith('-') else 'gt'
+        term = Q(**{f'{fields[i]}__{op}': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            term &= Q(**{prev_field: prev_value})
+        condition |= term
+    return condition
+
+
+def _lookup(obj, path):
+    for attr in path.lstrip('-').split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def paginate_queryset(request, queryset, keys=('created_at', 'id'), per_page=PAGE_SIZE):
+    """
+    Return the KeysetPage of ``queryset`` addressed by ``request.GET['cursor']``.
+
+    ``keys`` is an ``order_by`` spec that must end in a unique column;
+    ``-field`` sorts descending and related paths (``rank__score``) work.
+    """
+    values, backwards = decode_cursor(request.GET.get('cursor'))
+    if values is not None and len(values) != len(keys):
+        values, backwards = None, False
+
+    if values is None:
+        rows = queryset.order_by(*keys)
+    elif backwards:
+        reverse = [_flip(k) for k in keys]
+        rows = queryset.filter(_beyond(reverse, values)).order_by(*reverse)
+    else:
+        rows = queryset.filter(_beyond(keys, values)).order_by(*keys)
+
+    def key(obj):
+        return [_lookup(obj, k) for k in keys]
+
+    return build_page(list(rows[:per_page + 1]), key, values, backwards, per_page).bind(request)
@@ -0,0 +1,141 @@
+# catalog/progress.py
+"""
+Incrementally maintained ``Enrollment.progress``.
+
+Each enrollment keeps ``completed_lessons``; completing a lesson bumps it
+with one ``UPDATE ... SET completed_lessons = completed_lessons + 1`` that
+also rewrites ``progress`` as ``completed_lessons / Course.lesson_count``
+in the same statement, so pages read ``Enrollment.progress`` and never
+count LessonProgress rows.  Adding or deleting a lesson rescales every
+enrollment of the course with a single UPDATE.  A completed enrollment
+always reads 100.  ``manage.py reconcile_enrollment_progress`` repairs
+drift, e.g. after LessonProgress rows were edited in the admin.
+
+With ``settings.LESSON_PROGRESS_BITSET`` completions live in the
+enrollment's bitset (catalog/lesson_bits.py) and are counted from it.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Least, NullIf
+
+from . import gamification, lesson_bits, user_stats
+from .models import Course, Enrollment, LessonProgress, PointsEntry
+
+
+def _lesson_count():
+    return Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('lesson_count')[:1])
+
+
+def progress_expression(completed):
+    """Percentage for a ``completed`` lesson-count expression, evaluated inside the UPDATE."""
+    percentage = Cast(completed, FloatField()) * 100.0 / NullIf(_lesson_count(), 0)
+    return Case(
+        When(is_completed=True, then=Value(100.0)),
+        default=Coalesce(Least(percentage, Value(100.0)), Value(0.0)),
+        output_field=FloatField(),
+    )
+
+
+def bump(user_id, course_id, delta):
+    """Add ``delta`` completed lessons to one enrollment and rewrite its percentage."""
+    completed = F('completed_lessons') + delta
+    Enrollment.objects.filter(user_id=user_id, course_id=course_id).update(
+        completed_lessons=completed,
+        progress=progress_expression(completed),
+    )
+    user_stats.refresh([user_id])
+
+
+def complete_lesson(user, lesson):
+    """
+    Mark ``lesson`` completed for ``user``.  The LessonProgress write and the
+    counter bump commit together; completing a lesson twice counts once, and
+    the lesson's points are awarded once per user, and only to enrolled users.
+    """
+    if lesson_bits.enabled():
+        if lesson_bits.complete_lesson(user, lesson):
+            award_lesson(user, lesson)
+        return
+
+    with transaction.atomic():
+        updated = LessonProgress.objects.filter(user=user, lesson=lesson, completed=False).update(completed=True)
+        if updated:
+            # .update() sends no post_save, so count the transition here
+            bump(user.pk, lesson.course_id, 1)
+        else:
+            # A new completed row is counted by the post_save signal
+            LessonProgress.objects.get_or_create(user=user, lesson=lesson, defaults={'completed': True})
+    # As with bitsets, where there is no enrollment to set the bit on
+    if Enrollment.objects.filter(user=user, course_id=lesson.course_id).exists():
+        award_lesson(user, lesson)
+
+
+def award_lesson(user, lesson):
+    gamification.award(
+        user.pk, PointsEntry.LESSON_COMPLETED, f'lesson:{lesson.pk}:user:{user.pk}', course_id=lesson.course_id,
+    )
+
+
+def rescale(course_id):
+    """Recompute every enrollment percentage of a course after its lesson count changed."""
+    Enrollment.objects.filter(course_id=course_id).update(
+        progress=progress_expression(F('completed_lessons')),
+    )
+    user_stats.refresh_course(course_id)
+
+
+def rescale_all():
+    Enrollment.objects.update(progress=progress_expression(F('completed_lessons')))
+    user_stats.rebuild()
+
+
+def _completed_count():
+    return Coalesce(
+        Subquery(
+            LessonProgress.objects.filter(
+                user_id=OuterRef('user_id'), lesson__course_id=OuterRef('course_id'), completed=True,
+            )
+            .order_by()
+            .values('user_id')
+            .annotate(n=Count('id'))
+            .values('n')
+        ),
+        0,
+    )
+
+
+def refresh(enrollments):
+    """Recount completed lessons for ``enrollments`` (a queryset) from LessonProgress or the bitsets."""
+    if lesson_bits.enabled():
+        changed = lesson_bits.refresh(enrollments)
+        enrollments.update(progress=progress_expression(F('completed_lessons')))
+    else:
+        changed = enrollments.update(
+            completed_lessons=_completed_count(),
+            progress=progress_expression(_completed_count()),
+        )
+    user_stats.refresh(enrollments.values_list('user_id', flat=True))
+    return changed
+
+
+def reconcile(batch_size=500):
+    """
+    Recount every enrollment and fix the ones that drifted.  Returns the
+    number of enrollments corrected.
+    """
+    if lesson_bits.enabled():
+        return refresh(Enrollment.objects.all())
+
+    drifted = (
+        Enrollment.objects.annotate(real_completed=_completed_count())
+        .filter(~Q(completed_lessons=F('real_completed')))
+        .values_list('pk', flat=True)
+    )
+    fixed = 0
+    pks = list(drifted.iterator(chunk_size=batch_size))
+    for start in range(0, len(pks), batch_size):
+        fixed += refresh(Enrollment.objects.filter(pk__in=pks[start:start + batch_size]))
+
+    # Percentages can also be stale on their own, e.g. after a lesson_count repair
+    rescale_all()
+    return fixed
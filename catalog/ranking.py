@@ -0,0 +1,131 @@
+# catalog/ranking.py
+"""
+Trending / popular course ranking.
+
+Scores are computed in bulk by ``manage.py compute_course_ranks`` and stored
+in CourseRank, so listing pages order by an indexed column and pay nothing
+for ranking at request time.
+
+Every enrollment, completion and review is an event worth WEIGHTS[kind];
+an event ``age`` days old contributes ``weight * 0.5 ** (age / half_life)``.
+"Trending" uses a one-week half-life, "popular" a 90-day one.  Events are
+read as per-course, per-day GROUP BY counts, so the Python side loops over
+(course, day) buckets, not over individual rows.
+
+Saving a course upserts its row (see ``track_course``), so a new course is
+listed straight away with zero scores and a moved course is ranked in its
+new category before the next rebuild.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .generations import bump_generation
+from .models import Course, CourseRank, Enrollment, Review
+
+TRENDING_HALF_LIFE_DAYS = 7
+POPULAR_HALF_LIFE_DAYS = 90
+
+WEIGHTS = {
+    'enrollment': 1.0,
+    'completion': 3.0,
+    'review': 2.0,   # scaled by rating / 5
+}
+
+RAIL_SIZE = 6
+
+
+def _daily(queryset, date_field, value=Count('id')):
+    return (
+        queryset.filter(**{f'{date_field}__isnull': False})
+        .annotate(day=TruncDate(date_field))
+        .values_list('course_id', 'day')
+        .annotate(value=value)
+        .order_by()
+    )
+
+
+def _events():
+    """Yield ``(course_id, day, weight)`` buckets for every kind of event."""
+    for course_id, day, n in _daily(Enrollment.objects.all(), 'enrolled_at'):
+        yield course_id, day, n * WEIGHTS['enrollment']
+    for course_id, day, n in _daily(Enrollment.objects.filter(is_completed=True), 'completed_at'):
+        yield course_id, day, n * WEIGHTS['completion']
+    for course_id, day, rating_total in _daily(Review.objects.all(), 'created_at', Sum('rating')):
+        yield course_id, day, rating_total / 5 * WEIGHTS['review']
+
+
+def compute_scores(now=None):
+    """Return ``{course_id: (trending, popular)}`` for courses with any events."""
+    today = (now or timezone.now()).date()
+    trending = defaultdict(float)
+    popular = defaultdict(float)
+    for course_id, day, weight in _events():
+        age = max((today - day).days, 0)
+        trending[course_id] += weight * 0.5 ** (age / TRENDING_HALF_LIFE_DAYS)
+        popular[course_id] += weight * 0.5 ** (age / POPULAR_HALF_LIFE_DAYS)
+    return {pk: (trending[pk], popular[pk]) for pk in popular}
+
+
+def rebuild_ranks(batch_size=1000):
+    """Recompute and upsert a CourseRank row for every course. Returns the row count."""
+    now = timezone.now()
+    scores = compute_scores(now)
+
+    ranks = [
+        CourseRank(
+            course_id=course_id,
+            category_id=category_id,
+            trending_score=scores.get(course_id, (0.0, 0.0))[0],
+            popular_score=scores.get(course_id, (0.0, 0.0))[1],
+            computed_at=now,
+        )
+        for course_id, category_id in Course.objects.values_list('id', 'category_id').iterator()
+    ]
+    CourseRank.objects.bulk_create(
+        ranks,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=['category', 'trending_score', 'popular_score', 'computed_at'],
+    )
+    # Ranked listings are in the anonymous page cache
+    bump_generation('course')
+    return len(ranks)
+
+
+def track_course(course):
+    """
+    Give a saved course its CourseRank row: zero scores if it is new, else
+    just the current category (the scores wait for the next rebuild).
+    """
+    CourseRank.objects.bulk_create(
+        [CourseRank(course_id=course.pk, category_id=course.category_id, computed_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=['category'],
+    )
+
+
+# ------------------------------------------------------------------
+# Request-time helpers (index reads only)
+# ------------------------------------------------------------------
+SORTS = {
+    'trending': ('-rank__trending_score', '-id'),
+    'popular': ('-rank__popular_score', '-id'),
+}
+
+
+def ranked(queryset, sort):
+    """``queryset`` restricted to ranked courses, plus the keyset keys for ``sort``."""
+    return queryset.filter(rank__isnull=False).select_related('rank'), SORTS[sort]
+
+
+def top_courses(sort, category=None, limit=RAIL_SIZE):
+    courses = Course.objects.filter(rank__isnull=False)
+    if category is not None:
+        courses = courses.filter(rank__category=category)
+    score = SORTS[sort][0].lstrip('-')
+    return list(courses.filter(**{f'{score}__gt': 0}).order_by(*SORTS[sort])[:limit])
@@ -0,0 +1,300 @@
+# catalog/recommendations.py
+"""
+"Students also enrolled in" recommendations from enrollment co-occurrence.
+
+``manage.py build_recommendations`` counts, for every pair of courses, how
+many students are enrolled in both (CoEnrollment), scores each pair by
+cosine similarity ``shared / sqrt(n_a * n_b)`` and stores the TOP_K best
+neighbours of every course in CourseNeighbor.  Pages only read that table
+through its (course, score) index.
+
+The full build turns the whole Enrollment table into NumPy arrays and
+counts pairs without a Python loop per row.  The incremental build
+(the default once a full build has run) only looks at students with
+enrollments newer than the stored watermark: their pair counts with and
+without the new enrollments are subtracted to get the delta, which is
+added to CoEnrollment.  The courses it touches, the courses that gained
+students and every course paired with those get their neighbour lists
+recomputed, since a course's enrollment count is part of each of its
+pairs' scores.  Unenrollments are not folded in
+incrementally; an occasional ``--full`` run picks them up.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+
+from .generations import bump_generation, get_generation
+from .models import CoEnrollment, Course, CourseNeighbor, Enrollment, JobWatermark
+
+try:
+    import numpy as np
+except ImportError:  # only the batch job needs it
+    np = None
+
+TOP_K = 10
+# Pairs shared by fewer students are noise, not a recommendation
+MIN_SHARED = 2
+SHOWN = 6
+
+WATERMARK = 'recommendations'
+# Enrollment rows per NumPy chunk in the full build
+CHUNK_ROWS = 200_000
+
+
+# ------------------------------------------------------------------
+# Vectorized pair counting
+# ------------------------------------------------------------------
+def _pair_counts(users, courses):
+    """
+    Co-occurrence counts for ``(user, course)`` rows.
+
+    Returns arrays ``(a, b, count)`` with ``a < b``: for every pair of
+    courses, how many of the given users are enrolled in both.
+    """
+    if len(users) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    order = np.lexsort((courses, users))
+    users, courses = users[order], courses[order]
+    n = len(users)
+
+    # Each row pairs with the rows after it in the same user's run
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    partners = np.repeat(starts + sizes, sizes) - np.arange(n) - 1
+    left = np.repeat(np.arange(n), partners)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = left + 1 + offsets
+
+    # Encode each (a, b) as one integer so np.unique does the GROUP BY
+    base = int(courses.max()) + 1
+    codes, counts = np.unique(courses[left] * base + courses[right], return_counts=True)
+    return codes // base, codes % base, counts
+
+
+def _merge(parts):
+    """Sum several ``(a, b, count)`` results into one."""
+    a = np.concatenate([p[0] for p in parts])
+    b = np.concatenate([p[1] for p in parts])
+    counts = np.concatenate([p[2] for p in parts])
+    if len(a) == 0:
+        return a, b, counts
+    base = int(max(a.max(), b.max())) + 1
+    codes, inverse = np.unique(a * base + b, return_inverse=True)
+    return codes // base, codes % base, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+def _enrollment_arrays(queryset):
+    rows = np.array(list(queryset.values_list('user_id', 'course_id').iterator()), dtype=np.int64)
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return rows[:, 0], rows[:, 1]
+
+
+def _chunked_pair_counts(users, courses):
+    """``_pair_counts`` over chunks cut at user boundaries, so memory stays bounded."""
+    order = np.argsort(users, kind='stable')
+    users, courses = users[order], courses[order]
+    parts = []
+    start = 0
+    while start < len(users):
+        stop = min(start + CHUNK_ROWS, len(users))
+        # Never split one user's enrollments across two chunks
+        stop = int(np.searchsorted(users, users[stop - 1], side='right'))
+        parts.append(_pair_counts(users[start:stop], courses[start:stop]))
+        start = stop
+    return _merge(parts) if parts else _pair_counts(users, courses)
+
+
+# ------------------------------------------------------------------
+# Neighbour lists
+# ------------------------------------------------------------------
+def _top_neighbours(a, b, shared, enrolled, only=None, top_k=TOP_K):
+    """
+    CourseNeighbor rows for pair counts ``(a, b, shared)``.
+
+    ``enrolled`` maps course id to its enrollment count.  With ``only``,
+    rows are built just for those course ids.
+    """
+    keep = shared >= MIN_SHARED
+    a, b, shared = a[keep], b[keep], shared[keep]
+    src = np.concatenate([a, b])
+    dst = np.concatenate([b, a])
+    shared = np.concatenate([shared, shared])
+    if only is not None:
+        mask = np.isin(src, np.fromiter(only, dtype=np.int64))
+        src, dst, shared = src[mask], dst[mask], shared[mask]
+    if len(src) == 0:
+        return []
+
+    n_src = np.array([enrolled.get(int(pk), 0) for pk in src], dtype=np.float64)
+    n_dst = np.array([enrolled.get(int(pk), 0) for pk in dst], dtype=np.float64)
+    score = shared / np.sqrt(np.maximum(n_src * n_dst, 1.0))
+
+    # Best first within each course, then keep the first top_k of each run
+    order = np.lexsort((-score, src))
+    src, dst, shared, score = src[order], dst[order], shared[order], score[order]
+    starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+    sizes = np.diff(np.r_[starts, len(src)])
+    rank = np.arange(len(src)) - np.repeat(starts, sizes)
+    keep = rank < top_k
+
+    return [
+        CourseNeighbor(course_id=int(c), neighbor_id=int(d), shared=int(s), score=float(x))
+        for c, d, s, x in zip(src[keep], dst[keep], shared[keep], score[keep])
+    ]
+
+
+def _set_watermark(value):
+    JobWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': value})
+
+
+# ------------------------------------------------------------------
+# Builds
+# ------------------------------------------------------------------
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("NumPy is required to build recommendations (pip install numpy)")
+
+
+def build_full(top_k=TOP_K, batch_size=5000):
+    """Recount every pair from scratch. Returns the number of neighbour rows written."""
+    _require_numpy()
+    last_id = Enrollment.objects.aggregate(last=Max('id'))['last'] or 0
+    users, courses = _enrollment_arrays(Enrollment.objects.filter(id__lte=last_id))
+    a, b, shared = _chunked_pair_counts(users, courses)
+
+    course_ids, counts = np.unique(courses, return_counts=True)
+    enrolled = dict(zip(course_ids.tolist(), counts.tolist()))
+    neighbours = _top_neighbours(a, b, shared, enrolled, top_k=top_k)
+
+    with transaction.atomic():
+        CoEnrollment.objects.all().delete()
+        CoEnrollment.objects.bulk_create(
+            (CoEnrollment(course_a_id=int(x), course_b_id=int(y), count=int(n)) for x, y, n in zip(a, b, shared)),
+            batch_size=batch_size,
+        )
+        CourseNeighbor.objects.all().delete()
+        CourseNeighbor.objects.bulk_create(neighbours, batch_size=batch_size)
+        _set_watermark(last_id)
+    bump_generation('recommendations')
+    return len(neighbours)
+
+
+def build_incremental(top_k=TOP_K, batch_size=5000):
+    """
+    Fold in enrollments newer than the watermark.  Falls back to a full
+    build the first time.  Returns the number of neighbour rows written.
+    """
+    _require_numpy()
+    watermark = JobWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+    if watermark is None:
+        return build_full(top_k=top_k, batch_size=batch_size)
+
+    last_id = Enrollment.objects.aggregate(last=Max('id'))['last'] or 0
+    if last_id <= watermark:
+        return 0
+
+    new = Enrollment.objects.filter(id__gt=watermark, id__lte=last_id)
+    students = Enrollment.objects.filter(user__in=new.values('user_id'), id__lte=last_id)
+    before = _pair_counts(*_enrollment_arrays(students.filter(id__lte=watermark)))
+    after = _pair_counts(*_enrollment_arrays(students))
+    # after - before, as one merge with the "before" counts negated
+    a, b, delta = _merge([after, (before[0], before[1], -before[2])])
+    changed = delta != 0
+    a, b, delta = a[changed], b[changed], delta[changed]
+
+    touched = set(a.tolist()) | set(b.tolist())
+    # A new enrollment also changes its course's n, and with it the score of
+    # every pair the course is in, even when no pair count moved
+    grown = set(new.values_list('course_id', flat=True).distinct())
+    with transaction.atomic():
+        _apply_deltas(a, b, delta, batch_size)
+        touched |= grown | _partners(grown)
+        neighbours = _rebuild_neighbours(touched, top_k)
+        CourseNeighbor.objects.filter(course_id__in=touched).delete()
+        CourseNeighbor.objects.bulk_create(neighbours, batch_size=batch_size)
+        _set_watermark(last_id)
+    bump_generation('recommendations')
+    return len(neighbours)
+
+
+def _apply_deltas(a, b, delta, batch_size):
+    """Add ``delta`` to each pair's CoEnrollment count, creating missing pairs."""
+    wanted = {(int(x), int(y)): int(d) for x, y, d in zip(a, b, delta)}
+    existing = {}
+    for pair in CoEnrollment.objects.filter(course_a_id__in={x for x, _ in wanted}):
+        if (pair.course_a_id, pair.course_b_id) in wanted:
+            existing[pair.course_a_id, pair.course_b_id] = pair
+
+    created = []
+    for key, d in wanted.items():
+        if key in existing:
+            existing[key].count += d
+        else:
+            created.append(CoEnrollment(course_a_id=key[0], course_b_id=key[1], count=d))
+    CoEnrollment.objects.bulk_update(list(existing.values()), ['count'], batch_size=batch_size)
+    CoEnrollment.objects.bulk_create(created, batch_size=batch_size)
+
+
+def _partners(course_ids):
+    """Courses sharing a scored pair (MIN_SHARED or more students) with any of ``course_ids``."""
+    pairs = CoEnrollment.objects.filter(count__gte=MIN_SHARED).filter(
+        Q(course_a_id__in=course_ids) | Q(course_b_id__in=course_ids)
+    )
+    partners = set()
+    for x, y in pairs.values_list('course_a_id', 'course_b_id'):
+        partners.update((x, y))
+    return partners
+
+
+def _rebuild_neighbours(course_ids, top_k):
+    if not course_ids:
+        return []
+    rows = np.array(
+        list(
+            CoEnrollment.objects.filter(count__gte=MIN_SHARED)
+            .filter(Q(course_a_id__in=course_ids) | Q(course_b_id__in=course_ids))
+            .values_list('course_a_id', 'course_b_id', 'count')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    ids = set(rows[:, 0].tolist()) | set(rows[:, 1].tolist())
+    enrolled = dict(Course.objects.filter(id__in=ids).values_list('id', 'enrollment_count'))
+    return _top_neighbours(rows[:, 0], rows[:, 1], rows[:, 2], enrolled, only=course_ids, top_k=top_k)
+
+
+# ------------------------------------------------------------------
+# Request-time lookups (index reads only)
+# ------------------------------------------------------------------
+CACHE_TIMEOUT = 60 * 60
+
+
+def also_enrolled(course_id, limit=SHOWN):
+    """Courses students of ``course_id`` also enrolled in, best first."""
+    key = f'catalog:recommendations:{course_id}:{get_generation("recommendations")}'
+    courses = cache.get(key)
+    if courses is None:
+        courses = [
+            n.neighbor
+            for n in CourseNeighbor.objects.filter(course_id=course_id)
+            .select_related('neighbor').order_by('-score')[:limit]
+        ]
+        cache.set(key, courses, CACHE_TIMEOUT)
+    return courses
+
+
+def recommended_for(user, limit=SHOWN):
+    """Neighbours of every course ``user`` is enrolled in, summed, minus those courses."""
+    enrolled = Enrollment.objects.filter(user=user).values('course_id')
+    best = list(
+        CourseNeighbor.objects.filter(course_id__in=enrolled)
+        .exclude(neighbor_id__in=enrolled)
+        .values('neighbor_id')
+        .annotate(total=Sum('score'))
+        .order_by('-total', 'neighbor_id')
+        .values_list('neighbor_id', flat=True)[:limit]
+    )
+    courses = Course.objects.in_bulk(best)
+    return [courses[pk] for pk in best if pk in courses]
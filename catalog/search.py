@@ -0,0 +1,180 @@
+# catalog/search.py
+"""
+Full-text search over courses.
+
+On SQLite the catalog keeps an FTS5 table (``catalog_course_fts``) whose rowid
+is the course id and whose columns hold the course title, description, skills
+and the instructor's name.  The table is created by migration 0029, kept in
+sync by the Course/User signals in ``catalog/signals.py`` and can be rebuilt
+with ``manage.py rebuild_search_index``.
+
+Other database backends fall back to the old ``icontains`` filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Course
+from .pagination import PAGE_SIZE, build_page, decode_cursor, paginate_queryset
+
+FTS_TABLE = 'catalog_course_fts'
+
+# bm25() column weights, in table column order: title, description, skills, instructor
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_INDEX_SELECT = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, description, skills, instructor)
+    SELECT c.id, c.title, c.description, c.skills,
+           u.username || ' ' || u.first_name || ' ' || u.last_name
+    FROM catalog_course c
+    JOIN auth_user u ON u.id = c.instructor_id
+"""
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("pyth"*), so punctuation in the
+    query can never be parsed as FTS5 syntax and partial words still match
+    the way the old ``icontains`` search did.
+    """
+    tokens = _TOKEN_RE.findall((query or '').lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _bm25():
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    return f'bm25({FTS_TABLE}, {weights})'
+
+
+# ------------------------------------------------------------------
+# Index maintenance
+# ------------------------------------------------------------------
+def index_course(course_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course_id])
+        cursor.execute(_INDEX_SELECT + ' WHERE c.id = %s', [course_id])
+
+
+def index_instructor_courses(user_id):
+    """Re-index every course taught by ``user_id`` (their name is indexed)."""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+            f'(SELECT id FROM catalog_course WHERE instructor_id = %s)',
+            [user_id],
+        )
+        cursor.execute(_INDEX_SELECT + ' WHERE c.instructor_id = %s', [user_id])
+
+
+def remove_course(course_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course_id])
+
+
+def rebuild_index():
+    """Drop every indexed row and re-index the whole catalog. Returns the row count."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(_INDEX_SELECT)
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+# ------------------------------------------------------------------
+# Querying
+# ------------------------------------------------------------------
+def ranked_course_ids(query, courses=None, limit=200, after=None, backwards=False):
+    """
+    Return ``[(course_id, score), ...]`` for ``query``, best match first.
+
+    ``score`` is the raw bm25() value, so lower is better.  ``courses`` is an
+    optional Course queryset (category, facet filters, ...) that is applied as
+    a subquery of the same statement, not on the Python side.  ``after`` is a
+    ``(score, course_id)`` keyset cursor; with ``backwards`` the rows before
+    it are returned instead, nearest first.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    sql = (
+        f'SELECT {FTS_TABLE}.rowid, {_bm25()} AS score '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [match]
+    if courses is not None:
+        subquery, subparams = courses.order_by().values('id').query.sql_with_params()
+        sql += f' AND {FTS_TABLE}.rowid IN ({subquery})'
+        params.extend(subparams)
+    if after is not None:
+        sql += f' AND ({_bm25()}, {FTS_TABLE}.rowid) {"<" if backwards else ">"} (%s, %s)'
+        params.extend(after)
+    direction = 'DESC' if backwards else 'ASC'
+    sql += f' ORDER BY score {direction}, {FTS_TABLE}.rowid {direction} LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def matching_courses(query, courses=None):
+    """Narrow ``courses`` (default: every course) to those matching ``query``."""
+    courses = Course.objects.all() if courses is None else courses
+    if not query:
+        return courses
+    if fts_enabled():
+        match = build_match_query(query)
+        if not match:
+            return courses.none()
+        return courses.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+    return courses.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query) |
+        Q(instructor__username__icontains=query) |
+        Q(instructor__first_name__icontains=query) |
+        Q(instructor__last_name__icontains=query)
+    )
+
+
+def search_page(request, query, courses=None, per_page=PAGE_SIZE):
+    """
+    Return one KeysetPage of search results, best match first.
+
+    Ranked searches page on ``(bm25 score, course id)``; browsing without a
+    query (or on a non-SQLite backend) pages on ``(created_at, id)``.
+    """
+    if not (query and fts_enabled()):
+        results = matching_courses(query, courses).select_related('category')
+        return paginate_queryset(request, results, per_page=per_page)
+
+    after, backwards = decode_cursor(request.GET.get('cursor'))
+    if after is not None and len(after) != 2:
+        after, backwards = None, False
+
+    ranked = ranked_course_ids(query, courses, per_page + 1, after, backwards)
+    page = build_page(ranked, lambda row: [row[1], row[0]], after, backwards, per_page)
+
+    by_id = Course.objects.select_related('category').in_bulk([pk for pk, _ in page.items])
+    page.items = [by_id[pk] for pk, _ in page.items if pk in by_id]
+    return page.bind(request)
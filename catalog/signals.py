@@ -1,23 +1,239 @@
 # catalog/signals.py
 from django.contrib.auth.models import Group, User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.dispatch import receiver
-from .models import Profile
+from django.utils import timezone
+from . import accounts, counters, facets, lesson_bits, progress, ranking, search, skills, user_stats
+from .autocomplete import course_index
+from .course_context import bump_course_version
+from .generations import bump_generation
+from .models import (
+    Course, Category, Enrollment, Lesson, LessonProgress, Review, Quiz, Announcement, LiveClass,
+    Bundle, Question,
+)
 
+# ------------------------------------------------------------------
+# New users: profile and Student group in one bulk path (catalog/accounts.py)
+# ------------------------------------------------------------------
 @receiver(post_save, sender=User)
-def add_new_user_to_student_group(sender, instance, created, **kwargs):
-    if created:
-        try:
-            student_group, _ = Group.objects.get_or_create(name="Student")
-            instance.groups.add(student_group)
-        except Exception:
-            pass
+def set_up_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        accounts.setup_new_users([instance])
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
+def save_user_profile(sender, instance, created, **kwargs):
+    # Only a profile loaded through user.profile can have been changed alongside
+    # the user; Profile.save() itself skips the write when nothing changed.
+    if not created and User.profile.related.is_cached(instance):
+        instance.profile.save()
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_student_group(sender, **kwargs):
+    accounts.forget_student_group()
+
+# ------------------------------------------------------------------
+# Full-text search index
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_course(instance.pk)
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_course(instance.pk)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def reindex_instructor_courses(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # New users teach nothing yet, and login only touches last_login.
+    if created or raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    search.index_instructor_courses(instance.pk)
+
+# ------------------------------------------------------------------
+# Type-ahead prefix index (process-local)
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+def update_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        course_index.add_or_update(instance.pk, instance.title)
+
+@receiver(post_delete, sender=Course)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    course_index.remove(instance.pk)
+
+# ------------------------------------------------------------------
+# Skill index and LSH buckets (skipped when the skills are unchanged)
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+def index_course_skills(sender, instance, raw=False, **kwargs):
+    if not raw:
+        skills.index_course(instance)
+
+@receiver(post_delete, sender=Course)
+def drop_course_skills(sender, instance, **kwargs):
+    # Bands and signature go with the course (CASCADE); cached lookups must not
+    bump_generation('skills')
+
+@receiver(post_save, sender=Enrollment)
+def bump_autocomplete_popularity(sender, instance, created, **kwargs):
+    if created:
+        course_index.bump_popularity(instance.course_id)
+
+@receiver(post_delete, sender=Enrollment)
+def drop_autocomplete_popularity(sender, instance, **kwargs):
+    course_index.bump_popularity(instance.course_id, -1)
+
+# ------------------------------------------------------------------
+# Cached facet counts
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_facets(sender, **kwargs):
+    facets.invalidate()
+
+# ------------------------------------------------------------------
+# Course ranks: listed (and in the right category) before the next rebuild
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+def track_course_rank(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ranking.track_course(instance)
+
+# ------------------------------------------------------------------
+# Denormalized course counters
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(instance.course_id, enrollment_count=1)
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    counters.bump(instance.course_id, enrollment_count=-1)
+
+@receiver(post_save, sender=Lesson)
+def count_lesson(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(instance.course_id, lesson_count=1)
+
+@receiver(post_delete, sender=Lesson)
+def uncount_lesson(sender, instance, **kwargs):
+    counters.bump(instance.course_id, lesson_count=-1)
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_review(instance.course_id, 1, instance.rating)
+    else:
+        counters.refresh_reviews(instance.course_id)
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    counters.change_review(instance.course_id, -1, -instance.rating)
+
+# ------------------------------------------------------------------
+# Enrollment progress (after the lesson counters above)
+# ------------------------------------------------------------------
+@receiver(pre_save, sender=Lesson)
+def assign_lesson_bit_index(sender, instance, raw=False, **kwargs):
+    if instance.bit_index is None and not raw:
+        instance.bit_index = lesson_bits.next_bit_index(instance.course_id)
+
+@receiver(post_save, sender=LessonProgress)
+def count_completed_lesson(sender, instance, created, raw=False, **kwargs):
+    # Completing an existing row goes through progress.complete_lesson
+    if created and instance.completed and not raw:
+        progress.bump(instance.user_id, instance.lesson.course_id, 1)
+
+@receiver(post_save, sender=Enrollment)
+def start_enrollment_progress(sender, instance, created, raw=False, **kwargs):
+    # Lessons completed before (re-)enrolling still count
+    if created and not raw:
+        progress.refresh(Enrollment.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Lesson)
+def rescale_progress_for_new_lesson(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        progress.rescale(instance.course_id)
+
+@receiver(post_delete, sender=Lesson)
+def recount_progress_for_deleted_lesson(sender, instance, **kwargs):
+    # The lesson's LessonProgress rows are already gone (CASCADE); its bit is cleared here
+    lesson_bits.clear_lesson(instance)
+    progress.refresh(Enrollment.objects.filter(course_id=instance.course_id))
+
+# ------------------------------------------------------------------
+# Per-user dashboard stats (progress changes refresh them in catalog/progress.py)
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Enrollment)
+def refresh_stats_for_enrollment(sender, instance, created, raw=False, **kwargs):
+    # New enrollments were already refreshed by start_enrollment_progress
+    if not created and not raw:
+        user_stats.refresh([instance.user_id])
+
+@receiver(post_save, sender=Review)
+def refresh_stats_for_review(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        user_stats.refresh([instance.user_id])
+
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Review)
+def refresh_stats_after_delete(sender, instance, origin=None, **kwargs):
+    # Skip when the user itself is being deleted; its stats row goes with it
+    if not isinstance(origin, User):
+        user_stats.refresh([instance.user_id])
+
+# ------------------------------------------------------------------
+# Compiled quiz answer keys are cached under Quiz.updated_at
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def touch_quiz_for_question(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Quiz.objects.filter(pk=instance.quiz_id).update(updated_at=timezone.now())
+
+# ------------------------------------------------------------------
+# Versioned course_detail cache
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_page(sender, instance, **kwargs):
+    bump_course_version(instance.pk)
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+@receiver(post_save, sender=LiveClass)
+@receiver(post_delete, sender=LiveClass)
+def bump_course_page_for_child(sender, instance, **kwargs):
+    bump_course_version(instance.course_id)
+
+# ------------------------------------------------------------------
+# Anonymous page cache generations
+# ------------------------------------------------------------------
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_generation(sender, **kwargs):
+    bump_generation('course')
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_generation(sender, **kwargs):
+    bump_generation('category')
+
+@receiver(post_save, sender=Bundle)
+@receiver(post_delete, sender=Bundle)
+@receiver(m2m_changed, sender=Bundle.courses.through)
+def bump_bundle_generation(sender, **kwargs):
+    bump_generation('bundle')
@@ -0,0 +1,196 @@
+# catalog/skills.py
+"""
+Skill index and "similar courses" over Course.skills.
+
+``Course.skills`` stays the comma-separated text instructors type; on save
+it is parsed once here into Skill rows (``course.skill_tags``) and a
+MinHash signature of the skill set.  The signature is cut into BANDS bands
+of ROWS values and each band is hashed to a bucket stored in
+CourseSkillBand.  Two courses whose skill sets have Jaccard similarity s
+share at least one bucket with probability ``1 - (1 - s**ROWS) ** BANDS``
+(about 0.5 at s = 0.5, over 0.99 at s = 0.8), so "similar courses" is an
+index probe on (band, bucket) followed by an exact Jaccard check on a
+handful of candidates, never a comparison against every course.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .generations import bump_generation, get_generation
+from .models import Course, CourseSkillBand, CourseSkillSignature, Skill
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Mersenne prime for the (a * x + b) mod p permutations
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250101)  # fixed: signatures must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE_FORMAT = f'<{NUM_PERM}Q'
+
+SHOWN = 6
+MIN_SIMILARITY = 0.2
+# Candidates checked exactly, by number of shared buckets
+MAX_CANDIDATES = 50
+CACHE_TIMEOUT = 60 * 60
+
+_SEPARATORS = re.compile(r'[,;\n]')
+
+
+# ------------------------------------------------------------------
+# Parsing (pure functions, also used by migrations and templates)
+# ------------------------------------------------------------------
+def skill_key(name):
+    return ' '.join(name.lower().split())
+
+
+def parse_skills(text):
+    """``[(name, key), ...]`` from a comma-separated skills string, first spelling wins."""
+    seen = {}
+    for part in _SEPARATORS.split(text or ''):
+        name = ' '.join(part.split())
+        if name and skill_key(name) not in seen:
+            seen[skill_key(name)] = name[:100]
+    return [(name, key) for key, name in seen.items()]
+
+
+def skill_names(text):
+    return [name for name, _ in parse_skills(text)]
+
+
+def skills_hash(keys):
+    return hashlib.md5('\n'.join(sorted(keys)).encode()).hexdigest()
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# ------------------------------------------------------------------
+# MinHash / LSH
+# ------------------------------------------------------------------
+def _token_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+
+def minhash(keys):
+    """NUM_PERM minimum hash values; matching positions estimate Jaccard similarity."""
+    hashes = [_token_hash(key) for key in keys]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature):
+    """One signed 64-bit bucket id per band."""
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f'<{ROWS}Q', *signature[band * ROWS:(band + 1) * ROWS])
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'little', signed=True))
+    return buckets
+
+
+def pack_signature(signature):
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack_signature(data):
+    return list(struct.unpack(_SIGNATURE_FORMAT, bytes(data)))
+
+
+# ------------------------------------------------------------------
+# Indexing
+# ------------------------------------------------------------------
+def _skills_for(parsed):
+    """Skill rows for ``parsed`` names, creating the missing ones."""
+    keys = [key for _, key in parsed]
+    existing = {s.key: s for s in Skill.objects.filter(key__in=keys)}
+    missing = [Skill(name=name, key=key) for name, key in parsed if key not in existing]
+    if missing:
+        Skill.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = {s.key: s for s in Skill.objects.filter(key__in=keys)}
+    return [existing[key] for key in keys]
+
+
+def index_course(course, force=False):
+    """
+    Bring ``course``'s skill tags, signature and LSH buckets up to date.
+    Returns False (after one lookup) when its skills have not changed.
+    """
+    parsed = parse_skills(course.skills)
+    keys = [key for _, key in parsed]
+    digest = skills_hash(keys)
+    if not force:
+        current = CourseSkillSignature.objects.filter(course=course).values_list('skills_hash', flat=True).first()
+        if current == digest or (current is None and not keys):
+            return False
+
+    with transaction.atomic():
+        course.skill_tags.set(_skills_for(parsed))
+        CourseSkillBand.objects.filter(course=course).delete()
+        if keys:
+            signature = minhash(keys)
+            CourseSkillSignature.objects.update_or_create(
+                course=course, defaults={'skills_hash': digest, 'signature': pack_signature(signature)}
+            )
+            CourseSkillBand.objects.bulk_create([
+                CourseSkillBand(course=course, band=band, bucket=bucket)
+                for band, bucket in enumerate(band_buckets(signature))
+            ])
+        else:
+            CourseSkillSignature.objects.filter(course=course).delete()
+    bump_generation('skills')
+    return True
+
+
+def rebuild_index():
+    """Re-index every course. Returns the number of courses indexed."""
+    count = 0
+    for course in Course.objects.only('id', 'skills').iterator():
+        index_course(course, force=True)
+        count += 1
+    return count
+
+
+# ------------------------------------------------------------------
+# Lookups
+# ------------------------------------------------------------------
+def similar_courses(course, limit=SHOWN):
+    """Courses whose skill sets are most like ``course``'s, by exact Jaccard similarity."""
+    key = f'catalog:similar:{course.pk}:{get_generation("skills")}'
+    similar = cache.get(key)
+    if similar is not None:
+        return similar
+
+    # Probe the (band, bucket) index once per band of this course
+    probe = Q()
+    for band, bucket in CourseSkillBand.objects.filter(course_id=course.pk).values_list('band', 'bucket'):
+        probe |= Q(band=band, bucket=bucket)
+    candidate_ids = []
+    if probe:
+        candidate_ids = list(
+            CourseSkillBand.objects.filter(probe)
+            .exclude(course_id=course.pk)
+            .values('course_id')
+            .annotate(hits=Count('id'))
+            .order_by('-hits', 'course_id')
+            .values_list('course_id', flat=True)[:MAX_CANDIDATES]
+        )
+
+    similar = []
+    if candidate_ids:
+        own_keys = [key for _, key in parse_skills(course.skills)]
+        scored = [
+            (jaccard(own_keys, [key for _, key in parse_skills(other.skills)]), other)
+            for other in Course.objects.filter(id__in=candidate_ids)
+        ]
+        scored.sort(key=lambda pair: (-pair[0], pair[1].pk))
+        similar = [other for score, other in scored if score >= MIN_SIMILARITY][:limit]
+
+    cache.set(key, similar, CACHE_TIMEOUT)
+    return similar
@@ -0,0 +1,98 @@
+# catalog/submissions.py
+"""
+Asynchronous quiz submission ingestion.
+
+With ``settings.QUIZ_ASYNC_SUBMISSIONS = True``, take_quiz does not grade a
+POST: it stores the answers as a pending QuizSubmission (one small insert)
+and sends the student to a status page that polls until the result is in.
+
+``manage.py process_quiz_submissions`` is the worker.  It takes pending
+submissions in id order, grades them against the cached answer keys
+(catalog/answer_keys.py), writes all their QuizResult rows with one
+``bulk_create`` and marks the batch graded with one ``bulk_update``, in a
+single transaction, so a crash leaves the whole batch pending.
+
+Several workers can run at once.  Each claims its batch before grading it:
+``SELECT ... FOR UPDATE SKIP LOCKED`` passes over rows another worker holds,
+and a conditional ``UPDATE ... SET status = 'processing' WHERE status =
+'pending'`` drops any row graded since it was read (SQLite has no row
+locks, but serializes the writes), so a submission is graded once.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import answer_keys
+from .models import Quiz, QuizResult, QuizSubmission
+
+BATCH_SIZE = 500
+
+
+def enabled():
+    return getattr(settings, 'QUIZ_ASYNC_SUBMISSIONS', False)
+
+
+def enqueue(user, quiz, data):
+    """Store the ``question_<id>`` answers of a POST as a pending submission."""
+    answers = {name: value for name, value in data.items() if name.startswith('question_')}
+    return QuizSubmission.objects.create(user=user, quiz=quiz, answers=answers)
+
+
+def _pending_ids(batch_size):
+    return list(
+        QuizSubmission.objects.filter(status=QuizSubmission.PENDING)
+        .select_for_update(skip_locked=True)
+        .order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+
+
+def _claim(ids):
+    """Mark the still-pending ``ids`` as processing and return those submissions."""
+    QuizSubmission.objects.filter(pk__in=ids, status=QuizSubmission.PENDING).update(
+        status=QuizSubmission.PROCESSING,
+    )
+    return list(
+        QuizSubmission.objects.filter(pk__in=ids, status=QuizSubmission.PROCESSING)
+        .order_by('id')
+        .only('id', 'user_id', 'quiz_id', 'answers')
+    )
+
+
+def process_pending(batch_size=BATCH_SIZE):
+    """Grade one batch of pending submissions. Returns how many were graded."""
+    with transaction.atomic():
+        ids = _pending_ids(batch_size)
+        if not ids:
+            return 0
+        batch = _claim(ids)
+        if not batch:
+            return 0
+
+        quizzes = Quiz.objects.only('id', 'updated_at').in_bulk({submission.quiz_id for submission in batch})
+        keys = {quiz_id: answer_keys.for_quiz(quiz) for quiz_id, quiz in quizzes.items()}
+        results = []
+        for submission in batch:
+            compiled = keys[submission.quiz_id]
+            submission.score, submission.correct = compiled.grade(submission.answers)
+            submission.question_count = len(compiled.key)
+            submission.max_marks = compiled.max_marks
+            submission.status = QuizSubmission.GRADED
+            results.append(QuizResult(
+                user_id=submission.user_id, quiz_id=submission.quiz_id,
+                score=submission.score, total_marks=compiled.max_marks,
+            ))
+
+        QuizResult.objects.bulk_create(results, batch_size=batch_size)
+        for submission, result in zip(batch, results):
+            submission.result = result
+        QuizSubmission.objects.bulk_update(
+            batch, ['status', 'score', 'correct', 'question_count', 'max_marks', 'result'], batch_size=batch_size,
+        )
+    return len(batch)
+
+
+def process_all(batch_size=BATCH_SIZE):
+    total = 0
+    while graded := process_pending(batch_size):
+        total += graded
+    return total
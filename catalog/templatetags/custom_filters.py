@@ -1,4 +1,7 @@
 from django import template
+
+from catalog.skills import skill_names
+
 register = template.Library()
 
 @register.filter
@@ -11,6 +14,4 @@ def multiply(value, arg):
 
 @register.filter
 def split_skills(skills_string):
-    if not skills_string:
-        return []
-    return [skill.strip() for skill in skills_string.split(',') if skill.strip()]
\ No newline at end of file
+    return skill_names(skills_string)
\ No newline at end of file
@@ -1,3 +1,1224 @@
-from django.test import TestCase
+import json
+import time
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    accounts, answer_keys, attempts, dashboard, exports, facets, gamification, gradebook, heartbeats, leaderboards,
+    lesson_bits, progress, ranking, recommendations, rollups, search, skills, submissions, user_stats,
+)
+from .models import (
+    Announcement, Category, Course, CourseDailyStat, CourseNeighbor, CourseRank, Enrollment, Lesson, LessonProgress,
+    PointsEntry, Profile, Quiz, Question, QuizAttempt, QuizResult, QuizSubmission, Review, UserStats,
+)
+from .autocomplete import course_index
+from .course_context import course_version, shared_course_context
+from .search import search_page
+from .view_counts import HALF_LIFE, trend_weight, trending_value, view_buffer
+from .views import get_category_badges
+
+
+class CourseSearchIndexTests(TestCase):
+    """The FTS5 index follows course and instructor edits and ranks title hits first."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', first_name='Ada', password='pw')
+        self.category = Category.objects.create(name='Programming')
+
+    def create_course(self, title, description='d'):
+        return Course.objects.create(
+            title=title, description=description, instructor=self.instructor, category=self.category,
+        )
+
+    def ids(self, query):
+        return [pk for pk, _ in search.ranked_course_ids(query)]
+
+    def test_index_follows_saves_and_deletes(self):
+        course = self.create_course('Python Basics')
+        self.assertEqual(self.ids('pyth'), [course.pk])
+
+        course.title = 'Rust Basics'
+        course.save()
+        self.assertEqual(self.ids('python'), [])
+        self.assertEqual(self.ids('rust'), [course.pk])
+
+        self.instructor.first_name = 'Grace'
+        self.instructor.save()
+        self.assertEqual(self.ids('grace'), [course.pk])
+
+        course.delete()
+        self.assertEqual(self.ids('rust'), [])
+
+    def test_title_match_ranks_above_description_match(self):
+        in_description = self.create_course('Web apps', description='Built with django and python')
+        in_title = self.create_course('Django in depth')
+        self.assertEqual(self.ids('django'), [in_title.pk, in_description.pk])
+
+        self.assertEqual(search.rebuild_index(), 2)
+        self.assertEqual(self.ids('django'), [in_title.pk, in_description.pk])
+
+
+class CourseAutocompleteTests(TestCase):
+    """ajax_search answers from the in-memory prefix index, most enrolled first."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.python, self.pytorch = (
+            Course.objects.create(title=title, description='d', instructor=instructor, category=category)
+            for title in ('Python Basics', 'PyTorch for Beginners')
+        )
+        Enrollment.objects.create(user=User.objects.create_user('student', password='pw'), course=self.pytorch)
+        course_index.rebuild()
+        self.url = reverse('ajax_search')
+
+    def titles(self, query):
+        return [row['title'] for row in self.client.get(self.url, {'q': query}).json()['results']]
+
+    def test_prefix_lookup_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('py'), ['PyTorch for Beginners', 'Python Basics'])
+            self.assertEqual(self.titles('basics pyth'), ['Python Basics'])
+            self.assertEqual(self.titles('!!'), [])
+
+    def test_index_follows_edits(self):
+        self.python.title = 'Advanced Rust'
+        self.python.save()
+        self.assertEqual(self.titles('py'), ['PyTorch for Beginners'])
+        self.assertEqual(self.titles('rust'), ['Advanced Rust'])
+
+        self.pytorch.delete()
+        self.assertEqual(self.titles('py'), [])
+
+
+class SearchPaginationTests(TestCase):
+    """Ranked search pages on signed (bm25 score, id) cursors in both directions."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        for i in range(5):
+            Course.objects.create(
+                title=f'Django {i}' if i % 2 else f'Course {i}', description='django ' * (i + 1),
+                instructor=instructor, category=category,
+            )
+        self.factory = RequestFactory()
+
+    def page(self, cursor=None):
+        request = self.factory.get('/search/', {'q': 'django', **({'cursor': cursor} if cursor else {})})
+        return search_page(request, 'django', per_page=2)
+
+    def test_pages_forward_and_back(self):
+        ranked = [pk for pk, _ in search.ranked_course_ids('django')]
+        first = self.page()
+        second = self.page(first.next_cursor)
+        third = self.page(second.next_cursor)
+        self.assertEqual([c.pk for page in (first, second, third) for c in page], ranked)
+        self.assertFalse(first.has_previous)
+        self.assertFalse(third.has_next)
+
+        back = self.page(third.prev_cursor)
+        self.assertEqual([c.pk for c in back], [c.pk for c in second])
+        self.assertEqual([c.pk for c in self.page(back.prev_cursor)], [c.pk for c in first])
+
+    def test_tampered_cursor_means_first_page(self):
+        first = self.page()
+        tampered = first.next_cursor[:-2] + ('AA' if not first.next_cursor.endswith('AA') else 'BB')
+        self.assertEqual([c.pk for c in self.page(tampered)], [c.pk for c in first])
+        self.assertIn('cursor=', first.bind(self.factory.get('/search/', {'q': 'django'})).next_url)
+
+
+class FacetedSearchTests(TestCase):
+    """Facet counts come from one cached GROUP BY cube; each facet ignores its own selection."""
+
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        self.web = Category.objects.create(name='Programming')
+        self.data = Category.objects.create(name='Data')
+        self.courses = [
+            Course.objects.create(
+                title='Python' if i == 0 else f'Course {i}', description='d', instructor=self.instructor, category=category,
+                level=level, duration=duration, price=price,
+            )
+            for i, (category, level, duration, price) in enumerate([
+                (self.web, 'Beginner', '4 weeks', None),
+                (self.web, 'Beginner', '4 weeks', Decimal('0')),
+                (self.web, 'Advanced', '4 weeks', Decimal('49.99')),
+                (self.web, 'Beginner', '8 weeks', Decimal('50')),
+                (self.data, 'Beginner', '4 weeks', Decimal('100')),
+                (self.data, 'Advanced', '4 weeks', Decimal('199.99')),
+                (self.data, 'Beginner', '8 weeks', Decimal('200')),
+            ])
+        ]
+
+    def counts(self, selected):
+        facet_list, total = facets.facet_summary(selected)
+        return {f['param']: {o['value']: o['count'] for o in f['options']} for f in facet_list}, total
+
+    def test_price_band_boundaries(self):
+        c = self.courses
+        expected = {
+            'free': [c[0], c[1]], 'under-50': [c[2]], '50-100': [c[3]], '100-200': [c[4], c[5]], '200-plus': [c[6]],
+        }
+        for band, courses in expected.items():
+            matched = facets.apply_facets(Course.objects.all(), {'price_band': {band}}).order_by('id')
+            self.assertEqual(list(matched), courses, band)
+
+    def test_counts_ignore_own_selection(self):
+        selected = {'category_id': {self.web.pk}, 'level': {'Beginner'}}
+        counts, total = self.counts(selected)
+        self.assertEqual(total, 3)
+        self.assertEqual(counts['category'], {self.web.pk: 3, self.data.pk: 2})
+        self.assertEqual(counts['level'], {'Beginner': 3, 'Advanced': 1})
+        self.assertEqual(counts['duration'], {'4 weeks': 2, '8 weeks': 1})
+        self.assertEqual(counts['price'], {'free': 2, '50-100': 1})
+        self.assertEqual(
+            sorted(facets.apply_facets(Course.objects.all(), selected).values_list('id', flat=True)),
+            [self.courses[i].pk for i in (0, 1, 3)],
+        )
+
+        response = self.client.get(reverse('search'), {'category': self.web.pk, 'level': 'Beginner'})
+        self.assertEqual(response.context['total_count'], 3)
+
+    def test_cached_cube_reused_then_invalidated(self):
+        selected = {'level': {'Advanced'}, 'price_band': {'under-50', '100-200'}}
+        counts, total = self.counts(selected)
+        self.assertEqual(total, 2)
+        self.assertEqual(counts['price'], {'under-50': 1, '100-200': 1})
+        self.assertEqual(counts['level'], {'Beginner': 1, 'Advanced': 2})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(selected), (counts, total))
+
+        Course.objects.create(
+            title='SQL', description='d', instructor=self.instructor, category=self.data,
+            level='Advanced', price=Decimal('150'),
+        )
+        counts, total = self.counts(selected)
+        self.assertEqual(total, 3)
+        self.assertEqual(counts['price'], {'under-50': 1, '100-200': 2})
+
+    def test_queries_without_terms_match_nothing(self):
+        for query in ('!!!', '"'):
+            response = self.client.get(reverse('search'), {'q': query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['results']), [])
+            self.assertEqual(response.context['total_count'], 0)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'pyth'}).context['total_count'], 1)
+
+
+class CourseCounterTests(TestCase):
+    """Enrollment, lesson and review signals keep Course's counters in step."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=self.instructor, category=category)
+
+    def counters(self):
+        self.course.refresh_from_db()
+        return (
+            self.course.enrollment_count, self.course.lesson_count, self.course.review_count,
+            self.course.rating_sum, self.course.rating,
+        )
+
+    def test_create_and_delete(self):
+        students = [User.objects.create_user(f'student{i}', password='pw') for i in range(2)]
+        enrollments = [Enrollment.objects.create(user=student, course=self.course) for student in students]
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        reviews = [
+            Review.objects.create(course=self.course, user=student, rating=rating, comment='c')
+            for student, rating in zip(students, (5, 2))
+        ]
+        self.assertEqual(self.counters(), (2, 1, 2, 7, 3.5))
+
+        enrollments[0].delete()
+        lesson.delete()
+        reviews[0].delete()
+        self.assertEqual(self.counters(), (1, 0, 1, 2, 2.0))
+
+        reviews[1].delete()
+        self.assertEqual(self.counters(), (1, 0, 0, 0, 0.0))
+
+    def test_rating_edit_and_reconcile(self):
+        student = User.objects.create_user('student', password='pw')
+        review = Review.objects.create(course=self.course, user=student, rating=2, comment='c')
+        review.rating = 4
+        review.save()
+        self.assertEqual(self.counters()[2:], (1, 4, 4.0))
+
+        Course.objects.filter(pk=self.course.pk).update(review_count=9, lesson_count=3)
+        call_command('reconcile_course_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (0, 0, 1, 4, 4.0))
+
+    def test_counter_writes_refresh_cached_listing(self):
+        cache.clear()
+        url = reverse('course_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        Enrollment.objects.create(user=User.objects.create_user('student', password='pw'), course=self.course)
+        response = self.client.get(url)
+        self.assertEqual([c.enrollment_count for c in response.context['courses']], [1])
+
+
+class CourseDetailQueryBudgetTests(TestCase):
+    """course_detail must cost a fixed number of queries, however big the course is."""
+
+    # course, lessons, quizzes, live classes, announcements, reviews,
+    # also-enrolled, similar-courses bucket probe (no candidates here)
+    COLD_QUERIES = 8
+    # session + user (auth middleware), enrollment, lesson progress
+    LOGGED_IN_WARM_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', password='pw')
+        cls.student = User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        cls.course = Course.objects.create(
+            title='Python', description='Learn Python', instructor=cls.instructor, category=category,
+        )
+        lessons = [Lesson.objects.create(course=cls.course, title=f'Lesson {i}', order=i) for i in range(10)]
+        for i in range(3):
+            Quiz.objects.create(course=cls.course, title=f'Quiz {i}')
+        for i in range(5):
+            reviewer = User.objects.create_user(f'reviewer{i}', password='pw')
+            Review.objects.create(course=cls.course, user=reviewer, rating=4, comment='Good')
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+        for lesson in lessons[:4]:
+            LessonProgress.objects.create(user=cls.student, lesson=lesson, completed=True)
+
+    def setUp(self):
+        cache.clear()
+        # Start the view-count flush interval now so no flush lands inside a budget
+        view_buffer.flush()
+        self.url = reverse('course_detail', args=[self.course.pk])
+
+    def test_anonymous_cold_then_warm(self):
+        with self.assertNumQueries(self.COLD_QUERIES):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['lessons']), 10)
+        self.assertFalse(response.context['enrolled'])
+
+    def test_logged_in_warm(self):
+        self.client.get(self.url)
+        self.client.force_login(self.student)
+        with self.assertNumQueries(self.LOGGED_IN_WARM_QUERIES):
+            response = self.client.get(self.url)
+        self.assertTrue(response.context['enrolled'])
+        self.assertEqual(response.context['lessons_done'], 4)
+        self.assertEqual(response.context['progress'], 40)
+
+    def test_budget_does_not_grow_with_course_size(self):
+        for i in range(10, 30):
+            Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i)
+        with self.assertNumQueries(self.COLD_QUERIES):
+            self.client.get(self.url)
+
+    def test_lesson_change_invalidates_cached_context(self):
+        self.client.get(self.url)
+        Lesson.objects.create(course=self.course, title='Bonus', order=99)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['lessons']), 11)
+
+
+class CourseVersionTests(TestCase):
+    """Saving or deleting anything shown on the course page bumps the course's version."""
+
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            title='Python', description='d', instructor=self.instructor, category=category,
+        )
+
+    def assertBumps(self, change):
+        before = course_version(self.course.pk)
+        change()
+        self.assertNotEqual(course_version(self.course.pk), before)
+
+    def test_child_rows_bump_version(self):
+        lesson = Lesson(course=self.course, title='Intro', order=1)
+        review = Review(course=self.course, user=self.instructor, rating=5, comment='c')
+        announcement = Announcement(course=self.course, title='Hi', message='m', created_by=self.instructor)
+        for row in (lesson, review, announcement):
+            self.assertBumps(row.save)
+        self.assertBumps(lesson.delete)
+
+    def test_cached_context_follows_version(self):
+        shared_course_context(self.course.pk)
+        with self.assertNumQueries(0):
+            shared_course_context(self.course.pk)
+        Announcement.objects.create(course=self.course, title='Hi', message='m', created_by=self.instructor)
+        self.assertEqual(len(shared_course_context(self.course.pk)['announcements']), 1)
+
+
+class ViewCounterTests(TestCase):
+    """Page views are buffered and written in bulk; trend scores decay with time."""
+
+    def setUp(self):
+        cache.clear()
+        view_buffer.flush()
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            title='Python', description='d', instructor=instructor, category=self.category,
+        )
+
+    def test_views_buffered_until_flush(self):
+        url = reverse('course_detail', args=[self.course.pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.views, 0)
+
+        self.assertEqual(view_buffer.flush(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.views, 3)
+        self.assertAlmostEqual(trending_value(self.course.trend_score), 3, places=3)
+
+    def test_trend_decays_and_drives_badges(self):
+        now = time.time()
+        score = 100 * trend_weight(now)
+        self.assertAlmostEqual(trending_value(score, at=now + HALF_LIFE), 50)
+        self.assertAlmostEqual(trending_value(score, at=now + 2 * HALF_LIFE), 25)
+
+        self.category.trend_score = 100 * trend_weight()
+        self.category.course_count = 3
+        self.assertEqual(get_category_badges(self.category), [('hot', 'Hot')])
+        self.category.course_count = 6
+        self.assertEqual(get_category_badges(self.category), [('active', 'Active'), ('hot', 'Hot')])
+
+
+class CourseRankTests(TestCase):
+    """Ranked listings order by stored, decayed scores with id as a stable tie-break."""
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='d', instructor=instructor, category=category)
+            for i in range(5)
+        ]
+        students = [User.objects.create_user(f'student{i}', password='pw') for i in range(3)]
+        for course, enrolled in zip(self.courses, (2, 1, 1, 3, 0)):
+            for student in students[:enrolled]:
+                Enrollment.objects.create(user=student, course=course)
+        # Course 3's enrollments are two months old: popular, no longer trending
+        Enrollment.objects.filter(course=self.courses[3]).update(enrolled_at=timezone.now() - timedelta(days=60))
+        call_command('compute_course_ranks', stdout=StringIO())
+
+    def ordered(self, sort):
+        response = self.client.get(reverse('course_list'), {'sort': sort, 'format': 'json'})
+        return [row['id'] for row in response.json()['results']]
+
+    def test_ordering_and_tie_break(self):
+        c = [course.pk for course in self.courses]
+        # Courses 1 and 2 tie on score; the higher id comes first
+        self.assertEqual(self.ordered('trending'), [c[0], c[2], c[1], c[3], c[4]])
+        self.assertEqual(self.ordered('popular'), [c[0], c[3], c[2], c[1], c[4]])
+        # The rail leaves out courses without any score
+        self.assertEqual([course.pk for course in ranking.top_courses('trending')], [c[0], c[2], c[1], c[3]])
+
+        call_command('compute_course_ranks', stdout=StringIO())
+        self.assertEqual(self.ordered('trending'), [c[0], c[2], c[1], c[3], c[4]])
+
+    def test_saved_courses_tracked_before_rebuild(self):
+        c = [course.pk for course in self.courses]
+        new = Course.objects.create(
+            title='New', description='d', instructor=self.courses[0].instructor, category=self.courses[0].category,
+        )
+        self.assertEqual(self.ordered('trending'), [c[0], c[2], c[1], c[3], new.pk, c[4]])
+        self.assertEqual(CourseRank.objects.get(course=new).trending_score, 0.0)
+
+        other = Category.objects.create(name='Data')
+        self.courses[0].category = other
+        self.courses[0].save()
+        self.assertEqual([course.pk for course in ranking.top_courses('trending', category=other)], [c[0]])
+        self.assertEqual(CourseRank.objects.get(course=self.courses[0]).trending_score, 2.0)
+
+
+class RecommendationBuildTests(TestCase):
+    """The incremental build must end up where a full rebuild would."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='d', instructor=instructor, category=category)
+            for i in range(5)
+        ]
+        self.students = [User.objects.create_user(f'student{i}', password='pw') for i in range(8)]
+
+    def enroll(self, student, *course_indexes):
+        for i in course_indexes:
+            Enrollment.objects.create(user=self.students[student], course=self.courses[i])
+
+    def neighbours(self):
+        return sorted(
+            (n.course_id, n.neighbor_id, n.shared, round(n.score, 6))
+            for n in CourseNeighbor.objects.all()
+        )
+
+    def test_incremental_matches_full(self):
+        for student in range(4):
+            self.enroll(student, 0, 1)
+        self.enroll(4, 1, 2)
+        recommendations.build_full()
+
+        # New students, and old students picking up more courses
+        self.enroll(5, 1, 2, 3)
+        self.enroll(0, 2)
+        self.enroll(4, 0)
+        recommendations.build_incremental()
+        incremental = self.neighbours()
+
+        recommendations.build_full()
+        self.assertEqual(incremental, self.neighbours())
+
+        first = self.courses[0]
+        self.assertEqual(recommendations.also_enrolled(first.pk)[0], self.courses[1])
+        self.assertNotIn(first, recommendations.also_enrolled(first.pk))
+
+    def test_single_course_enrollment_rescores_pairs(self):
+        for student in range(3):
+            self.enroll(student, 0, 1)
+        self.enroll(3, 1, 2)
+        self.enroll(4, 1, 2)
+        recommendations.build_full()
+
+        # No pair count changes, but course 1's enrollment count does
+        self.enroll(5, 1)
+        recommendations.build_incremental()
+        incremental = self.neighbours()
+
+        recommendations.build_full()
+        self.assertEqual(incremental, self.neighbours())
+
+
+class SimilarCoursesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.category = Category.objects.create(name='Data')
+        self.instructor = instructor
+
+    def course(self, title, skill_text):
+        return Course.objects.create(
+            title=title, description='d', instructor=self.instructor, category=self.category, skills=skill_text,
+        )
+
+    def test_similar_courses_via_lsh(self):
+        base = self.course('Pandas', 'Python, Pandas, NumPy, Data Cleaning, Visualization')
+        close = self.course('Pandas II', 'python, pandas,  numpy, data cleaning, Matplotlib')
+        unrelated = self.course('Pottery', 'Clay, Glazing, Wheel Throwing')
+
+        similar = skills.similar_courses(base)
+        self.assertIn(close, similar)
+        self.assertNotIn(unrelated, similar)
+        self.assertEqual(
+            sorted(base.skill_tags.values_list('key', flat=True)),
+            ['data cleaning', 'numpy', 'pandas', 'python', 'visualization'],
+        )
+
+        # Changing the skills re-indexes the course and invalidates the cached lookup
+        unrelated.skills = 'Python, Pandas, NumPy, Data Cleaning, Visualization'
+        unrelated.save()
+        self.assertIn(unrelated, skills.similar_courses(base))
+
+
+class EnrollmentProgressTests(TestCase):
+    """Enrollment.progress follows LessonProgress writes and lesson changes."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.student = User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.lessons = [Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(4)]
+        Enrollment.objects.create(user=self.student, course=self.course)
+
+    def enrollment(self):
+        return Enrollment.objects.get(user=self.student, course=self.course)
+
+    def test_complete_lesson_counts_once(self):
+        progress.complete_lesson(self.student, self.lessons[0])
+        progress.complete_lesson(self.student, self.lessons[0])
+        LessonProgress.objects.create(user=self.student, lesson=self.lessons[1], completed=False)
+        progress.complete_lesson(self.student, self.lessons[1])
+
+        enrollment = self.enrollment()
+        self.assertEqual(enrollment.completed_lessons, 2)
+        self.assertEqual(enrollment.progress, 50.0)
+
+    def test_lesson_add_and_delete_rescale(self):
+        progress.complete_lesson(self.student, self.lessons[0])
+        Lesson.objects.create(course=self.course, title='Bonus', order=9)
+        self.assertEqual(self.enrollment().progress, 20.0)
+
+        self.lessons[0].delete()
+        enrollment = self.enrollment()
+        self.assertEqual(enrollment.completed_lessons, 0)
+        self.assertEqual(enrollment.progress, 0.0)
+
+    def test_reconcile_fixes_drift(self):
+        progress.complete_lesson(self.student, self.lessons[0])
+        Enrollment.objects.update(completed_lessons=3, progress=75.0)
+        self.assertEqual(progress.reconcile(), 1)
+        self.assertEqual(self.enrollment().progress, 25.0)
+
+
+class LessonBitsetTests(TestCase):
+    """Bitset-backed lesson completion agrees with the LessonProgress rows it replaces."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.students = [User.objects.create_user(f'student{i}', password='pw') for i in range(3)]
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.lessons = [Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(10)]
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=self.course)
+
+    def test_bit_operations(self):
+        bits = lesson_bits.set_bit(b'', 9)
+        bits = lesson_bits.set_bit(bits, 0)
+        self.assertTrue(lesson_bits.test_bit(bits, 9))
+        self.assertFalse(lesson_bits.test_bit(bits, 8))
+        self.assertFalse(lesson_bits.test_bit(bits, 200))
+        self.assertEqual(lesson_bits.popcount(bits), 2)
+        self.assertEqual(lesson_bits.popcount(lesson_bits.clear_bit(bits, 9)), 1)
+
+    def test_convert_then_complete_and_aggregate(self):
+        for lesson in self.lessons[:3]:
+            progress.complete_lesson(self.students[0], lesson)
+        progress.complete_lesson(self.students[1], self.lessons[0])
+        call_command('convert_lesson_progress', '--delete-rows', stdout=StringIO())
+        self.assertFalse(LessonProgress.objects.exists())
+
+        with override_settings(LESSON_PROGRESS_BITSET=True):
+            progress.complete_lesson(self.students[1], self.lessons[9])
+            progress.complete_lesson(self.students[1], self.lessons[9])
+            enrollment = Enrollment.objects.get(user=self.students[1], course=self.course)
+            self.assertEqual(enrollment.completed_lessons, 2)
+            self.assertEqual(enrollment.progress, 20.0)
+
+            rates = lesson_bits.lesson_completion_rates(self.course.pk)
+            self.assertAlmostEqual(rates[self.lessons[0].pk], 2 / 3)
+            self.assertAlmostEqual(rates[self.lessons[9].pk], 1 / 3)
+            self.assertEqual(rates[self.lessons[5].pk], 0)
+
+            self.lessons[0].delete()
+            self.assertEqual(Enrollment.objects.get(user=self.students[0], course=self.course).completed_lessons, 2)
+
+
+class LessonHeartbeatTests(TestCase):
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.student = User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        other = Course.objects.create(title='Go', description='d', instructor=instructor, category=category)
+        self.lessons = [
+            Lesson.objects.create(course=course, title=f'Lesson {i}', order=i, duration_seconds=600) for i in range(2)
+        ]
+        self.foreign = Lesson.objects.create(course=other, title='Other', order=0)
+        self.enrollment = Enrollment.objects.create(user=self.student, course=course)
+        heartbeats.position_buffer.flush()
+        self.client.force_login(self.student)
+        self.url = reverse('lesson_heartbeat')
+
+    def post(self, events):
+        return self.client.post(self.url, json.dumps({'events': events}), content_type='application/json')
+
+    def test_positions_coalesce_and_threshold_completes(self):
+        first, second = self.lessons
+        response = self.post([
+            {'lesson_id': first.pk, 'position': 10},
+            {'lesson_id': first.pk, 'position': 20},
+            {'lesson_id': second.pk, 'position': 550},
+            {'lesson_id': self.foreign.pk, 'position': 5},
+        ])
+        data = response.json()
+        self.assertEqual(data['accepted'], [first.pk, second.pk])
+        self.assertEqual(data['completed'], [second.pk])
+        self.assertEqual(data['rejected'], [self.foreign.pk])
+
+        self.assertEqual(heartbeats.position_buffer.flush(), 2)
+        positions = dict(LessonProgress.objects.values_list('lesson_id', 'position'))
+        self.assertEqual(positions, {first.pk: 20.0, second.pk: 550.0})
+        self.assertTrue(LessonProgress.objects.get(lesson=second).completed)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+
+    def test_completed_lesson_not_completed_again(self):
+        second = self.lessons[1]
+        self.post([{'lesson_id': second.pk, 'position': 560}])
+        with mock.patch('catalog.heartbeats.progress.complete_lesson') as complete_lesson:
+            data = self.post([{'lesson_id': second.pk, 'position': 570}]).json()
+        self.assertEqual(data['completed'], [second.pk])
+        complete_lesson.assert_not_called()
+        self.assertEqual(PointsEntry.objects.filter(user=self.student).count(), 1)
+
+    @override_settings(LESSON_PROGRESS_BITSET=True)
+    def test_bitset_mode_keeps_positions_on_enrollment(self):
+        first, second = self.lessons
+        self.post([{'lesson_id': first.pk, 'position': 30}, {'lesson_id': second.pk, 'position': 590}])
+        self.post([{'lesson_id': first.pk, 'position': 45}])
+        self.assertEqual(heartbeats.position_buffer.flush(), 2)
+
+        self.assertFalse(LessonProgress.objects.exists())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.lesson_positions, {str(first.pk): 45.0, str(second.pk): 590.0})
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+
+        with mock.patch('catalog.heartbeats.progress.complete_lesson') as complete_lesson:
+            self.post([{'lesson_id': second.pk, 'position': 595}])
+        complete_lesson.assert_not_called()
+
+    def test_non_finite_positions_dropped(self):
+        first, second = self.lessons
+        body = '{"events": [{"lesson_id": %d, "position": NaN}, {"lesson_id": %d, "position": 9000}]}' % (
+            first.pk, second.pk,
+        )
+        data = self.client.post(self.url, body, content_type='application/json').json()
+        self.assertEqual(data['accepted'], [second.pk])
+
+        # Written straight into the buffer, a bad position is discarded, not retried
+        heartbeats.position_buffer.record(self.student.pk, first.pk, float('inf'), first.course_id)
+        self.assertEqual(heartbeats.position_buffer.flush(), 1)
+        self.assertEqual(dict(LessonProgress.objects.values_list('lesson_id', 'position')), {second.pk: 600.0})
+        self.assertEqual(heartbeats.position_buffer.flush(), 0)
+
+    def test_rejects_malformed_batch(self):
+        self.assertEqual(self.post([{'position': 3}]).status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'nope', content_type='application/json').status_code, 400)
+
+
+class UserStatsTests(TestCase):
+    """The materialized stats row follows enrollment, progress and review events."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.student = User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(
+                title=f'Course {i}', description='d', instructor=instructor, category=category, duration='8 weeks',
+            )
+            for i in range(3)
+        ]
+        self.lesson = Lesson.objects.create(course=self.courses[0], title='Only lesson', order=0)
+
+    def stats(self):
+        return UserStats.objects.get(user=self.student)
+
+    def test_events_update_stats(self):
+        for course in self.courses:
+            Enrollment.objects.create(user=self.student, course=course)
+        self.assertEqual(self.stats().new_count, 3)
+        self.assertEqual(self.stats().total_hours, 3 * 8 * user_stats.HOURS_PER_WEEK)
+
+        progress.complete_lesson(self.student, self.lesson)
+        enrollment = Enrollment.objects.get(user=self.student, course=self.courses[1])
+        enrollment.is_completed = True
+        enrollment.progress = 100
+        enrollment.save()
+        Review.objects.create(course=self.courses[1], user=self.student, rating=5, comment='Great')
+
+        stats = self.stats()
+        self.assertEqual(
+            (stats.enrolled_count, stats.completed_count, stats.in_progress_count, stats.new_count, stats.review_count),
+            (3, 1, 1, 1, 1),
+        )
+        self.assertEqual(stats.avg_progress, round(200 / 3, 1))
+
+        UserStats.objects.all().delete()
+        user_stats.rebuild()
+        self.assertEqual(self.stats().in_progress_count, 1)
+
+    def test_my_courses_reads_one_stats_row(self):
+        Enrollment.objects.create(user=self.student, course=self.courses[0])
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('my_courses'))
+        self.assertEqual(response.context['all_count'], 1)
+        self.assertEqual(response.context['total_hours'], 8 * user_stats.HOURS_PER_WEEK)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+
+class PointsLedgerTests(TestCase):
+    """Awards are idempotent ledger entries; the profile totals and level follow in SQL."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        self.student = User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        Enrollment.objects.create(user=self.student, course=course)
+        self.lesson = Lesson.objects.create(course=course, title='Intro', order=0)
+
+    def profile(self):
+        return Profile.objects.get(user=self.student)
+
+    def test_lesson_points_awarded_once(self):
+        progress.complete_lesson(self.student, self.lesson)
+        progress.complete_lesson(self.student, self.lesson)
+        points, xp = gamification.AWARDS[PointsEntry.LESSON_COMPLETED]
+        self.assertEqual(PointsEntry.objects.filter(user=self.student).count(), 1)
+        self.assertEqual((self.profile().points, self.profile().total_xp), (points, xp))
+
+    def test_no_points_without_enrollment(self):
+        visitor = User.objects.create_user('visitor', password='pw')
+        progress.complete_lesson(visitor, self.lesson)
+        with override_settings(LESSON_PROGRESS_BITSET=True):
+            progress.complete_lesson(visitor, self.lesson)
+        self.assertFalse(PointsEntry.objects.filter(user=visitor).exists())
+
+    def test_level_and_badge_computed_in_update(self):
+        self.assertEqual([gamification.level_for_xp(t) for t in (0, 99, 100, 249, 250)], [1, 1, 2, 2, 3])
+
+        gamification.award(self.student.pk, PointsEntry.COURSE_COMPLETED, 'bonus', points=600, xp=260)
+        profile = self.profile()
+        self.assertEqual(
+            (profile.user_level, profile.user_xp, profile.user_level_xp, profile.badge),
+            gamification.level_progress(260) + ('Silver',),
+        )
+
+        Profile.objects.filter(user=self.student).update(points=0, total_xp=0, user_level=1, badge=None)
+        call_command('replay_points_ledger', stdout=StringIO())
+        self.assertEqual((self.profile().points, self.profile().user_level), (600, 3))
+
+
+class LeaderboardTests(TestCase):
+    """Ranks from the bucket histogram match a plain count; the cached top-N follows awards."""
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.users = [User.objects.create_user(f'student{i}', password='pw') for i in range(6)]
+
+    def test_rank_and_top(self):
+        for i, (user, points) in enumerate(zip(self.users, [30, 120, 75, 75, 400, 49])):
+            gamification.award(user.pk, PointsEntry.LESSON_COMPLETED, f'seed:{i}', course_id=self.course.pk, points=points)
+        board = leaderboards.course_board(self.course.pk)
+        self.assertEqual([row['score'] for row in leaderboards.top(board)], [400, 120, 75, 75, 49, 30])
+
+        for user in self.users:
+            score = leaderboards.rank(board, user.pk)['score']
+            expected = 1 + Profile.objects.filter(points__gt=score).count()
+            self.assertEqual(leaderboards.rank(board, user.pk)['rank'], expected)
+
+        # Crossing a bucket boundary moves the user in the histogram and in the cached list
+        with self.captureOnCommitCallbacks(execute=True):
+            gamification.award(self.users[0].pk, PointsEntry.COURSE_COMPLETED, 'bonus', course_id=self.course.pk)
+        self.assertEqual(leaderboards.rank(leaderboards.GLOBAL, self.users[0].pk)['rank'], 2)
+        self.assertEqual(leaderboards.top(board, 2)[1]['username'], 'student0')
+
+        leaderboards.rebuild()
+        self.assertEqual(leaderboards.rank(leaderboards.week_board(), self.users[0].pk)['rank'], 2)
+        response = self.client.get(reverse('leaderboard'), {'course': self.course.pk})
+        self.assertEqual(response.json()['results'][0]['score'], 400)
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_week_boundary_follows_local_time(self):
+        # Monday 02:00 UTC is still Sunday evening in New York
+        monday_utc = datetime(2026, 10, 19, 2, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=monday_utc):
+            gamification.award(self.users[0].pk, PointsEntry.LESSON_COMPLETED, 'late', points=10)
+        board = leaderboards.week_board(monday_utc)
+        self.assertEqual(board, 'week:2026-W42')
+        self.assertEqual(leaderboards.rank(board, self.users[0].pk)['score'], 10)
+
+        leaderboards.rebuild()
+        self.assertEqual(leaderboards.rank(board, self.users[0].pk)['score'], 10)
+
+
+class NewUserSetupTests(TestCase):
+    """New users get a profile and the Student group in bulk; unchanged profiles are not rewritten."""
+
+    def test_signup_and_bulk_import(self):
+        user = User.objects.create_user('first', password='pw')
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+        self.assertTrue(user.groups.filter(name=accounts.STUDENT_GROUP).exists())
+
+        imported = User.objects.bulk_create([User(username=f'imported{i}') for i in range(3)])
+        accounts.setup_new_users(imported)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='imported').count(), 3)
+        self.assertEqual(User.objects.filter(groups__name=accounts.STUDENT_GROUP).count(), 4)
+
+    def test_unchanged_profile_is_not_saved(self):
+        user = User.objects.create_user('student', password='pw')
+        user = User.objects.get(pk=user.pk)
+        user.profile.points  # loads and caches the profile
+        with self.assertNumQueries(0):
+            user.profile.save()
+        user.profile.badge = 'Bronze'
+        with self.assertNumQueries(1):
+            user.profile.save()
+        self.assertEqual(Profile.objects.get(user=user).badge, 'Bronze')
+
+
+class InstructorDashboardTests(TestCase):
+    """Course aggregates come from one query; rosters are paginated JSON for the owner only."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='d', instructor=self.instructor, category=category)
+            for i in range(3)
+        ]
+        quiz = Quiz.objects.create(course=self.courses[0], title='Quiz')
+        for i in range(5):
+            student = User.objects.create_user(f'student{i}', password='pw')
+            enrollment = Enrollment.objects.create(user=student, course=self.courses[0])
+            Enrollment.objects.filter(pk=enrollment.pk).update(progress=[0, 50, 50, 100, 100][i], is_completed=i >= 3)
+            QuizResult.objects.create(user=student, quiz=quiz, score=i * 2, total_marks=10)
+
+    def test_dashboard_and_roster(self):
+        self.client.login(username='teacher', password='pw')
+        with self.assertNumQueries(3):  # session, user, courses
+            response = self.client.get(reverse('instructor_dashboard'))
+        self.assertEqual(response.context['totals']['students'], 5)
+        course = next(c for c in response.context['courses'] if c.pk == self.courses[0].pk)
+        self.assertEqual((course.enrolled, course.active, course.completed), (5, 2, 2))
+        self.assertEqual((course.avg_progress, course.avg_quiz_score), (60.0, 40.0))
+
+        url = reverse('instructor_roster', args=[self.courses[0].pk])
+        with mock.patch.object(dashboard, 'ROSTER_PAGE_SIZE', 3):
+            first = self.client.get(url).json()
+            second = self.client.get(url, {'cursor': first['next_cursor']}).json()
+        names = [row['username'] for row in first['results'] + second['results']]
+        self.assertEqual(sorted(names), [f'student{i}' for i in range(5)])
+        self.assertFalse(second['has_next'])
+
+        User.objects.create_user('other', password='pw')
+        self.client.login(username='other', password='pw')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CourseRollupTests(TestCase):
+    """Runs fold in only new rows; the chart endpoint reads the rollups."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=self.instructor, category=category)
+        self.quiz = Quiz.objects.create(course=self.course, title='Quiz')
+
+    def enroll(self, name):
+        student = User.objects.create_user(name, password='pw')
+        enrollment = Enrollment.objects.create(user=student, course=self.course)
+        QuizResult.objects.create(user=student, quiz=self.quiz, score=5, total_marks=10)
+        return enrollment
+
+    def value(self, metric):
+        return CourseDailyStat.objects.filter(course=self.course, metric=metric).aggregate(total=Sum('value'))['total']
+
+    def test_incremental_rollup_and_chart(self):
+        first = self.enroll('a')
+        self.enroll('b')
+        rollups.roll_up()
+        self.enroll('c')
+        Enrollment.objects.filter(pk=first.pk).update(is_completed=True, completed_at=timezone.now())
+        rollups.roll_up()  # the completion is still settling
+        self.assertIsNone(self.value(CourseDailyStat.COMPLETIONS))
+        later = timezone.now() + timedelta(seconds=rollups.SETTLE_SECONDS + 1)
+        rollups.roll_up(now=later)
+        rollups.roll_up(now=later)
+
+        self.assertEqual(self.value(CourseDailyStat.ENROLLMENTS), 3)
+        self.assertEqual(self.value(CourseDailyStat.QUIZ_ATTEMPTS), 3)
+        self.assertEqual(self.value(CourseDailyStat.COMPLETIONS), 1)
+
+        call_command('rollup_course_stats', '--full', stdout=StringIO())
+        self.assertEqual(self.value(CourseDailyStat.ENROLLMENTS), 3)
+
+        self.client.login(username='teacher', password='pw')
+        data = self.client.get(
+            reverse('course_stats_json', args=[self.course.pk]), {'days': 7, 'metric': 'enrollments'},
+        ).json()
+        self.assertEqual(len(data['days']), 7)
+        self.assertEqual(data['series'], {'enrollments': [0] * 6 + [3]})
+
+
+class CourseExportTests(TestCase):
+    """Exports stream every enrollment with its quiz stats and resume after an enrollment id."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=self.instructor, category=category)
+        quiz = Quiz.objects.create(course=self.course, title='Quiz')
+        self.enrollments = []
+        for i in range(5):
+            student = User.objects.create_user(f'student{i}', password='pw')
+            self.enrollments.append(Enrollment.objects.create(user=student, course=self.course))
+            for score in range(i):
+                QuizResult.objects.create(user=student, quiz=quiz, score=score * 2, total_marks=10)
+
+    def test_streamed_csv_and_resume(self):
+        self.client.login(username='teacher', password='pw')
+        url = reverse('export_course_data', args=[self.course.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), exports.COLUMNS)
+        self.assertEqual(len(lines), 6)
+
+        after = self.enrollments[2].pk
+        response = self.client.get(url, {'format': 'jsonl', 'after': after})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([r['username'] for r in records], ['student3', 'student4'])
+        self.assertEqual((records[1]['quiz_attempts'], records[1]['quiz_average'], records[1]['quiz_best']), (4, 30.0, 60.0))
+
+    def test_command_matches_endpoint_in_small_chunks(self):
+        out = StringIO()
+        call_command('export_course_data', self.course.pk, '--format', 'jsonl', '--chunk-size', '2', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r['quiz_attempts'] for r in records], [0, 1, 2, 3, 4])
+
+
+class GradebookTests(TestCase):
+    """The matrix agrees with the per-student rule and drives bulk grade recomputation."""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python', description='d', instructor=self.instructor, category=category)
+        quizzes = [Quiz.objects.create(course=self.course, title=f'Quiz {i}') for i in range(3)]
+        for quiz, n in zip(quizzes, [4, 2, 0]):  # the last quiz has no questions and is not graded
+            for j in range(n):
+                Question.objects.create(quiz=quiz, text=f'Q{j}')
+        self.students = [User.objects.create_user(f'student{i}', password='pw') for i in range(4)]
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=self.course)
+        attempts = [
+            (0, 0, 4), (0, 1, 2),           # 100%
+            (1, 0, 2), (1, 0, 4), (1, 1, 1),  # 7 / 10
+            (2, 2, 3),                      # ungradable quiz only
+        ]
+        for student, quiz, score in attempts:
+            QuizResult.objects.create(user=self.students[student], quiz=quizzes[quiz], score=score, total_marks=10)
+
+    def test_matrix_matches_per_student_rule(self):
+        book = gradebook.build(self.course.pk)
+        for student, percentage in zip(self.students, book.percentages.tolist()):
+            expected = gradebook.student_percentage(student.pk, self.course.pk)
+            if expected is None:
+                self.assertNotEqual(percentage, percentage)  # NaN
+            else:
+                self.assertAlmostEqual(percentage, expected)
+        self.assertEqual(book.letters().tolist()[:2], ['A', 'C'])
+        self.assertEqual(book.percentile_ranks().tolist()[:2], [100.0, 50.0])
+        self.assertAlmostEqual(book.quiz_means.tolist()[0], (100 + 75) / 2)
+
+        call_command('recompute_grades', '--course', str(self.course.pk), stdout=StringIO())
+        grades = dict(Enrollment.objects.filter(course=self.course).values_list('user__username', 'grade'))
+        self.assertEqual((grades['student0'], grades['student1'], grades['student2']), ('100.0%', '70.0%', None))
+
+        self.client.login(username='teacher', password='pw')
+        response = self.client.get(reverse('instructor_gradebook', args=[self.course.pk]))
+        self.assertContains(response, 'student1')
+
+
+class AnswerKeyTests(TestCase):
+    """take_quiz renders and grades from the cached key; editing a question recompiles it."""
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', password='pw')
+        User.objects.create_user('student', password='pw')
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.quiz = Quiz.objects.create(course=course, title='Quiz')
+        self.questions = [
+            Question.objects.create(
+                quiz=self.quiz, text=f'Q{i}', option1='a', option2='b', correct_option=1 + i % 2, marks=i + 1,
+            )
+            for i in range(3)
+        ]
+
+    def test_grading_without_question_queries(self):
+        self.client.login(username='student', password='pw')
+        url = reverse('take_quiz', args=[self.quiz.pk])
+        self.assertContains(self.client.get(url), 'Q2')
+
+        answers = {f'question_{q.pk}': str(q.correct_option) for q in self.questions}
+        answers[f'question_{self.questions[1].pk}'] = '1'  # wrong
+        with self.assertNumQueries(6):  # session, user, quiz, open attempt, closing it, result insert
+            response = self.client.post(url, answers)
+        self.assertEqual((response.context['score'], response.context['incorrect']), (4, 1))
+        self.assertEqual(QuizResult.objects.get().total_marks, 6)
+
+        question = self.questions[1]
+        question.correct_option = 1
+        question.save()
+        self.quiz.refresh_from_db()
+        self.assertEqual(answer_keys.for_quiz(self.quiz).grade(answers), (6, 3))
+        self.assertEqual(
+            [question['options'] for question in answer_keys.for_quiz(self.quiz).questions],
+            [question.get_options() for question in self.questions],
+        )
+
+
+@override_settings(QUIZ_ASYNC_SUBMISSIONS=True)
+class QuizSubmissionQueueTests(TestCase):
+    """Queued submissions are acknowledged at once and graded in one batch."""
+
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.quiz = Quiz.objects.create(course=course, title='Quiz')
+        self.questions = [
+            Question.objects.create(quiz=self.quiz, text=f'Q{i}', option1='a', option2='b', correct_option=1, marks=2)
+            for i in range(3)
+        ]
+
+    def test_queued_submissions_graded_in_bulk(self):
+        students = [User.objects.create_user(f'student{i}', password='pw') for i in range(3)]
+        url = reverse('take_quiz', args=[self.quiz.pk])
+        answers = {f'question_{q.pk}': str(q.correct_option) for q in self.questions}
+        status_urls = []
+        for student in students:
+            self.client.force_login(student)
+            response = self.client.post(url, answers)
+            self.assertEqual(response.status_code, 302)
+            status_urls.append(response.url)
+        self.assertFalse(QuizResult.objects.exists())
+        self.assertEqual(self.client.get(status_urls[-1], {'format': 'json'}).json()['status'], 'pending')
+
+        call_command('process_quiz_submissions', stdout=StringIO())
+        self.assertEqual(list(QuizResult.objects.values_list('score', flat=True)), [6, 6, 6])
+        response = self.client.get(status_urls[-1])
+        self.assertEqual((response.context['score'], response.context['percentage']), (6, 100))
+
+    def test_rows_graded_by_another_worker_are_not_regraded(self):
+        student = User.objects.create_user('student', password='pw')
+        answers = {f'question_{q.pk}': '1' for q in self.questions}
+        first, second = [submissions.enqueue(student, self.quiz, answers) for _ in range(2)]
+        self.assertEqual(submissions.process_pending(batch_size=1), 1)
+
+        # A second worker that read both ids before the first one committed
+        with mock.patch('catalog.submissions._pending_ids', return_value=[first.pk, second.pk]):
+            self.assertEqual(submissions.process_pending(), 1)
+        self.assertEqual(QuizResult.objects.count(), 2)
+        self.assertEqual(
+            set(QuizSubmission.objects.values_list('status', flat=True)), {QuizSubmission.GRADED},
+        )
+
+
+class QuizAttemptTests(TestCase):
+    """Autosaved drafts survive a refresh, and a timed quiz is graded from its draft after the deadline."""
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', password='pw')
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(title='Python', description='d', instructor=instructor, category=category)
+        self.quiz = Quiz.objects.create(course=course, title='Quiz', time_limit_minutes=10)
+        self.questions = [
+            Question.objects.create(quiz=self.quiz, text=f'Q{i}', option1='a', option2='b', correct_option=1, marks=2)
+            for i in range(3)
+        ]
+        self.student = User.objects.create_user('student', password='pw')
+        self.client.force_login(self.student)
+        self.url = reverse('take_quiz', args=[self.quiz.pk])
+
+    def patch(self, attempt, answers):
+        return self.client.patch(
+            reverse('quiz_attempt_draft', args=[attempt.pk]), json.dumps(answers), content_type='application/json',
+        )
+
+    def test_draft_coalesced_in_cache_and_resumed(self):
+        response = self.client.get(self.url)
+        attempt = response.context['attempt']
+        self.assertEqual(response.context['remaining_seconds'], 600)
+
+        first, second = (f'question_{q.pk}' for q in self.questions[:2])
+        # The first patch flushes; the ones within FLUSH_INTERVAL of it stay in the cache
+        self.assertEqual(self.patch(attempt, {first: '2'}).status_code, 200)
+        self.assertEqual(self.patch(attempt, {first: '1', second: '2'}).json()['saved'], 2)
+        self.assertEqual(self.patch(attempt, {'question_0': '1'}).status_code, 400)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers, {first: '2'})
+
+        with mock.patch('catalog.attempts.time.time', return_value=attempts.time.time() + attempts.FLUSH_INTERVAL):
+            self.patch(attempt, {second: None})
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers, {first: '1'})
+
+        # A refresh resumes the same attempt, clock and answers, flushing the cached ones
+        self.patch(attempt, {second: '1'})
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['attempt'].pk, attempt.pk)
+        self.assertEqual(response.context['draft_answers'], {first: '1', second: '1'})
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers, {first: '1', second: '1'})
+
+    def test_quiet_draft_survives_a_cold_cache(self):
+        attempt = self.client.get(self.url).context['attempt']
+        self.patch(attempt, {f'question_{self.questions[0].pk}': '1'})
+        # No further patches; the cache is lost before the deadline passes
+        cache.clear()
+        QuizAttempt.objects.filter(pk=attempt.pk).update(
+            deadline=timezone.now() - timedelta(seconds=attempts.GRACE_SECONDS + 1),
+        )
+        response = self.client.post(self.url, {f'question_{q.pk}': '1' for q in self.questions})
+        self.assertEqual(response.context['score'], 2)
+
+    def test_expired_attempt_graded_from_last_draft(self):
+        attempt = self.client.get(self.url).context['attempt']
+        self.patch(attempt, {f'question_{self.questions[0].pk}': '1'})
+        QuizAttempt.objects.filter(pk=attempt.pk).update(
+            deadline=timezone.now() - timedelta(seconds=attempts.GRACE_SECONDS + 1),
+        )
+        self.assertEqual(self.patch(attempt, {f'question_{self.questions[1].pk}': '1'}).status_code, 409)
+
+        posted = {f'question_{q.pk}': '1' for q in self.questions}
+        response = self.client.post(self.url, posted)
+        self.assertEqual(response.context['score'], 2)
+        self.assertIsNotNone(QuizAttempt.objects.get(pk=attempt.pk).submitted_at)
+
+    def test_repeated_submit_shows_result_once_graded(self):
+        Quiz.objects.filter(pk=self.quiz.pk).update(time_limit_minutes=0)
+        self.client.get(self.url)
+        answers = {f'question_{q.pk}': '1' for q in self.questions[:2]}
+        first = self.client.post(self.url, answers)
+        second = self.client.post(self.url, answers)
+        self.assertEqual(QuizResult.objects.count(), 1)
+        self.assertEqual(first.context['score'], 4)
+        self.assertEqual(second.context['score'], 4)
+
+        with override_settings(QUIZ_ASYNC_SUBMISSIONS=True):
+            self.client.get(self.url)
+            first = self.client.post(self.url, answers)
+            second = self.client.post(self.url, answers)
+        self.assertEqual(QuizSubmission.objects.count(), 1)
+        self.assertEqual(second.url, first.url)
+
+    def test_timed_quiz_needs_an_attempt(self):
+        response = self.client.post(self.url, {f'question_{q.pk}': '1' for q in self.questions})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(QuizResult.objects.exists())
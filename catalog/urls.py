@@ -17,7 +17,12 @@ urlpatterns = [
     path('categories/', views.categories_list, name='categories_list'),
     path('categories/<int:category_id>/', views.category_courses, name='category_courses'),
     path('lesson/<int:lesson_id>/complete/', views.mark_lesson_complete, name='mark_lesson_complete'),
+    path('lesson/heartbeat/', views.lesson_heartbeat, name='lesson_heartbeat'),
     path('instructor/dashboard/', views.instructor_dashboard, name='instructor_dashboard'),
+    path('instructor/course/<int:course_id>/roster/', views.instructor_roster, name='instructor_roster'),
+    path('instructor/course/<int:course_id>/stats/', views.course_stats_json, name='course_stats_json'),
+    path('instructor/course/<int:course_id>/export/', views.export_course_data, name='export_course_data'),
+    path('instructor/course/<int:course_id>/gradebook/', views.instructor_gradebook, name='instructor_gradebook'),
     path('support/submit/', views.submit_ticket, name='submit_ticket'),
     path('support/thanks/', views.ticket_thanks, name='ticket_thanks'),
     path('course/<int:course_id>/forum/', views.course_forum, name='course_forum'),
@@ -31,6 +36,7 @@ urlpatterns = [
     path('lesson/<int:lesson_id>/video/', views.stream_video, name='stream_video'),
     path('lesson/<int:lesson_id>/notes/', views.lesson_notes, name='lesson_notes'),
     path('ajax/search/', views.ajax_search, name='ajax_search'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
     path('lesson/<int:lesson_id>/bookmark/', views.toggle_bookmark, name='toggle_bookmark'),
     path('lesson/<int:lesson_id>/get_video/', views.get_video_token_redirect, name='get_video_token'),
     path('video/stream/<str:token>/', views.stream_video_with_token, name='stream_video_with_token'),
@@ -45,6 +51,8 @@ urlpatterns = [
     path('course/<int:course_id>/announcements/<int:ann_id>/delete/', views.delete_announcement, name='delete_announcement'),
     path('quiz/<int:quiz_id>/', views.quiz_detail, name='quiz_detail'),
     path('quiz/<int:quiz_id>/take/', views.take_quiz, name='take_quiz'),
+    path('quiz/submission/<int:submission_id>/', views.quiz_submission_status, name='quiz_submission_status'),
+    path('quiz/attempt/<int:attempt_id>/draft/', views.quiz_attempt_draft, name='quiz_attempt_draft'),
 ]
 
 if settings.DEBUG:
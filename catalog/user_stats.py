@@ -0,0 +1,109 @@
+# catalog/user_stats.py
+"""
+Materialized per-user learning stats (UserStats).
+
+my_courses and profile read one UserStats row instead of running COUNTs
+and AVGs over the user's enrollments on every view.  The row is
+recomputed for the affected users whenever one of their enrollments,
+reviews or progress values changes: one set-based UPDATE whose correlated
+subqueries aggregate just those users' rows.  ``manage.py
+rebuild_user_stats`` does the same for every user.
+
+Course.duration is a label such as ``"8 weeks"``; it is turned into hours
+inside the query with a CASE over DURATION_CHOICES, at HOURS_PER_WEEK of
+study per week.
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+
+from .models import Course, Enrollment, Review, UserStats
+
+HOURS_PER_WEEK = 5
+
+_DURATION = re.compile(r'(\d+)\s*(week|hour|minute)', re.I)
+
+
+def duration_hours(label):
+    """Study hours for a Course.duration label: ``"8 weeks"`` -> 40."""
+    match = _DURATION.search(label or '')
+    if not match:
+        return 0
+    amount, unit = int(match.group(1)), match.group(2).lower()
+    if unit == 'week':
+        return amount * HOURS_PER_WEEK
+    if unit == 'hour':
+        return amount
+    return amount // 60
+
+
+def _hours_expression(field):
+    return Case(
+        *[When(**{field: value}, then=Value(duration_hours(value))) for value, _ in Course.DURATION_CHOICES],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _per_user(queryset, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.filter(user_id=OuterRef('user_id'))
+            .order_by()
+            .values('user_id')
+            .annotate(value=aggregate)
+            .values('value')
+        ),
+        0,
+    )
+
+
+def _stats_columns():
+    enrollments = Enrollment.objects.all()
+    return {
+        'enrolled_count': _per_user(enrollments, Count('id')),
+        'completed_count': _per_user(enrollments, Count('id', filter=Q(is_completed=True))),
+        'in_progress_count': _per_user(enrollments, Count('id', filter=Q(is_completed=False, progress__gt=0))),
+        'new_count': _per_user(enrollments, Count('id', filter=Q(progress=0))),
+        'progress_sum': Coalesce(
+            Subquery(
+                enrollments.filter(user_id=OuterRef('user_id'))
+                .order_by().values('user_id').annotate(value=Sum('progress')).values('value')
+            ),
+            0.0,
+        ),
+        'total_hours': _per_user(enrollments, Sum(_hours_expression('course__duration'))),
+        'review_count': _per_user(Review.objects.all(), Count('id')),
+        'updated_at': Now(),
+    }
+
+
+def refresh(user_ids):
+    """Recompute the stats rows of ``user_ids`` (a list or a values queryset)."""
+    if not isinstance(user_ids, (list, tuple, set)):
+        user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    UserStats.objects.bulk_create([UserStats(user_id=pk) for pk in user_ids], ignore_conflicts=True)
+    return UserStats.objects.filter(user_id__in=user_ids).update(**_stats_columns())
+
+
+def refresh_course(course_id):
+    """Recompute every student of a course, e.g. after its progress values were rescaled."""
+    return refresh(Enrollment.objects.filter(course_id=course_id).values_list('user_id', flat=True))
+
+
+def rebuild(batch_size=1000):
+    """Recompute the stats of every user. Returns the number of rows written."""
+    ids = list(User.objects.values_list('id', flat=True).order_by('id'))
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += refresh(ids[start:start + batch_size])
+    return written
+
+
+def for_user(user):
+    """The user's stats row (one query), or an all-zero unsaved row."""
+    return UserStats.objects.filter(user=user).first() or UserStats(user=user)
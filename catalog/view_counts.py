@@ -0,0 +1,111 @@
+# catalog/view_counts.py
+"""
+Buffered page-view counters for courses and categories.
+
+Page views are added to a process-local buffer and written out at most
+every FLUSH_INTERVAL seconds (or once MAX_PENDING rows are dirty) as a few
+batched ``UPDATE ... SET views = views + n WHERE id IN (...)`` statements,
+so a page view never costs its own write.
+
+Next to the raw total each row keeps ``trend_score``, an exponentially
+time-decayed view count.  It uses a fixed landmark instead of decaying every
+row on every flush: a view at time t adds ``2 ** ((t - TREND_EPOCH) / HALF_LIFE)``,
+and dividing by the same weight for "now" gives the decayed count.  Only the
+rows that were viewed are ever written, and rows can be ordered by
+``trend_score`` directly.  Doubles overflow after ~1000 half-lives (about
+19 years at one week), long before which TREND_EPOCH can simply be moved
+forward together with a one-off rescale of the column.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Category, Course
+
+HALF_LIFE = 7 * 24 * 60 * 60
+TREND_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+
+FLUSH_INTERVAL = 30
+MAX_PENDING = 500
+
+MODELS = {
+    'course': Course,
+    'category': Category,
+}
+
+
+def trend_weight(at=None):
+    at = time.time() if at is None else at
+    return 2 ** ((at - TREND_EPOCH) / HALF_LIFE)
+
+
+def trending_value(trend_score, at=None):
+    """Decayed view count: recent views count ~1, a view one half-life old ~0.5."""
+    return (trend_score or 0.0) / trend_weight(at)
+
+
+class ViewCountBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {kind: Counter() for kind in MODELS}
+        self._last_flush = time.monotonic()
+
+    def record(self, kind, pk, n=1):
+        with self._lock:
+            self._pending[kind][int(pk)] += n
+            dirty = sum(len(c) for c in self._pending.values())
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due or dirty >= MAX_PENDING:
+            try:
+                self.flush()
+            except Exception:
+                pass  # counts were put back; a page view must not fail on them
+
+    def flush(self):
+        """Write every buffered count; returns the number of rows updated."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {kind: Counter() for kind in MODELS}
+            self._last_flush = time.monotonic()
+
+        weight = trend_weight()
+        updated = 0
+        try:
+            with transaction.atomic():
+                for kind, counts in pending.items():
+                    # Rows viewed the same number of times share one UPDATE
+                    by_n = {}
+                    for pk, n in counts.items():
+                        by_n.setdefault(n, []).append(pk)
+                    for n, pks in by_n.items():
+                        updated += MODELS[kind].objects.filter(pk__in=pks).update(
+                            views=F('views') + n,
+                            trend_score=F('trend_score') + n * weight,
+                        )
+        except Exception:
+            # Keep the counts for the next attempt rather than dropping them
+            with self._lock:
+                for kind, counts in pending.items():
+                    self._pending[kind].update(counts)
+            raise
+        return updated
+
+
+view_buffer = ViewCountBuffer()
+
+
+def record_view(kind, pk):
+    view_buffer.record(kind, pk)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_buffer.flush()
+    except Exception:
+        pass
@@ -4,7 +4,7 @@ from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.db.models import Sum, Avg, Count, Q
 from .forms import ReviewForm, SupportTicketForm, PostForm, ReplyForm, AnnouncementForm
-from .models import Course, Enrollment, Announcement, Category, Review, Lesson, LessonProgress, SupportTicket, Post, Reply, QuizResult, Bundle, BundleOrder, Quiz, Question, Profile, Student
+from .models import Course, Enrollment, Announcement, Category, Review, Lesson, LessonProgress, SupportTicket, Post, Reply, QuizResult, Bundle, BundleOrder, Quiz, Question, Profile, Student, PointsEntry, CourseDailyStat, QuizSubmission, QuizAttempt
 from django.http import HttpResponse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, landscape
@@ -23,8 +23,10 @@ from reportlab.pdfgen import canvas
 from django.core.mail import send_mail
 import stripe
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import json
 from django.http import JsonResponse
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.db.models import Count
 from django.db import models
 from django.contrib.auth.models import User
@@ -33,29 +35,46 @@ import openai
 from .utils import load_video_token
 from .utils import make_video_token
 from django.core import signing
-from .decorators import group_required
+from django.core.paginator import Paginator
+from django.utils import timezone
+from .decorators import group_required, cache_anonymous_page, count_view
+from .view_counts import trending_value
+from . import (
+    answer_keys, attempts, dashboard, exports, gamification, gradebook, heartbeats, leaderboards, progress, ranking,
+    rollups, submissions, user_stats,
+)
+from .recommendations import also_enrolled, recommended_for
+from .skills import similar_courses, skill_names
+from . import facets
+from .search import matching_courses, search_page
+from .pagination import paginate_queryset
+from .course_context import attach_card_versions, shared_course_context, user_course_context
+from .autocomplete import course_index
 from django.core.mail import send_mass_mail
 from typing import List, Tuple
 from django.core.cache import cache
 from datetime import datetime
 
 
-# Example logic in views.py
 def get_category_badges(category):
     badges = []
 
-    # Course count badges
-    if category.courses.count() == 0:
+    # Course count badges (categories_list annotates course_count)
+    course_count = getattr(category, 'course_count', None)
+    if course_count is None:
+        course_count = category.courses.count()
+    if course_count == 0:
         badges.append(("empty", "No Courses"))
-    elif category.courses.count() > 20:
+    elif course_count > 20:
         badges.append(("mega", "Mega"))
-    elif category.courses.count() > 5:
+    elif course_count > 5:
         badges.append(("active", "Active"))
 
-    # Views badges
-    if category.views > 200:
+    # Views badges: time-decayed views, roughly "views this week"
+    recent_views = trending_value(category.trend_score)
+    if recent_views > 200:
         badges.append(("trending", "Trending"))
-    elif category.views > 80:
+    elif recent_views > 80:
         badges.append(("hot", "Hot"))
     else:
         badges.append(("popular", "Popular"))
@@ -66,108 +85,98 @@ def get_category_badges(category):
 
     return badges
 
-def course_list(request):
-    courses = Course.objects.all()
-    return render(request, 'catalog/course_list.html', {'courses': courses})
-
-def course_detail(request, pk):
-    course = get_object_or_404(Course, pk=pk)
+def _course_page_json(page):
+    """Infinite-scroll variant of a listing page: only the next slice of cards."""
+    return JsonResponse({
+        'results': [
+            {
+                'id': course.id,
+                'title': course.title,
+                'description': course.description,
+                'price': str(course.price) if course.price is not None else None,
+                'rating': course.rating,
+                'url': reverse('course_detail', args=[course.pk]),
+            }
+            for course in page
+        ],
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
 
-    quizzes = course.quizzes.all()
+def _sorted_courses(request, queryset):
+    """Keyset page of ``queryset``: newest-added order, or ?sort=trending|popular."""
+    sort = request.GET.get('sort')
+    if sort in ranking.SORTS:
+        queryset, keys = ranking.ranked(queryset, sort)
+        return paginate_queryset(request, queryset, keys=keys)
+    return paginate_queryset(request, queryset)
 
-    # Fetch reviews and lessons
-    reviews = course.reviews.select_related('user').all()
-    
-    # Removed .order_by('order') → field doesn't exist!
-    lessons = course.lessons.all()  # This works perfectly
-    total_lessons = lessons.count()
+@cache_anonymous_page('course', 'category')
+def course_list(request):
+    # Keyset-paginated on (created_at, id); ?format=json returns just the slice
+    courses = _sorted_courses(request, Course.objects.all())
+    if request.GET.get('format') == 'json':
+        return _course_page_json(courses)
+    attach_card_versions(courses)
+    return render(request, 'catalog/course_list.html', {
+        'courses': courses,
+        'page': courses,
+        'rail_title': 'Trending this week',
+        'rail_sorts': True,
+        'rail_courses': ranking.top_courses('trending'),
+    })
 
-    # Default context values
-    enrolled = False
-    lessons_done = 0
-    lesson_progress = {}
-    progress = 0
+@count_view('course', 'pk')
+def course_detail(request, pk):
+    # Shared part is cached per course version; the per-user part is two queries
+    context = dict(shared_course_context(pk))
+    context.update(user_course_context(request.user, pk, context['lessons']))
 
     form = ReviewForm()
-
-    if request.user.is_authenticated:
-        # Check if user is enrolled
-        enrolled = Enrollment.objects.filter(user=request.user, course=course).exists()
-
-        # Count completed lessons
-        lessons_done = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=course,
-            completed=True
-        ).count()
-
-        # Build progress dictionary for each lesson
-        progress_records = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__in=lessons
-        )
-        progress_map = {p.lesson_id: p for p in progress_records}
-        lesson_progress = {
-            lesson.id: progress_map.get(lesson.id)
-            for lesson in lessons
-        }
-
-        # Handle review submission
-        if request.method == 'POST':
-            form = ReviewForm(request.POST)
-            if form.is_valid():
-                review = form.save(commit=False)
-                review.user = request.user
-                review.course = course
-                review.save()
-                return redirect('course_detail', pk=pk)
-    else:
-        if request.method == 'POST':
+    if request.method == 'POST':
+        if not request.user.is_authenticated:
             return redirect('login')
 
-    # Calculate progress percentage
-    if total_lessons > 0:
-        progress = int((lessons_done / total_lessons) * 100)
+        # Handle review submission
+        form = ReviewForm(request.POST)
+        if form.is_valid():
+            review = form.save(commit=False)
+            review.user = request.user
+            review.course = context['course']
+            review.save()
+            return redirect('course_detail', pk=pk)
 
-    context = {
-        'course': course,
-        'reviews': reviews,
-        'lessons': lessons,
+    context.update({
         'form': form,
-        'enrolled': enrolled,
-        'progress': progress,
-        'lesson_progress': lesson_progress,
-        'lessons_done': lessons_done,
-        'total_lessons': total_lessons,
-        "quizzes": quizzes,
-    }
+        'total_lessons': len(context['lessons']),
+        'also_enrolled': also_enrolled(pk),
+        'similar_courses': similar_courses(context['course']),
+    })
 
     return render(request, 'catalog/course_detail.html', context)
 
 def search(request):
     query = request.GET.get('q')
-    category_id = request.GET.get('category')
-    courses = Course.objects.all()
-
-    if query:
-        courses = courses.filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(instructor__username__icontains=query) |
-        Q(instructor__first_name__icontains=query) |
-        Q(instructor__last_name__icontains=query)
-    )
-
-    if category_id:
-        courses = courses.filter(category_id=category_id)
 
-    categories = Category.objects.all()
+    # Facet filters (category, level, duration, price band) narrow the
+    # candidate set; the FTS5 index (catalog/search.py) ranks inside it.
+    selected = facets.selected_facets(request)
+    courses = facets.apply_facets(Course.objects.all(), selected) if selected else None
+    results = search_page(request, query, courses)
+    if request.GET.get('format') == 'json':
+        return _course_page_json(results)
+
+    # One GROUP BY for every facet count; cached for the no-keyword case
+    facet_list, total_count = facets.facet_summary(
+        selected, matching_courses(query) if query else None
+    )
 
     return render(request, 'catalog/search_results.html', {
-        'results': courses,
+        'results': results,
+        'page': results,
         'query': query,
-        'categories': categories,
-        'selected_category': int(category_id) if category_id else None,
+        'facets': facet_list,
+        'total_count': total_count,
     })
 
 
@@ -183,68 +192,36 @@ def my_courses(request):
     # Fetch enrollments with related course (avoids N+1 queries)
     enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
 
-    # ------------------------------------------------------------------
-    # Counts
-    # ------------------------------------------------------------------
-    all_count = enrollments.count()
-    completed_count = enrollments.filter(is_completed=True).count()
-    in_progress_count = enrollments.filter(is_completed=False, progress__gt=0).count()
-    new_count = enrollments.filter(progress=0).count()
-
-    # Certificates = completed courses
-    certificates_count = completed_count
-
-    # ------------------------------------------------------------------
-    # Average progress (across all enrollments)
-    # ------------------------------------------------------------------
-    avg_result = enrollments.aggregate(avg_progress=Avg('progress'))['avg_progress']
-    avg_progress = round(avg_result, 1) if avg_result is not None else 0.0
-
-    # ------------------------------------------------------------------
-    # Total learning time – your Course model has `duration` (not `hours`)
-    # Assuming duration is stored in minutes or hours – adjust as needed
-    # ------------------------------------------------------------------
-    total_duration = enrollments.aggregate(
-        total=Sum('course__duration')
-    )['total'] or 0
-
-    # Optional: convert minutes → hours if your `duration` field is in minutes
-    # total_hours = round(total_duration / 60, 1) if total_duration else 0
-    # Or keep it as-is if it's already in hours
-    total_hours = total_duration  # change this line based on your data
-
-    # ------------------------------------------------------------------
-    # Ensure data consistency: completed → progress = 100
-    # (Better to do this in model.save(), but safe fallback here)
-    # ------------------------------------------------------------------
-    to_update = []
-    for enrollment in enrollments:
-        if enrollment.is_completed and enrollment.progress != 100:
-            enrollment.progress = 100
-            to_update.append(enrollment)
-
-    if to_update:
-        Enrollment.objects.bulk_update(to_update, ['progress'])
+    # Counts, average progress and hours come from one materialized row
+    # (catalog/user_stats.py) kept up to date by enrollment/review/progress events
+    stats = user_stats.for_user(request.user)
 
     context = {
         'enrollments': enrollments,
-        'all_count': all_count,
-        'completed_count': completed_count,
-        'in_progress_count': in_progress_count,
-        'new_count': new_count,
-        'certificates_count': certificates_count,
-        'avg_progress': avg_progress,
-        'total_hours': total_hours,       
+        'stats': stats,
+        'all_count': stats.enrolled_count,
+        'completed_count': stats.completed_count,
+        'in_progress_count': stats.in_progress_count,
+        'new_count': stats.new_count,
+        # Certificates = completed courses
+        'certificates_count': stats.completed_count,
+        'avg_progress': stats.avg_progress,
+        'total_hours': stats.total_hours,
+        'recommended': recommended_for(request.user),
     }
 
     return render(request, 'catalog/my_courses.html', context)
 
+@cache_anonymous_page('course', 'category')
 def categories_list(request):
-    categories = Category.objects.all()
+    # One GROUP BY instead of category.courses.count per card
+    categories = list(Category.objects.annotate(course_count=Count('courses')))
+    for category in categories:
+        category.badges = get_category_badges(category)
 
     context = {
         "categories": categories,
-        "category_count": Category.objects.count(),
+        "category_count": len(categories),
         "course_count": Course.objects.count(),
         "student_count": Student.objects.count(),
         "success_rate": 90,   # Example static value
@@ -253,9 +230,14 @@ def categories_list(request):
     return render(request, 'catalog/categories_list.html', context)
 
 
+@count_view('category', 'category_id')
+@cache_anonymous_page('course', 'category')
 def category_courses(request, category_id):
     category = get_object_or_404(Category, pk=category_id)
-    courses = Course.objects.filter(category=category)
+    courses = _sorted_courses(request, Course.objects.filter(category=category))
+    if request.GET.get('format') == 'json':
+        return _course_page_json(courses)
+    attach_card_versions(courses)
 
     # Count of courses in this category
     course_count = category.courses.count()
@@ -263,32 +245,36 @@ def category_courses(request, category_id):
     return render(request, 'catalog/category_courses.html', {
         'category': category,
         'courses': courses,
+        'page': courses,
         'course_count': course_count,
+        'rail_title': f'Most popular in {category.name}',
+        'rail_sorts': True,
+        'rail_courses': ranking.top_courses('popular', category=category),
     })
 
 @login_required
 def profile(request):
     profile, created = Profile.objects.get_or_create(user=request.user)
 
-    enrollments = Enrollment.objects.filter(user=request.user)
+    enrollments = Enrollment.objects.filter(user=request.user).select_related('course__instructor')
     completed_enrollments = enrollments.filter(is_completed=True)
-    reviews = Review.objects.filter(user=request.user)
-
-    profile.complete_count = completed_enrollments.count()
-    profile.reviews = reviews.count()
-
-    total_courses = enrollments.count()
-    profile.progress_percentage = (
-        (profile.complete_count / total_courses) * 100 if total_courses > 0 else 0
-    )
+    reviews = Review.objects.filter(user=request.user).select_related('course')
 
-    profile.save()
+    # Totals are read from the materialized stats row, not recounted (and saved) per view
+    stats = user_stats.for_user(request.user)
 
     return render(request, 'catalog/profile.html', {
         'profile': profile,
+        'stats': stats,
         'enrollments': enrollments,
         'completed_enrollments': completed_enrollments,
         'reviews': reviews,
+        'completed_count': stats.completed_count,
+        'progress_percentage': stats.completion_percentage,
+        'user_level': profile.user_level,
+        'user_xp': profile.user_xp,
+        'next_level_xp': profile.user_level_xp,
+        'xp_percentage': round(profile.user_xp * 100 / profile.user_level_xp) if profile.user_level_xp else 0,
     })
 
 
@@ -296,7 +282,12 @@ def profile(request):
 def mark_completed(request, pk):
     enrollment = get_object_or_404(Enrollment, user=request.user, course__pk=pk)
     enrollment.is_completed = True
+    enrollment.progress = 100
+    enrollment.completed_at = enrollment.completed_at or timezone.now()
     enrollment.save()
+    gamification.award(
+        request.user.pk, PointsEntry.COURSE_COMPLETED, f'course:{pk}:user:{request.user.pk}', course_id=pk,
+    )
     return redirect('course_detail', pk=pk)
 
 from .models import Lesson, LessonProgress
@@ -304,32 +295,139 @@ from .models import Lesson, LessonProgress
 @login_required
 def mark_lesson_complete(request, lesson_id):
     lesson = get_object_or_404(Lesson, pk=lesson_id)
-    progress, created = LessonProgress.objects.get_or_create(
-        user=request.user,
-        lesson=lesson,
-        defaults={'completed': True}
-    )
-    if not created:
-        progress.completed = True
-        progress.save()
+    # Writes LessonProgress and bumps Enrollment.progress in one transaction
+    progress.complete_lesson(request.user, lesson)
     return redirect('course_detail', pk=lesson.course.pk)
 
+def leaderboard(request):
+    """
+    Top scorers as JSON: ``?course=<id>`` for one course, ``?period=week`` for
+    this week, otherwise all time.  Signed-in users also get their own rank.
+    """
+    course_id = request.GET.get('course')
+    if course_id:
+        if not course_id.isdigit():
+            return JsonResponse({'error': 'Invalid course'}, status=400)
+        board = leaderboards.course_board(int(course_id))
+    elif request.GET.get('period') == 'week':
+        board = leaderboards.week_board()
+    else:
+        board = leaderboards.GLOBAL
+
+    me = leaderboards.rank(board, request.user.pk) if request.user.is_authenticated else None
+    return JsonResponse({'board': board, 'results': leaderboards.top(board), 'me': me})
+
+@login_required
+@require_POST
+def lesson_heartbeat(request):
+    """
+    Batched player heartbeats: ``{"events": [{"lesson_id", "position", "completed"}, ...]}``.
+    Positions are coalesced and flushed in bulk (catalog/heartbeats.py).
+    """
+    try:
+        events = heartbeats.parse_events(json.loads(request.body))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    accepted, completed, rejected = heartbeats.record_heartbeats(request.user, events)
+    return JsonResponse({'accepted': accepted, 'completed': completed, 'rejected': rejected})
+
 @login_required
 def instructor_dashboard(request):
-    # Only show courses for the logged-in instructor
-    my_courses = Course.objects.filter(instructor=request.user)
-    course_data = []
-    for course in my_courses:
-        enrolled_students = Enrollment.objects.filter(course=course)
-        course_data.append({
-            'course': course,
-            'enrollments': enrolled_students,
-            'num_enrollments': enrolled_students.count()
-        })
+    # One annotated query for every course; rosters are loaded per course as JSON
+    courses = list(dashboard.course_summaries(request.user))
     return render(request, 'catalog/instructor_dashboard.html', {
-        'course_data': course_data
+        'courses': courses,
+        'totals': dashboard.totals(courses),
+    })
+
+@login_required
+def instructor_roster(request, course_id):
+    """Keyset-paginated students of one of the instructor's courses, newest first."""
+    course = get_object_or_404(Course, pk=course_id, instructor=request.user)
+    page = paginate_queryset(
+        request, dashboard.roster(course), keys=('-enrolled_at', '-id'), per_page=dashboard.ROSTER_PAGE_SIZE,
+    )
+    return JsonResponse({
+        'results': [dashboard.roster_row(enrollment) for enrollment in page],
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
+
+@login_required
+def instructor_gradebook(request, course_id):
+    """Students x quizzes for one of the instructor's courses, with class means and percentiles."""
+    course = get_object_or_404(Course, pk=course_id, instructor=request.user)
+    book = gradebook.build(course.pk)
+    cells = book.cells
+    percentages = book.percentages
+    percentiles = book.percentile_ranks()
+    letters = book.letters()
+
+    paginator = Paginator(range(len(book.user_ids)), gradebook.PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    page_rows = list(page.object_list)
+    usernames = User.objects.in_bulk([book.user_ids[i] for i in page_rows])
+
+    def number(value):
+        return None if value != value else round(float(value), 1)  # NaN -> None
+
+    students = [
+        {
+            'username': usernames[book.user_ids[i]].username,
+            'cells': [number(value) for value in cells[i]],
+            'percentage': number(percentages[i]),
+            'percentile': number(percentiles[i]),
+            'letter': letters[i] if percentages[i] == percentages[i] else None,
+        }
+        for i in page_rows
+    ]
+    quizzes = Quiz.objects.in_bulk(book.quiz_ids)
+    return render(request, 'catalog/instructor_gradebook.html', {
+        'course': course,
+        'quizzes': [quizzes[pk] for pk in book.quiz_ids],
+        'quiz_means': [number(value) for value in book.quiz_means],
+        'students': students,
+        'page_obj': page,
     })
 
+@login_required
+def course_stats_json(request, course_id):
+    """
+    Daily chart series for one of the instructor's courses, read from the
+    rollups only: ``?days=30&metric=enrollments&metric=completions``.
+    """
+    course = get_object_or_404(Course, pk=course_id, instructor=request.user)
+    valid = [metric for metric, _ in CourseDailyStat.METRIC_CHOICES]
+    metrics = [metric for metric in request.GET.getlist('metric') if metric in valid] or valid
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid days'}, status=400)
+
+    dates, values = rollups.series(course.pk, metrics, days)
+    return JsonResponse({'days': [day.isoformat() for day in dates], 'series': values})
+
+@login_required
+def export_course_data(request, course_id):
+    """
+    Stream a course's roster with progress and quiz results as
+    ``?format=csv`` (default) or ``jsonl``; ``?after=<enrollment_id>`` resumes.
+    """
+    course = get_object_or_404(Course, pk=course_id, instructor=request.user)
+    fmt = request.GET.get('format', 'csv')
+    after = request.GET.get('after')
+    if fmt not in exports.FORMATS or (after and not after.isdigit()):
+        return JsonResponse({'error': 'Invalid format or resume point'}, status=400)
+
+    records = exports.rows(course.pk, after=int(after) if after else None)
+    response = StreamingHttpResponse(
+        (line.encode() for line in exports.lines(records, fmt, header=not after)),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="course-{course.pk}-students.{fmt}"'
+    return response
+
 @login_required
 def submit_ticket(request):
     if request.method == 'POST':
@@ -442,44 +540,19 @@ def download_certificate(request, course_id):
 
 def _calculate_grade(user, course):
     """Calculate grade and performance metrics."""
-    quizzes = course.quizzes.all()
-    quiz_results = QuizResult.objects.filter(user=user, quiz__in=quizzes)
-    
-    if not quiz_results.exists():
+    # Same rule as the gradebook: total score over the questions of every attempt
+    percentage = gradebook.student_percentage(user.pk, course.pk)
+    if percentage is None:
         return {
             'display': 'Completed',
             'percentage': None,
             'badge': 'CERTIFIED',
             'color': HexColor("#4A90E2")
         }
-    
-    total_correct = 0
-    total_questions = 0
-    
-    for result in quiz_results:
-        question_count = result.quiz.questions.count()
-        if question_count > 0:
-            total_correct += result.score
-            total_questions += question_count
-    
-    if total_questions == 0:
-        return {
-            'display': 'Completed',
-            'percentage': None,
-            'badge': 'CERTIFIED',
-            'color': HexColor("#4A90E2")
-        }
-    
-    percentage = (total_correct / total_questions) * 100
-    
-    # Determine badge and color
-    if percentage >= 90:
-        badge, color = "DISTINCTION", HexColor("#FFD700")
-    elif percentage >= 75:
-        badge, color = "MERIT", HexColor("#C0C0C0")
-    else:
-        badge, color = "PASS", HexColor("#CD7F32")
-    
+
+    badge = gradebook.badge_for(percentage)
+    color = HexColor(gradebook.BADGE_COLORS[badge])
+
     return {
         'display': f"{percentage:.1f}%",
         'percentage': percentage,
@@ -491,27 +564,8 @@ def _calculate_grade(user, course):
 def _extract_skills(course):
     """Extract skills from course, with fallback defaults."""
     default_skills = ["Professional Development", "Problem Solving", "Critical Thinking", "Technical Skills"]
-    
-    if not hasattr(course, "skills"):
-        return default_skills
-    
-    skills_attr = course.skills
-    
-    # Handle list
-    if isinstance(skills_attr, list):
-        return skills_attr if skills_attr else default_skills
-    
-    # Handle string (comma-separated)
-    if isinstance(skills_attr, str):
-        parsed = [s.strip() for s in skills_attr.split(",") if s.strip()]
-        return parsed if parsed else default_skills
-    
-    # Handle queryset or relation
-    try:
-        parsed = [s.name for s in skills_attr.all()]
-        return parsed if parsed else default_skills
-    except Exception:
-        return default_skills
+    # Same normalization as the skill index (catalog/skills.py)
+    return skill_names(course.skills) or default_skills
 
 
 def _generate_certificate_pdf(user, course, enrollment, certificate_id, grade_data, skills):
@@ -1010,42 +1064,115 @@ def take_quiz(request, quiz_id):
 @login_required
 def take_quiz(request, quiz_id):
     quiz = get_object_or_404(Quiz, pk=quiz_id)
-    questions = quiz.questions.filter(question_type='MCQ')
+    # Questions and answer key come compiled from the cache (catalog/answer_keys.py)
+    compiled = answer_keys.for_quiz(quiz)
+    total = len(compiled.key)
 
     if request.method == 'POST':
-        score = 0
-        total = questions.count()
-
-        for question in questions:
-            selected = request.POST.get(f"question_{question.id}")
-            if selected and int(selected) == question.correct_option:
-                score += question.marks
-
-        incorrect = total - score
+        # Past the deadline the posted answers are ignored for the last draft (catalog/attempts.py)
+        attempt = attempts.open_attempt(request.user, quiz)
+        answers = attempts.finish(attempt, request.POST, compiled) if attempt is not None else None
+        if answers is None:
+            submitted = attempts.just_submitted(request.user, quiz)
+            if submitted is not None:
+                # A repeated submit shows the attempt's result instead of grading it again
+                return _submitted_attempt_response(request, quiz, compiled, submitted)
+            if quiz.is_timed():
+                # A timed quiz is only submitted through an attempt that started its clock
+                return redirect('take_quiz', quiz_id=quiz.pk)
+            answers = request.POST
+
+        if submissions.enabled():
+            # Acknowledge at once; a worker grades in batches (catalog/submissions.py)
+            submission = submissions.enqueue(request.user, quiz, answers)
+            return redirect('quiz_submission_status', submission_id=submission.pk)
+
+        score, correct = compiled.grade(answers)
 
         # Save result
         QuizResult.objects.create(
             user=request.user,
             quiz=quiz,
             score=score,
-            total_marks=sum(q.marks for q in questions)
+            total_marks=compiled.max_marks
         )
 
-        return render(request, 'catalog/quiz_result.html', {
-            'quiz': quiz,
-            'score': score,
-            'total': total,
-            'incorrect': incorrect,
-            'total_marks': sum(q.marks for q in questions)
-        })
+        return render(request, 'catalog/quiz_result.html', _quiz_result_context(
+            quiz, score, correct, total, compiled.max_marks,
+        ))
 
+    attempt = attempts.start_or_resume(request.user, quiz)
     return render(request, 'catalog/take_quiz.html', {
         'quiz': quiz,
-        'questions': questions,
+        'questions': compiled.questions,
+        'attempt': attempt,
+        'draft_answers': attempts.draft(attempt, compiled),
+        'remaining_seconds': attempts.remaining_seconds(attempt),
     })
 
+@login_required
+def quiz_attempt_draft(request, attempt_id):
+    """
+    Autosave: PATCH ``{"question_<id>": "<option>" | null, ...}`` into the
+    attempt's draft.  Cached per answer and flushed at intervals (catalog/attempts.py).
+    """
+    if request.method != 'PATCH':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz'), pk=attempt_id, user=request.user, submitted_at__isnull=True,
+    )
+    try:
+        compiled = answer_keys.for_quiz(attempt.quiz)
+        patch = attempts.parse_patch(json.loads(request.body), compiled)
+        answers = attempts.save_draft(attempt, patch, compiled)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    except attempts.AttemptExpired:
+        return JsonResponse({'error': 'Time is up for this attempt'}, status=409)
+    return JsonResponse({'saved': len(answers), 'remaining_seconds': attempts.remaining_seconds(attempt)})
+
+def _submitted_attempt_response(request, quiz, compiled, attempt):
+    """The result page of an attempt that was already submitted, without writing anything."""
+    if submissions.enabled():
+        submission = QuizSubmission.objects.filter(user=request.user, quiz=quiz).order_by('-id').first()
+        if submission is not None:
+            return redirect('quiz_submission_status', submission_id=submission.pk)
+    score, correct = compiled.grade(attempt.answers)
+    return render(request, 'catalog/quiz_result.html', _quiz_result_context(
+        quiz, score, correct, len(compiled.key), compiled.max_marks,
+    ))
+
+def _quiz_result_context(quiz, score, correct, total, max_marks):
+    return {
+        'quiz': quiz,
+        'score': score,
+        'total': total,
+        'incorrect': total - correct,
+        'total_marks': max_marks,
+        'percentage': round(score * 100 / max_marks) if max_marks else 0,
+    }
+
+@login_required
+def quiz_submission_status(request, submission_id):
+    """Result page of a queued submission; polls until graded (``?format=json`` for scripts)."""
+    submission = get_object_or_404(
+        QuizSubmission.objects.select_related('quiz'), pk=submission_id, user=request.user,
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': submission.status,
+            'score': submission.score,
+            'max_marks': submission.max_marks,
+        })
+    if submission.status != QuizSubmission.GRADED:
+        return render(request, 'catalog/quiz_pending.html', {'quiz': submission.quiz, 'submission': submission})
+    return render(request, 'catalog/quiz_result.html', _quiz_result_context(
+        submission.quiz, submission.score, submission.correct, submission.question_count, submission.max_marks,
+    ))
+
+@cache_anonymous_page('bundle', 'course')
 def bundle_list(request):
-    bundles = Bundle.objects.all()
+    bundles = Bundle.objects.prefetch_related('courses')
     return render(request, 'catalog/bundle_list.html', {'bundles': bundles})
 
 @login_required
@@ -1193,18 +1320,14 @@ def quiz_detail(request, quiz_id):
 @login_required
 def complete_lesson(request, lesson_id):
     lesson = get_object_or_404(Lesson, id=lesson_id)
-    # Mark completion...
-    profile = request.user.profile
-    profile.points += 10  # Lesson completion
-    profile.update_badge()
+    # Points come from the ledger, once per lesson (catalog/gamification.py)
+    progress.complete_lesson(request.user, lesson)
     return redirect('lesson_detail', lesson_id=lesson.id)
 
 def ajax_search(request):
     query = request.GET.get('q', '')
-    results = []
-    if query:
-        courses = Course.objects.filter(title__icontains=query)[:5]
-        results = [{'id': c.id, 'title': c.title} for c in courses]
+    # Served from the in-memory prefix index (catalog/autocomplete.py), no DB hit
+    results = course_index.suggest(query, limit=5) if query else []
     return JsonResponse({'results': results})
 
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -89,6 +90,30 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The cached pages, their generation counters (catalog/generations.py) and
+# quiz drafts must be shared by every worker: bumping a generation only
+# invalidates what the processes reading the same cache see.  Set REDIS_URL
+# when running more than one process; the local-memory fallback is
+# per-process and only suitable for a single development server.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -117,6 +142,16 @@ DEFAULT_FROM_EMAIL = 'pixelpulseforge.official@gmail.com'
 STRIPE_PUBLIC_KEY = 'pk_test_XXXXX'
 STRIPE_SECRET_KEY = 'sk_test_XXXXX'
 
+# Store lesson completion as a bitset on each Enrollment instead of one
+# LessonProgress row per lesson (catalog/lesson_bits.py).  Run
+# `manage.py convert_lesson_progress` before switching it on.
+LESSON_PROGRESS_BITSET = False
+
+# Accept quiz submissions into a staging table and grade them in batches
+# with `manage.py process_quiz_submissions` (catalog/submissions.py), so an
+# exam closing does not put thousands of gradings on the request path.
+QUIZ_ASYNC_SUBMISSIONS = False
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/